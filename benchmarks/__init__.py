@@ -0,0 +1 @@
+# Benchmark and load scripts. Run with `python -m benchmarks.<name> --help`.
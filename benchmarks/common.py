@@ -0,0 +1,41 @@
+import json
+import math
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (0-100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, elapsed=None):
+    """Latency summary in milliseconds, plus throughput when ``elapsed`` seconds is given."""
+    summary = {
+        "count": len(latencies),
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "max_ms": _ms(max(latencies) if latencies else None),
+    }
+    if elapsed:
+        summary["rps"] = round(len(latencies) / elapsed, 2)
+    return summary
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000.0, 2)
+
+
+def print_report(report, as_json=False):
+    if as_json:
+        print(json.dumps(report, indent=2))
+        return
+    for name, stats in report.items():
+        if isinstance(stats, dict):
+            fields = " ".join(f"{key}={value}" for key, value in stats.items())
+            print(f"{name:<24} {fields}")
+        else:
+            print(f"{name:<24} {stats}")
@@ -0,0 +1,107 @@
+"""
+Measure what connection setup costs per request, and that persistent DB
+connections and the shared Redis pool take it off the request path.
+
+Each simulated request fires Django's request_started / request_finished signals
+(which close connections that are not persistent), runs one ``SELECT 1`` and one
+Redis ``GET``:
+
+    POSTGRES_DB=realestate python -m benchmarks.connection_setup --requests 2000
+
+Modes compared:
+  db_new_connection     CONN_MAX_AGE=0: connect + authenticate on every request
+  db_persistent         CONN_MAX_AGE>0 with health checks (the default profile)
+  redis_new_connection  a fresh client (and TCP connection) per request
+  redis_shared_pool     the process-wide pool from core.redis
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "realestate.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.signals import request_finished, request_started  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from benchmarks.common import print_report, summarize  # noqa: E402
+from core.redis import get_redis_pool, redis  # noqa: E402
+
+
+def _request(work):
+    request_started.send(sender=None)
+    try:
+        work()
+    finally:
+        request_finished.send(sender=None)
+
+
+def _select_one():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+def run(work, total):
+    timings = []
+    start = time.perf_counter()
+    for _ in range(total):
+        t0 = time.perf_counter()
+        _request(work)
+        timings.append(time.perf_counter() - t0)
+    return summarize(timings, time.perf_counter() - start)
+
+
+def bench_db(max_age, total):
+    connection.close()
+    original = connection.settings_dict["CONN_MAX_AGE"]
+    connection.settings_dict["CONN_MAX_AGE"] = max_age
+    try:
+        _request(_select_one)  # warm up (and open the persistent connection)
+        return run(_select_one, total)
+    finally:
+        connection.settings_dict["CONN_MAX_AGE"] = original
+        connection.close()
+
+
+def bench_redis(shared, total):
+    pool = get_redis_pool()
+    client = redis.Redis(connection_pool=pool)
+
+    def fresh():
+        one_off = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=settings.REDIS_SOCKET_TIMEOUT)
+        try:
+            one_off.get("bench:connection_setup")
+        finally:
+            one_off.close()
+
+    work = (lambda: client.get("bench:connection_setup")) if shared else fresh
+    work()
+    return run(work, total)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--max-age", type=int, default=60, help="CONN_MAX_AGE for the persistent mode.")
+    parser.add_argument("--skip-redis", action="store_true")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = {"database": f"{connection.vendor} {connection.settings_dict.get('HOST') or connection.settings_dict['NAME']}"}
+    if connection.settings_dict.get("OPTIONS", {}).get("pool"):
+        report["db_pool"] = bench_db(0, args.requests)
+    else:
+        report["db_new_connection"] = bench_db(0, args.requests)
+        report["db_persistent"] = bench_db(args.max_age, args.requests)
+    if not args.skip_redis and redis and settings.USE_REDIS:
+        report["redis_new_connection"] = bench_redis(False, args.requests)
+        report["redis_shared_pool"] = bench_redis(True, args.requests)
+    print_report(report, args.json)
+
+
+if __name__ == "__main__":
+    main()
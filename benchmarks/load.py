@@ -0,0 +1,311 @@
+"""
+HTTP load driver: standard scenarios against a running deployment, reported as
+p50/p95/p99 latency and requests per second.
+
+Generate a large data set first, then start the app with throttles off so they do
+not reject the load itself:
+
+    python manage.py seed_demo --properties 2000000 --users 100000
+    THROTTLE_LOGIN_IP_RATE= THROTTLE_LOGIN_IDENTIFIER_RATE= THROTTLE_BOOKING_RATE= \\
+        uvicorn realestate.asgi:application --workers 4 --port 8000
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 --properties 2000000 --users 100000 \\
+        --concurrency 50 --duration 30 --output run.json
+    python -m benchmarks.load ... --baseline run.json   # later: percent change per scenario
+
+Scenarios (``--scenarios``; each runs for ``--duration`` seconds after a
+``--warmup``, at ``--concurrency`` virtual users with one keep-alive connection
+each):
+
+* ``browse``: the home page and the category list.
+* ``detail``: ``/api/properties/<slug>/`` over random generated properties.
+* ``recommendations``: ``/api/properties/<slug>/recommendations/`` (404 for the
+  inactive ~5% is expected).
+* ``booking``: booking create under contention: ``--booking-users`` users race
+  for ``--booking-slots`` one-hour slots on ``--hot-properties`` properties, so
+  most requests lose to an existing booking (400) and the rest create one (201).
+* ``login``: ``/auth/login/`` as random generated users (one password hash each).
+
+Properties and users are addressed by the patterns ``seed_demo`` generates
+(``demo-property-<n>``, ``demo-user<n>@example.com``), so ``--properties`` and
+``--users`` must not exceed what was seeded. The client is a small asyncio
+HTTP/1.1 implementation, so the driver needs nothing beyond the standard library.
+"""
+import argparse
+import asyncio
+import json
+import random
+import ssl
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+from benchmarks.common import print_report, summarize
+
+# Patterns and password used by `manage.py seed_demo --properties N`.
+PROPERTY_SLUG = "demo-property-{}"
+USER_EMAIL = "demo-user{}@example.com"
+USER_PASSWORD = "DemoPass123"
+
+SCENARIOS = ("browse", "detail", "recommendations", "booking", "login")
+# Responses that count as a successful request for each scenario.
+EXPECTED = {
+    "browse": {200},
+    "detail": {200},
+    "recommendations": {200, 404},
+    "booking": {201, 400},
+    "login": {200},
+}
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection."""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.secure = parts.scheme == "https"
+        self.port = parts.port or (443 if self.secure else 80)
+        self.host_header = parts.netloc
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def _open(self):
+        context = ssl.create_default_context() if self.secure else None
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None, token=None):
+        """Send one request; returns ``(status, body bytes)``."""
+        body = json.dumps(payload).encode() if payload is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host_header}", "Accept: application/json"]
+        if token:
+            lines.append(f"Authorization: Bearer {token}")
+        if payload is not None:
+            lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+        data = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                await self._open()
+            try:
+                return await asyncio.wait_for(self._exchange(data), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                # A reused connection may have been closed by the server while idle.
+                if not reused or attempt:
+                    raise
+            except BaseException:
+                self.close()
+                raise
+
+    async def _exchange(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before the response")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self._read_chunked()
+        else:
+            body = await self.reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, body
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append((await self.reader.readexactly(size + 2))[:-2])
+
+
+class LoadDriver:
+    def __init__(self, args):
+        self.args = args
+        self.hot_property_ids = []
+        self.tokens = []
+        # Far-future slots unique to this run, so earlier runs' bookings never interfere.
+        origin = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        self.slot_origin = origin + timedelta(days=3650 + uuid.uuid4().int % 36500)
+
+    def connection(self):
+        return Connection(self.args.base_url, self.args.timeout)
+
+    # Setup ---------------------------------------------------------------------------
+
+    async def login(self, conn, index):
+        status, body = await conn.request(
+            "POST", "/auth/login/", {"identifier": USER_EMAIL.format(index), "password": USER_PASSWORD}
+        )
+        if status != 200:
+            raise SystemExit(f"Login as {USER_EMAIL.format(index)} failed ({status}); seed users and disable login throttles.")
+        return json.loads(body)["access"]
+
+    async def prepare_booking(self):
+        conn = self.connection()
+        index = 0
+        while len(self.hot_property_ids) < self.args.hot_properties and index < self.args.properties:
+            status, body = await conn.request("GET", f"/api/properties/{PROPERTY_SLUG.format(index)}/")
+            if status == 404:
+                raise SystemExit(f"{PROPERTY_SLUG.format(index)} not found; run `manage.py seed_demo --properties N` first.")
+            data = json.loads(body)
+            if data.get("status") == "active":
+                self.hot_property_ids.append(data["id"])
+            index += 1
+        users = random.Random(self.args.seed).sample(range(self.args.users), min(self.args.booking_users, self.args.users))
+        self.tokens = [await self.login(conn, i) for i in users]
+        conn.close()
+
+    # Scenarios -----------------------------------------------------------------------
+
+    async def browse(self, conn, rng):
+        return await conn.request("GET", rng.choice(["/", "/api/categories/"]))
+
+    async def detail(self, conn, rng):
+        return await conn.request("GET", f"/api/properties/{PROPERTY_SLUG.format(rng.randrange(self.args.properties))}/")
+
+    async def recommendations(self, conn, rng):
+        slug = PROPERTY_SLUG.format(rng.randrange(self.args.properties))
+        return await conn.request("GET", f"/api/properties/{slug}/recommendations/")
+
+    async def booking(self, conn, rng):
+        start_at = self.slot_origin + timedelta(hours=rng.randrange(self.args.booking_slots))
+        payload = {
+            "property_id": rng.choice(self.hot_property_ids),
+            "start_at": start_at.isoformat(),
+            "end_at": (start_at + timedelta(hours=1)).isoformat(),
+        }
+        return await conn.request("POST", "/api/bookings/create/", payload, token=rng.choice(self.tokens))
+
+    async def login_scenario(self, conn, rng):
+        email = USER_EMAIL.format(rng.randrange(self.args.users))
+        return await conn.request("POST", "/auth/login/", {"identifier": email, "password": USER_PASSWORD})
+
+    # Running -------------------------------------------------------------------------
+
+    async def run_scenario(self, name):
+        handler = self.login_scenario if name == "login" else getattr(self, name)
+        if name == "booking" and not self.tokens:
+            await self.prepare_booking()
+        if self.args.warmup:
+            await self._drive(name, handler, self.args.warmup)
+        return await self._drive(name, handler, self.args.duration, record=True)
+
+    async def _drive(self, name, handler, duration, record=False):
+        latencies = []
+        statuses = {}
+        errors = {}
+        deadline = time.perf_counter() + duration
+
+        async def virtual_user(index):
+            rng = random.Random(f"{self.args.seed}:{name}:{index}")
+            conn = self.connection()
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        status, _ = await handler(conn, rng)
+                    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+                        errors[type(exc).__name__] = errors.get(type(exc).__name__, 0) + 1
+                        continue
+                    elapsed = time.perf_counter() - started
+                    statuses[str(status)] = statuses.get(str(status), 0) + 1
+                    if status in EXPECTED[name]:
+                        latencies.append(elapsed)
+                    else:
+                        errors[f"HTTP {status}"] = errors.get(f"HTTP {status}", 0) + 1
+            finally:
+                conn.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(i) for i in range(self.args.concurrency)))
+        elapsed = time.perf_counter() - started
+        if not record:
+            return None
+        summary = summarize(latencies, elapsed)
+        summary["statuses"] = statuses
+        summary["errors"] = errors
+        return summary
+
+    async def run(self):
+        report = {
+            "meta": {
+                "base_url": self.args.base_url,
+                "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "concurrency": self.args.concurrency,
+                "duration_s": self.args.duration,
+                "properties": self.args.properties,
+                "users": self.args.users,
+            }
+        }
+        for name in self.args.scenarios:
+            report[name] = await self.run_scenario(name)
+        return report
+
+
+def compare(report, baseline):
+    """Percent change of each scenario's latency percentiles and RPS against ``baseline``."""
+    changes = {}
+    for name, stats in report.items():
+        before = baseline.get(name)
+        if name == "meta" or not isinstance(before, dict):
+            continue
+        changes[name] = {
+            key: round((stats[key] - before[key]) / before[key] * 100, 1)
+            for key in ("p50_ms", "p95_ms", "p99_ms", "rps")
+            if stats.get(key) is not None and before.get(key)
+        }
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=50, help="Virtual users, each with its own connection.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per scenario.")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before each scenario.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+    parser.add_argument("--properties", type=int, default=10000, help="Generated properties to spread reads over.")
+    parser.add_argument("--users", type=int, default=1000, help="Generated users to log in as.")
+    parser.add_argument("--hot-properties", type=int, default=5, help="Properties the booking scenario contends on.")
+    parser.add_argument("--booking-slots", type=int, default=200, help="Distinct one-hour slots per hot property.")
+    parser.add_argument("--booking-users", type=int, default=50, help="Users creating bookings.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(LoadDriver(args).run())
+    if args.baseline:
+        with open(args.baseline) as fh:
+            report["change_pct"] = compare(report, json.load(fh))
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    print_report(report, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Compare the old two-query ``iexact`` login lookup with the single ``Lower()``
+indexed lookup used by ``core.auth_backends`` on a large users table.
+
+Runs against the configured database (PostgreSQL recommended, e.g. with
+POSTGRES_DB set) after ``python manage.py migrate``:
+
+    python -m benchmarks.login_lookup --users 1000000 --lookups 2000
+
+Seeded rows use ``@login.bench`` emails; they are kept for re-runs unless
+``--cleanup`` is passed.
+"""
+import argparse
+import os
+import random
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "realestate.settings")
+django.setup()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Q, Value  # noqa: E402
+from django.db.models.functions import Lower  # noqa: E402
+
+from benchmarks.common import print_report, summarize  # noqa: E402
+from core.auth_backends import EmailOrAdminUsernameBackend  # noqa: E402
+from users.models import User  # noqa: E402
+
+DOMAIN = "login.bench"
+
+
+def _email(index):
+    return f"Bench.User{index}@Login.Bench"
+
+
+def _admin_username(index):
+    return f"BenchAdmin{index}" if index % 100 == 0 else None
+
+
+def seed(total, batch_size):
+    existing = User.objects.filter(email__iendswith=f"@{DOMAIN}").count()
+    if existing >= total:
+        return existing
+    password = make_password("BenchPass123")
+    start = time.perf_counter()
+    for offset in range(existing, total, batch_size):
+        User.objects.bulk_create(
+            [
+                User(email=_email(i), admin_username=_admin_username(i), password=password)
+                for i in range(offset, min(offset + batch_size, total))
+            ],
+            batch_size=batch_size,
+        )
+        print(f"seeded {min(offset + batch_size, total)}/{total} users", end="\r", flush=True)
+    print(f"\nseeded in {time.perf_counter() - start:.1f}s")
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {User._meta.db_table}")
+    return total
+
+
+def legacy_lookup(identifier):
+    """The lookup the backend did before: email__iexact, then admin_username__iexact."""
+    try:
+        return User.objects.get(email__iexact=identifier)
+    except User.DoesNotExist:
+        try:
+            return User.objects.get(admin_username__iexact=identifier)
+        except User.DoesNotExist:
+            return None
+
+
+def run(lookup, identifiers):
+    timings = []
+    start = time.perf_counter()
+    for identifier in identifiers:
+        t0 = time.perf_counter()
+        lookup(identifier)
+        timings.append(time.perf_counter() - t0)
+    return summarize(timings, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--explain", action="store_true", help="Print the query plans.")
+    parser.add_argument("--cleanup", action="store_true", help="Delete the seeded users afterwards.")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    total = seed(args.users, args.batch_size)
+    rng = random.Random(42)
+    # Mostly emails in a different case, some admin usernames (the old second query).
+    identifiers = []
+    for _ in range(args.lookups):
+        index = rng.randrange(total)
+        if rng.random() < 0.2:
+            index -= index % 100
+            identifiers.append(_admin_username(index).lower())
+        else:
+            identifiers.append(_email(index).lower())
+
+    backend = EmailOrAdminUsernameBackend()
+    if args.explain:
+        sample = identifiers[0]
+        print("legacy email lookup:\n", User.objects.filter(email__iexact=sample).explain(), "\n")
+        # Same filter as EmailOrAdminUsernameBackend.get_user_by_identifier.
+        lookup = Lower(Value(sample))
+        single = User.objects.alias(email_lower=Lower("email"), admin_lower=Lower("admin_username")).filter(
+            Q(email_lower=lookup) | Q(admin_lower=lookup)
+        )
+        print("single lookup:\n", single.explain(), "\n")
+
+    report = {
+        "users": total,
+        "legacy_two_queries": run(legacy_lookup, identifiers),
+        "single_lower_index": run(backend.get_user_by_identifier, identifiers),
+    }
+    print_report(report, args.json)
+
+    if args.cleanup:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {User._meta.db_table} WHERE LOWER(email) LIKE %s", [f"%@{DOMAIN}"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Drive booking -> payment initiate -> webhook -> paid flows against a running app.
+
+Start the fake providers with webhooks pointed at the app, the app itself with
+STRIPE_SECRET_KEY / STRIPE_API_BASE (or BKASH_*) pointed at the fake server, and
+the webhook worker, then run e.g.:
+
+    python manage.py run_fake_providers --webhook-url http://127.0.0.1:8000 --latency-ms 80
+    python manage.py process_webhooks --loop --idle-sleep 0.05
+    python -m benchmarks.payment_flow --base-url http://127.0.0.1:8000 --flows 200 --concurrency 20
+
+Start the app with THROTTLE_REGISTER_IP_RATE= and THROTTLE_BOOKING_RATE= (empty) so
+the per-IP and per-user throttles do not reject the load itself.
+"""
+import argparse
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from benchmarks.common import print_report, summarize
+
+
+class FlowRunner:
+    def __init__(self, base_url, provider, poll_interval, poll_timeout):
+        self.base_url = base_url.rstrip("/")
+        self.provider = provider
+        self.poll_interval = poll_interval
+        self.poll_timeout = poll_timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.timings = {"booking_create": [], "payment_initiate": [], "initiate_to_paid": [], "flow_total": []}
+        self.errors = {}
+
+    def _session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
+    def _record(self, name, seconds):
+        with self.lock:
+            self.timings[name].append(seconds)
+
+    def _error(self, stage, detail):
+        with self.lock:
+            key = f"{stage}: {detail}"[:120]
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def register(self, password="LoadTest123"):
+        email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        resp = self._session().post(
+            f"{self.base_url}/auth/register/",
+            json={"email": email, "password": password, "confirm_password": password},
+            timeout=30,
+        )
+        resp.raise_for_status()
+        return resp.json()["access"]
+
+    def pick_property(self):
+        resp = self._session().get(f"{self.base_url}/api/properties/", timeout=30)
+        resp.raise_for_status()
+        data = resp.json()
+        items = data.get("results", data) if isinstance(data, dict) else data
+        if not items:
+            raise SystemExit("No properties available; run `manage.py seed_demo` first.")
+        return items[0]["id"]
+
+    def run_flow(self, index, token, property_id, slot_origin):
+        session = self._session()
+        headers = {"Authorization": f"Bearer {token}"}
+        start_at = slot_origin + timedelta(hours=2 * index)
+        flow_start = time.perf_counter()
+
+        t0 = time.perf_counter()
+        resp = session.post(
+            f"{self.base_url}/api/bookings/create/",
+            json={"property_id": property_id, "start_at": start_at.isoformat(), "end_at": (start_at + timedelta(hours=1)).isoformat()},
+            headers=headers,
+            timeout=30,
+        )
+        if resp.status_code != 201:
+            return self._error("booking_create", resp.status_code)
+        self._record("booking_create", time.perf_counter() - t0)
+        booking_id = resp.json()["id"]
+
+        t0 = time.perf_counter()
+        resp = session.post(
+            f"{self.base_url}/api/payments/initiate/",
+            json={"provider": self.provider, "booking_id": booking_id},
+            headers=headers,
+            timeout=60,
+        )
+        if resp.status_code not in (200, 201):
+            return self._error("payment_initiate", resp.status_code)
+        initiated = time.perf_counter()
+        self._record("payment_initiate", initiated - t0)
+
+        deadline = initiated + self.poll_timeout
+        while time.perf_counter() < deadline:
+            resp = session.get(f"{self.base_url}/api/bookings/", headers=headers, timeout=30)
+            if resp.ok and any(b["id"] == booking_id and b["status"] == "paid" for b in resp.json()):
+                now = time.perf_counter()
+                self._record("initiate_to_paid", now - initiated)
+                self._record("flow_total", now - flow_start)
+                return None
+            time.sleep(self.poll_interval)
+        return self._error("initiate_to_paid", "timeout")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--provider", default="stripe")
+    parser.add_argument("--flows", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=10, help="Distinct users to spread flows over.")
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--poll-timeout", type=float, default=30.0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+
+    runner = FlowRunner(args.base_url, args.provider, args.poll_interval, args.poll_timeout)
+    tokens = [runner.register() for _ in range(max(1, args.users))]
+    property_id = runner.pick_property()
+    # Give every flow its own slot far in the future so bookings never overlap.
+    slot_origin = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=365 + uuid.uuid4().int % 3650)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for index in range(args.flows):
+            executor.submit(runner.run_flow, index, tokens[index % len(tokens)], property_id, slot_origin)
+    elapsed = time.perf_counter() - started
+
+    report = {name: summarize(values, elapsed) for name, values in runner.timings.items()}
+    report["completed_flows"] = len(runner.timings["flow_total"])
+    report["elapsed_s"] = round(elapsed, 2)
+    report["errors"] = runner.errors
+    print_report(report, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Compare the property read endpoints served by WSGI (sync DRF views) and ASGI
+(async views) at increasing concurrency.
+
+Start both deployments against the same database and Mongo, e.g.:
+
+    gunicorn realestate.wsgi --workers 4 --threads 8 --bind 127.0.0.1:8000
+    ASYNC_PROPERTY_VIEWS=true uvicorn realestate.asgi:application --workers 4 --port 8001
+    python -m benchmarks.property_reads \\
+        --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001 \\
+        --concurrency 10 50 200 --requests 2000
+
+Each request picks a list, category, detail or recommendations call (detail and
+recommendations over the slugs returned by the list). Seed data first with
+``manage.py seed_demo``.
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.common import print_report, summarize
+
+
+class ReadRunner:
+    def __init__(self, base_url, slugs):
+        self.base_url = base_url.rstrip("/")
+        self.slugs = slugs
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+
+    def _session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
+    def _path(self, rng):
+        slug = rng.choice(self.slugs)
+        return rng.choice(
+            [
+                "/api/properties/",
+                "/api/categories/",
+                f"/api/properties/{slug}/",
+                f"/api/properties/{slug}/recommendations/",
+            ]
+        )
+
+    def request(self, seed):
+        path = self._path(random.Random(seed))
+        start = time.perf_counter()
+        try:
+            ok = self._session().get(f"{self.base_url}{path}", timeout=60).ok
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            if ok:
+                self.latencies.append(elapsed)
+            else:
+                self.errors += 1
+
+
+def fetch_slugs(base_url, limit):
+    resp = requests.get(f"{base_url.rstrip('/')}/api/properties/", timeout=60)
+    resp.raise_for_status()
+    data = resp.json()
+    items = data.get("results", data) if isinstance(data, dict) else data
+    if not items:
+        raise SystemExit("No properties available; run `manage.py seed_demo` first.")
+    return [item["slug"] for item in items[:limit]]
+
+
+def run(base_url, slugs, concurrency, total):
+    runner = ReadRunner(base_url, slugs)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(runner.request, range(total)))
+    elapsed = time.perf_counter() - started
+    summary = summarize(runner.latencies, elapsed)
+    summary["errors"] = runner.errors
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--target",
+        action="append",
+        required=True,
+        help="label=base_url of a running deployment; repeat to compare several.",
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per target and concurrency level.")
+    parser.add_argument("--slugs", type=int, default=50, help="Distinct properties to spread detail calls over.")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+
+    targets = []
+    for target in args.target:
+        label, _, url = target.partition("=")
+        if not url:
+            parser.error(f"--target must look like label=url, got {target!r}")
+        targets.append((label, url))
+
+    slugs = fetch_slugs(targets[0][1], args.slugs)
+    report = {}
+    for label, url in targets:
+        if args.warmup:
+            run(url, slugs, min(10, args.warmup), args.warmup)
+        for concurrency in args.concurrency:
+            report[f"{label} c={concurrency}"] = run(url, slugs, concurrency, args.requests)
+    print_report(report, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,45 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
+from django.utils import timezone
+
+from core.admin import LargeTableAdminMixin
+from users.dashboard import invalidate_dashboards
+from users.events import publish_events
 
 from .models import Booking
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("id", "user", "property", "status", "total_amount", "start_at", "end_at", "created_at")
     list_filter = ("status",)
-    search_fields = ("id", "user__email", "property__name")
+    list_select_related = ("user", "property")
+    list_only = (
+        "id",
+        "status",
+        "total_amount",
+        "start_at",
+        "end_at",
+        "created_at",
+        "user__id",
+        "user__email",
+        "property__id",
+        "property__name",
+    )
+    # Primary key, the Lower(email) index on users and the property name prefix index.
+    search_lookups = {"id": "pk", "user__email": "iexact", "property__name": "iprefix"}
     raw_id_fields = ("user", "property")
+    actions = ("cancel_bookings",)
+
+    @admin.action(description="Cancel selected pending bookings", permissions=["change"])
+    def cancel_bookings(self, request, queryset):
+        pending = queryset.filter(status=Booking.STATUS_PENDING)
+        with transaction.atomic():
+            rows = list(pending.values_list("id", "user_id"))
+            updated = pending.update(status=Booking.STATUS_CANCELED, updated_at=timezone.now())
+            invalidate_dashboards(user_id for _, user_id in rows)
+            publish_events(
+                (user_id, {"type": "booking", "booking_id": booking_id, "status": Booking.STATUS_CANCELED})
+                for booking_id, user_id in rows
+            )
+        self.message_user(request, f"{updated} bookings canceled.", messages.SUCCESS)
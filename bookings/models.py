@@ -2,6 +2,8 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from users.events import publish_booking_status
+
 
 class Booking(models.Model):
     STATUS_PENDING = "pending"
@@ -51,3 +53,4 @@ class Booking(models.Model):
     def cancel(self):
         self.status = Booking.STATUS_CANCELED
         self.save(update_fields=["status", "updated_at"])
+        publish_booking_status(self)
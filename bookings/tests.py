@@ -1,12 +1,16 @@
 from decimal import Decimal
 from datetime import timedelta
+from unittest import mock
 
+from django.db import transaction
+from django.test import TransactionTestCase
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 
+from bookings import views
 from properties.models import Category, Property
 from users.models import User
 
@@ -69,3 +73,33 @@ class BookingTests(APITestCase):
         )
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("not available", resp.data["detail"].lower())
+
+
+class BookingCreateLockTests(TransactionTestCase):
+    """The property row lock is taken inside the booking transaction (PostgreSQL rejects it outside one)."""
+
+    client_class = APIClient
+
+    def test_locked_lookup_runs_in_transaction(self):
+        user = User.objects.create_user(email="locker@example.com", password="StrongPass123")
+        category = Category.objects.create(name="Residential", slug="lock-cat")
+        property_obj = Property.objects.create(
+            name="Lock View", slug="lock-view", description="", location="Beach", price=Decimal("10.00"), category=category
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        autocommit = []
+
+        def lookup(*args, **kwargs):
+            autocommit.append(transaction.get_autocommit())
+            return get_object_or_404(*args, **kwargs)
+
+        get_object_or_404 = views.get_object_or_404
+        start = timezone.now() + timedelta(days=1)
+        with mock.patch.object(views, "get_object_or_404", side_effect=lookup):
+            resp = self.client.post(
+                reverse("booking-create"),
+                {"property_id": property_obj.id, "start_at": start.isoformat(), "end_at": (start + timedelta(hours=1)).isoformat()},
+                format="json",
+            )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(autocommit, [False])
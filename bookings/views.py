@@ -9,6 +9,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.throttling import BookingCreateThrottle
 from properties.models import Property
 
 from .models import Booking
@@ -19,6 +20,7 @@ from .serializers import BookingSerializer
 
 class BookingCreateView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [BookingCreateThrottle]
 
     def post(self, request):
         property_id = request.data.get("property_id")
@@ -36,11 +38,13 @@ class BookingCreateView(APIView):
         if end_at <= start_at:
             return Response({"detail": "end_at must be after start_at."}, status=status.HTTP_400_BAD_REQUEST)
 
-        property_obj = get_object_or_404(
-            Property.objects.select_for_update().filter(status=Property.STATUS_ACTIVE),
-            id=property_id,
-        )
         with transaction.atomic():
+            # select_for_update needs the transaction (PostgreSQL raises outside one). The category
+            # is serialized in the response; lock only the property row.
+            property_obj = get_object_or_404(
+                Property.objects.select_related("category").select_for_update(of=("self",)).filter(status=Property.STATUS_ACTIVE),
+                id=property_id,
+            )
             if not property_obj.is_available(start_at, end_at):
                 return Response({"detail": "Property is not available for that slot."}, status=status.HTTP_400_BAD_REQUEST)
             total_amount = Decimal(property_obj.price)
@@ -57,6 +61,7 @@ class BookingCreateView(APIView):
 
 
 class BookingListView(APIView):
+    read_replica = True
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
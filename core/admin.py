@@ -0,0 +1,213 @@
+"""
+Admin changelists that stay fast on large tables.
+
+``LargeTableAdminMixin`` (list it before ``admin.ModelAdmin``) pages with
+``LargeTablePaginator``, skips the unfiltered "N total" count, orders by ``-pk``
+and, when the admin sets ``list_only``, loads only those columns on the
+changelist (change forms still load full rows).
+
+Its search (``search_lookups``) only issues predicates an index serves. Django's
+``search_fields`` prefixes compile to ``UPPER(col::text) = UPPER(%s)`` and
+``UPPER(col::text) LIKE UPPER(%s)``, which no plain index matches.
+
+Also registers the read-only slow query log (``core.SlowQuery``).
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.db.models.functions import Lower, Upper
+from django.db.models.lookups import Exact, StartsWith
+from django.utils.functional import cached_property
+
+from .models import SlowQuery
+
+KEYSET_PREFIX = "admin:keyset:"
+
+
+def estimated_row_count(model, using="default"):
+    """
+    Planner estimate of ``model``'s row count: ``pg_class.reltuples`` on
+    PostgreSQL, ``sqlite_stat1`` on SQLite (after ``ANALYZE``). None when the
+    table has no statistics yet.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                    [connection.ops.quote_name(table)],
+                )
+                row = cursor.fetchone()
+                # -1 until the table is first vacuumed or analyzed.
+                return int(row[0]) if row and row[0] >= 0 else None
+            if connection.vendor == "sqlite":
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except DatabaseError:
+        return None
+    return None
+
+
+class LargeTablePaginator(Paginator):
+    """
+    * ``count``: an unfiltered changelist over at least
+      ``ADMIN_ESTIMATED_COUNT_THRESHOLD`` rows uses the planner estimate;
+      otherwise rows are counted up to ``ADMIN_COUNT_LIMIT`` (later pages of a
+      huge filtered result are not linked).
+    * ``page``: past ``ADMIN_KEYSET_OFFSET`` rows, and when ordered by the primary
+      key alone, the page is read with ``pk < last pk of the previous page``
+      (remembered in the cache) instead of ``OFFSET``. Jumping straight to a deep
+      page finds its first key with an index-only offset, then seeks from it.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return queryset.order_by()[: settings.ADMIN_COUNT_LIMIT].count()
+
+    def _pk_direction(self):
+        order_by = self.object_list.query.order_by
+        if len(order_by) != 1:
+            return None
+        name = order_by[0]
+        field = name.lstrip("-")
+        if field not in ("pk", self.object_list.model._meta.pk.name):
+            return None
+        return "desc" if name.startswith("-") else "asc"
+
+    def _cache_key(self):
+        query = str(self.object_list.query).encode("utf-8")
+        return f"{KEYSET_PREFIX}{hashlib.sha256(query).hexdigest()[:32]}:{self.per_page}"
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        direction = self._pk_direction()
+        if bottom < settings.ADMIN_KEYSET_OFFSET or direction is None:
+            return super().page(number)
+
+        queryset = self.object_list
+        after, before = ("pk__lt", "pk__lte") if direction == "desc" else ("pk__gt", "pk__gte")
+        key = self._cache_key()
+        try:
+            previous_last = cache.get(f"{key}:{number - 1}")
+        except Exception:
+            previous_last = None
+        if previous_last is not None:
+            queryset = queryset.filter(**{after: previous_last})
+        else:
+            first = list(queryset.values_list("pk", flat=True)[bottom : bottom + 1])
+            if not first:
+                return super().page(number)
+            queryset = queryset.filter(**{before: first[0]})
+        object_list = list(queryset[: self.per_page])
+        if object_list:
+            try:
+                cache.set(f"{key}:{number}", object_list[-1].pk, settings.ADMIN_KEYSET_CACHE_TTL)
+            except Exception:
+                pass
+        return self._get_page(object_list, number, self)
+
+
+class LargeTableChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.model_admin.list_only:
+            queryset = queryset.only(*self.model_admin.list_only)
+        return queryset
+
+
+def search_condition(model, path, kind, term):
+    """
+    Index-backed condition for one ``search_lookups`` entry, or None when
+    ``term`` cannot match it:
+
+    * ``"pk"``: numeric terms only, ``path = int(term)`` (a primary or foreign key).
+    * ``"exact"``: ``path = term``, for unique or indexed id-like columns.
+    * ``"iexact"``: ``LOWER(path) = lower(term)``, needs a ``Lower(path)`` index.
+    * ``"iprefix"``: ``UPPER(path) LIKE 'TERM%'``, needs a ``PrefixIndex(Upper(path))``.
+
+    A path across a relation (``user__email``) is resolved to at most
+    ``ADMIN_SEARCH_RELATED_LIMIT`` related keys first, so the changelist query
+    is ``fk IN (...)`` and several conditions combine as a bitmap OR of indexes.
+    """
+    if kind == "pk":
+        return Q(**{path: int(term)}) if term.isdigit() else None
+    if "__" in path:
+        relation, rest = path.split("__", 1)
+        related = model._meta.get_field(relation).related_model
+        condition = search_condition(related, rest, kind, term)
+        if condition is None:
+            return None
+        keys = list(
+            related._default_manager.filter(condition).values_list("pk", flat=True)[: settings.ADMIN_SEARCH_RELATED_LIMIT]
+        )
+        return Q(**{f"{relation}__in": keys}) if keys else None
+    if kind == "exact":
+        return Q(**{path: term})
+    if kind == "iexact":
+        return Q(Exact(Lower(path), term.lower()))
+    if kind == "iprefix":
+        return Q(StartsWith(Upper(path), term.upper()))
+    raise ValueError(f"Unknown search lookup kind {kind!r} for {path!r}.")
+
+
+class LargeTableAdminMixin:
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+    ordering = ("-pk",)
+    # Columns the changelist loads, including the paths in list_select_related.
+    list_only = None
+    # Searchable paths and how each is matched (see search_condition); replaces search_fields.
+    search_lookups = {}
+
+    def get_changelist(self, request, **kwargs):
+        return LargeTableChangeList
+
+    def get_search_fields(self, request):
+        return tuple(self.search_lookups) or super().get_search_fields(request)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not self.search_lookups:
+            return super().get_search_results(request, queryset, search_term)
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        conditions = [
+            condition
+            for path, kind in self.search_lookups.items()
+            if (condition := search_condition(queryset.model, path, kind, term)) is not None
+        ]
+        if not conditions:
+            return queryset.none(), False
+        combined = conditions[0]
+        for condition in conditions[1:]:
+            combined |= condition
+        return queryset.filter(combined), False
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ("fingerprint", "view", "calls", "total_ms", "max_ms", "last_seen")
+    list_filter = ("alias",)
+    search_fields = ("=fingerprint", "view")
+    readonly_fields = [field.name for field in SlowQuery._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = "core"
+
+    def ready(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        from .sql_hooks import install
+
+        connection_created.connect(install, dispatch_uid="core.sql_hooks")
+        # Connections opened before the app registry was ready.
+        for connection in connections.all(initialized_only=True):
+            install(connection)
@@ -1,5 +1,7 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
 
 
 class EmailOrAdminUsernameBackend(ModelBackend):
@@ -10,15 +12,20 @@ class EmailOrAdminUsernameBackend(ModelBackend):
         identifier = username or kwargs.get(User.USERNAME_FIELD)
         if not identifier:
             return None
-        user = None
-        try:
-            user = User.objects.get(email__iexact=identifier)
-        except User.DoesNotExist:
-            try:
-                user = User.objects.get(admin_username__iexact=identifier)
-            except User.DoesNotExist:
-                return None
-
+        user = self.get_user_by_identifier(identifier)
         if user and user.check_password(password) and self.user_can_authenticate(user):
             return user
         return None
+
+    def get_user_by_identifier(self, identifier):
+        """Match email or admin_username case-insensitively; an email match wins."""
+        # One query served by the Lower(email) / Lower(admin_username) indexes.
+        lookup = Lower(Value(identifier))
+        candidates = list(
+            get_user_model()
+            .objects.alias(email_lower=Lower("email"), admin_lower=Lower("admin_username"))
+            .filter(Q(email_lower=lookup) | Q(admin_lower=lookup))[:2]
+        )
+        if not candidates:
+            return None
+        return next((c for c in candidates if c.email.lower() == identifier.lower()), candidates[0])
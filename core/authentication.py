@@ -0,0 +1,67 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from core.revocation import is_token_revoked
+
+logger = logging.getLogger(__name__)
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    try:
+        cache.delete(user_cache_key(user_id))
+    except Exception as exc:
+        logger.warning("Could not invalidate cached user %s: %s", user_id, exc)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that keeps resolved users in the cache for
+    ``AUTH_USER_CACHE_TTL`` seconds, so most requests skip the users query.
+    Entries are dropped whenever the user is saved or deleted (see users.signals),
+    and the active / password-changed checks still run on every request.
+    Revoked tokens (see core.revocation) are rejected before the user lookup.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_token_revoked(token):
+            raise InvalidToken({"detail": "Token has been revoked.", "code": "token_revoked"})
+        return token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not settings.AUTH_USER_CACHE_TTL:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        try:
+            user = cache.get(key)
+        except Exception as exc:
+            logger.warning("User cache unavailable: %s", exc)
+            return super().get_user(validated_token)
+        if user is None:
+            user = super().get_user(validated_token)
+            try:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TTL)
+            except Exception as exc:
+                logger.warning("User cache unavailable: %s", exc)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+        return user
@@ -0,0 +1,204 @@
+"""
+Stampede-protected cache reads.
+
+``get_or_compute(key, compute, ttl)`` stores ``(value, expires_at, cost)``
+envelopes that outlive their logical expiry by ``stale_ttl`` seconds:
+
+* Fresh entries are returned as is, except that a request may volunteer to
+  recompute early with a probability that grows as expiry approaches and with
+  how long the value took to compute (probabilistic early expiration, "XFetch").
+* Only the request that wins a short ``cache.add`` lock recomputes; everyone
+  else keeps serving the stale value meanwhile (stale-while-revalidate).
+* On a cold miss, requests that lose the lock wait briefly for the winner's
+  value before computing it themselves.
+* ``None`` results are cached as an explicit empty sentinel, for
+  ``negative_ttl`` seconds, so "nothing there" does not look like a miss.
+
+Cache errors never fail the caller: the value is computed directly. A value
+that is not an envelope (e.g. written under the same key by older code during a
+rolling deploy) counts as a miss and is overwritten.
+"""
+import asyncio
+import logging
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+from core.metrics import inc, timed
+
+logger = logging.getLogger(__name__)
+
+EMPTY = "__cache_empty__"
+LOCK_SUFFIX = ":lock"
+
+
+def _as_envelope(cached):
+    """``cached`` if it is a ``(value, expires_at, cost)`` envelope, else None (a miss)."""
+    if (
+        isinstance(cached, tuple)
+        and len(cached) == 3
+        and isinstance(cached[1], (int, float))
+        and isinstance(cached[2], (int, float))
+    ):
+        return cached
+    return None
+
+
+def _should_refresh(envelope, beta, now):
+    _, expires_at, cost = envelope
+    if now >= expires_at:
+        return True
+    # 1 - random() is in (0, 1], so the log is finite.
+    return now - cost * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _envelope(value, ttl, negative_ttl, cost):
+    if value is None:
+        return EMPTY, time.time() + (ttl if negative_ttl is None else negative_ttl), cost
+    return value, time.time() + ttl, cost
+
+
+def _unwrap(envelope):
+    value = envelope[0]
+    return None if value == EMPTY else value
+
+
+def get_or_compute(
+    key, compute, ttl, *, stale_ttl=None, negative_ttl=None, beta=1.0, lock_timeout=10, wait=2.0, name=None
+):
+    """
+    Return the cached value for ``key``, calling ``compute()`` at most once across
+    workers when it is due. ``name`` labels the metrics (defaults to ``key``; pass
+    one for per-user keys).
+    """
+    name = name or key
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    lock_key = key + LOCK_SUFFIX
+    try:
+        with timed("cache_operation_duration_seconds", operation="get"):
+            envelope = _as_envelope(cache.get(key))
+    except Exception as exc:
+        logger.warning("Cache unavailable for %s: %s", key, exc)
+        return compute()
+
+    if envelope is not None:
+        if not _should_refresh(envelope, beta, time.time()):
+            inc("cache_requests_total", key=name, result="hit")
+            return _unwrap(envelope)
+        if not _try_lock(lock_key, lock_timeout):
+            inc("cache_requests_total", key=name, result="stale")
+            return _unwrap(envelope)
+        inc("cache_requests_total", key=name, result="refresh")
+    else:
+        inc("cache_requests_total", key=name, result="miss")
+        if not _try_lock(lock_key, lock_timeout):
+            deadline = time.monotonic() + wait
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                try:
+                    envelope = _as_envelope(cache.get(key))
+                except Exception:
+                    break
+                if envelope is not None:
+                    return _unwrap(envelope)
+            return compute()
+
+    try:
+        start = time.perf_counter()
+        value = compute()
+        _store(key, _envelope(value, ttl, negative_ttl, time.perf_counter() - start), ttl + stale_ttl)
+        return value
+    finally:
+        _release(lock_key)
+
+
+async def aget_or_compute(
+    key, compute, ttl, *, stale_ttl=None, negative_ttl=None, beta=1.0, lock_timeout=10, wait=2.0, name=None
+):
+    """Async ``get_or_compute``; ``compute`` is a coroutine function."""
+    name = name or key
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    lock_key = key + LOCK_SUFFIX
+    try:
+        with timed("cache_operation_duration_seconds", operation="get"):
+            envelope = _as_envelope(await cache.aget(key))
+    except Exception as exc:
+        logger.warning("Cache unavailable for %s: %s", key, exc)
+        return await compute()
+
+    if envelope is not None:
+        if not _should_refresh(envelope, beta, time.time()):
+            inc("cache_requests_total", key=name, result="hit")
+            return _unwrap(envelope)
+        if not await _atry_lock(lock_key, lock_timeout):
+            inc("cache_requests_total", key=name, result="stale")
+            return _unwrap(envelope)
+        inc("cache_requests_total", key=name, result="refresh")
+    else:
+        inc("cache_requests_total", key=name, result="miss")
+        if not await _atry_lock(lock_key, lock_timeout):
+            deadline = time.monotonic() + wait
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                try:
+                    envelope = _as_envelope(await cache.aget(key))
+                except Exception:
+                    break
+                if envelope is not None:
+                    return _unwrap(envelope)
+            return await compute()
+
+    try:
+        start = time.perf_counter()
+        value = await compute()
+        envelope = _envelope(value, ttl, negative_ttl, time.perf_counter() - start)
+        try:
+            with timed("cache_operation_duration_seconds", operation="set"):
+                await cache.aset(key, envelope, ttl + stale_ttl)
+        except Exception as exc:
+            logger.warning("Could not cache %s: %s", key, exc)
+        return value
+    finally:
+        try:
+            await cache.adelete(lock_key)
+        except Exception:
+            pass
+
+
+def invalidate(key):
+    """Drop ``key`` so the next read recomputes it."""
+    try:
+        cache.delete(key)
+    except Exception as exc:
+        logger.warning("Could not invalidate %s: %s", key, exc)
+
+
+def _try_lock(lock_key, timeout):
+    try:
+        return cache.add(lock_key, 1, timeout)
+    except Exception:
+        return True
+
+
+async def _atry_lock(lock_key, timeout):
+    try:
+        return await cache.aadd(lock_key, 1, timeout)
+    except Exception:
+        return True
+
+
+def _store(key, envelope, timeout):
+    try:
+        with timed("cache_operation_duration_seconds", operation="set"):
+            cache.set(key, envelope, timeout)
+    except Exception as exc:
+        logger.warning("Could not cache %s: %s", key, exc)
+
+
+def _release(lock_key):
+    try:
+        cache.delete(lock_key)
+    except Exception:
+        pass
@@ -0,0 +1,196 @@
+"""
+Primary/replica database routing.
+
+Catalog, booking and payment reads go to a replica from ``DATABASE_REPLICAS``
+only inside requests for views marked ``read_replica = True`` (safe methods),
+and only while the request has not written anything. Everything else, including
+``select_for_update`` and reads inside an atomic block the view opened, uses
+``default``.
+
+A request that writes makes its client (identified by the Authorization header
+or session cookie) stick to the primary for ``DATABASE_REPLICA_STICKY_SECONDS``,
+so users read their own writes. Replicas whose lag exceeds
+``DATABASE_REPLICA_MAX_LAG`` seconds, or that cannot be probed, are skipped
+until the next check, ``DATABASE_REPLICA_CHECK_INTERVAL`` seconds later.
+"""
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+STICKY_PREFIX = "db:sticky:"
+
+_routing = ContextVar("db_routing", default=None)
+
+
+class RoutingState:
+    __slots__ = ("use_replica", "wrote", "atomic_depth")
+
+    def __init__(self, use_replica=False):
+        self.use_replica = use_replica
+        self.wrote = False
+        # Atomic blocks already open when the request started (e.g. a test case's).
+        self.atomic_depth = len(connections[DEFAULT_DB_ALIAS].atomic_blocks)
+
+
+def measure_lag(alias):
+    """Replication lag of ``alias`` in seconds (0 for backends without replication, e.g. sqlite)."""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+class ReplicaHealth:
+    """Per-process view of which replicas are within the allowed lag."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._healthy = {}
+        self._next_check = 0.0
+
+    def healthy(self, aliases):
+        now = time.monotonic()
+        if now >= self._next_check and self._lock.acquire(blocking=not self._healthy):
+            try:
+                if now >= self._next_check:
+                    self._refresh(aliases)
+                    self._next_check = now + settings.DATABASE_REPLICA_CHECK_INTERVAL
+            finally:
+                self._lock.release()
+        return [alias for alias in aliases if self._healthy.get(alias)]
+
+    def _refresh(self, aliases):
+        healthy = {}
+        for alias in aliases:
+            try:
+                lag = measure_lag(alias)
+            except Exception as exc:
+                logger.warning("Replica %s unavailable: %s", alias, exc)
+                healthy[alias] = False
+                continue
+            healthy[alias] = lag <= settings.DATABASE_REPLICA_MAX_LAG
+            if not healthy[alias]:
+                logger.warning("Replica %s is %.1fs behind; reading from the primary.", alias, lag)
+        self._healthy = healthy
+
+    def reset(self):
+        with self._lock:
+            self._healthy = {}
+            self._next_check = 0.0
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    # Users, sessions and tokens always read from the primary: a lagging replica
+    # must not reject a user who has just registered.
+    replica_apps = {"properties", "bookings", "payments"}
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.use_replica or state.wrote or not settings.DATABASE_REPLICAS:
+            return None
+        if model._meta.app_label not in self.replica_apps:
+            return None
+        if len(connections[DEFAULT_DB_ALIAS].atomic_blocks) > state.atomic_depth:
+            return None
+        replicas = replica_health.healthy(settings.DATABASE_REPLICAS)
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+
+def _client_key(request):
+    identity = request.headers.get("Authorization") or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not identity:
+        return None
+    return STICKY_PREFIX + hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+
+def _is_sticky(key):
+    try:
+        return key is not None and cache.get(key) is not None
+    except Exception as exc:
+        logger.warning("Sticky-primary lookup failed: %s", exc)
+        return True
+
+
+def _wants_replica(request):
+    if request.method not in SAFE_METHODS or not settings.DATABASE_REPLICAS:
+        return False
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+    view = getattr(match.func, "view_class", match.func)
+    return getattr(view, "read_replica", False) and not _is_sticky(_client_key(request))
+
+
+class ReplicaRoutingMiddleware:
+    """Scopes replica routing to one request and records writes for stickiness."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState(_wants_replica(request))
+        token = _routing.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            _routing.reset(token)
+            self._finish(request, state)
+
+    async def __acall__(self, request):
+        state = RoutingState(_wants_replica(request))
+        token = _routing.set(state)
+        try:
+            return await self.get_response(request)
+        finally:
+            _routing.reset(token)
+            self._finish(request, state)
+
+    @staticmethod
+    def _finish(request, state):
+        if not state.wrote or not settings.DATABASE_REPLICAS:
+            return
+        key = _client_key(request)
+        if key is None:
+            return
+        try:
+            cache.set(key, 1, settings.DATABASE_REPLICA_STICKY_SECONDS)
+        except Exception as exc:
+            logger.warning("Could not pin client to the primary: %s", exc)
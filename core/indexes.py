@@ -0,0 +1,22 @@
+"""
+Indexes for prefix searches (``LIKE 'abc%'``).
+
+On PostgreSQL a btree only serves ``LIKE`` with a pattern operator class
+(unless the database collation is ``C``), and ``Index.opclasses`` cannot be
+combined with expressions. ``PrefixIndex`` wraps each expression in
+``OpClass(..., "text_pattern_ops")`` on PostgreSQL and creates a plain index
+elsewhere, so the same migration runs on SQLite.
+"""
+from django.contrib.postgres.indexes import OpClass
+from django.db import models
+
+
+class PrefixIndex(models.Index):
+    """``PrefixIndex(Upper("name"), name=...)`` serves ``Upper("name")`` ``startswith`` filters."""
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor == "postgresql" and self.expressions:
+            index = self.clone()
+            index.expressions = tuple(OpClass(expression, name="text_pattern_ops") for expression in self.expressions)
+            return super(PrefixIndex, index).create_sql(model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
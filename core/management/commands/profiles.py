@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import HEADER, list_profiles, load_profile, make_token
+
+
+class Command(BaseCommand):
+    help = "List stored request profiles, show one, or issue an X-Profile token for a staff user."
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest="action")
+        listing = sub.add_parser("list", help="Newest profiles first (the default).")
+        listing.add_argument("--limit", type=int, default=20)
+        show = sub.add_parser("show", help="Hot functions, queries and calls of one profile.")
+        show.add_argument("profile_id")
+        show.add_argument("--limit", type=int, default=15)
+        show.add_argument("--sort", choices=["tottime", "cumtime"], default="tottime")
+        token = sub.add_parser("token", help="Signed X-Profile header value for a staff user.")
+        token.add_argument("--email", required=True)
+
+    def handle(self, *args, **options):
+        action = options.get("action") or "list"
+        if action == "token":
+            self._token(options["email"])
+        elif action == "show":
+            self._show(options["profile_id"], options["limit"], options["sort"])
+        else:
+            self._list(options.get("limit") or 20)
+
+    def _token(self, email):
+        user = get_user_model().objects.filter(email__iexact=email, is_staff=True, is_active=True).first()
+        if user is None:
+            raise CommandError(f"No active staff user {email}.")
+        self.stdout.write(f"{HEADER}: {make_token(user)}")
+
+    def _list(self, limit):
+        profiles = list_profiles()[:limit]
+        if not profiles:
+            self.stdout.write("No profiles stored.")
+            return
+        for p in profiles:
+            self.stdout.write(
+                f"{p['id']}  {p['started_at']}  {p['status']}  {p['duration_ms']:8.1f} ms  "
+                f"{len(p['queries']):4d} queries  {p['method']} {p['path']}  [{p['trigger']}]"
+            )
+
+    def _show(self, profile_id, limit, sort):
+        p = load_profile(profile_id)
+        if p is None:
+            raise CommandError(f"No profile {profile_id}.")
+        self.stdout.write(f"{p['method']} {p['path']} -> {p['status']} in {p['duration_ms']:.1f} ms [{p['trigger']}]")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nHot functions (by {sort})"))
+        if not p["profiled"]:
+            self.stdout.write("cProfile was busy with another request; no function stats.")
+        functions = sorted(p["functions"], key=lambda row: row[f"{sort}_ms"], reverse=True)[:limit]
+        for row in functions:
+            self.stdout.write(
+                f"{row['tottime_ms']:9.2f} {row['cumtime_ms']:9.2f} ms {row['calls']:7d}x  {row['function']}"
+            )
+
+        total_sql = sum(q["ms"] for q in p["queries"])
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nQueries ({len(p['queries'])}, {total_sql:.1f} ms)"))
+        grouped = defaultdict(lambda: [0, 0.0])
+        for q in p["queries"]:
+            grouped[q["sql"]][0] += 1
+            grouped[q["sql"]][1] += q["ms"]
+        for sql, (count, ms) in sorted(grouped.items(), key=lambda item: item[1][1], reverse=True)[:limit]:
+            self.stdout.write(f"{ms:9.2f} ms {count:5d}x  {sql[:200]}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nCache / Mongo / provider calls ({len(p['calls'])})"))
+        calls = defaultdict(lambda: [0, 0.0])
+        for c in p["calls"]:
+            calls[(c["kind"], c["operation"], c["target"])][0] += 1
+            calls[(c["kind"], c["operation"], c["target"])][1] += c["ms"]
+        for (kind, operation, target), (count, ms) in sorted(calls.items(), key=lambda item: item[1][1], reverse=True)[:limit]:
+            self.stdout.write(f"{ms:9.2f} ms {count:5d}x  {kind} {operation} {target}")
+        for name, value in sorted(p["counters"].items()):
+            self.stdout.write(f"{value:>12}  {name}")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from core.models import SlowQuery
+from core.slow_queries import slow_query_log
+
+
+class Command(BaseCommand):
+    help = "Rank slow query fingerprints by total time (recorded by core.slow_queries)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--sort", choices=["total", "max", "calls"], default="total")
+        parser.add_argument("--view", help="Only fingerprints last issued by this view.")
+        parser.add_argument("--plans", action="store_true", help="Print the captured EXPLAIN plans.")
+        parser.add_argument("--reset", action="store_true", help="Delete all recorded fingerprints.")
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} fingerprints."))
+            return
+        # Include anything this process queued but has not flushed yet.
+        slow_query_log.drain()
+        order = {"total": "-total_ms", "max": "-max_ms", "calls": "-calls"}[options["sort"]]
+        queryset = SlowQuery.objects.order_by(order)
+        if options["view"]:
+            queryset = queryset.filter(view=options["view"])
+        rows = list(queryset[: options["limit"]])
+        if not rows:
+            self.stdout.write("No slow queries recorded.")
+            return
+        for row in rows:
+            avg = row.total_ms / row.calls if row.calls else 0
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"{row.total_ms:10.1f} ms total  {row.calls:6d} calls  avg {avg:8.1f}  max {row.max_ms:8.1f}  "
+                    f"[{row.alias}] {row.view}  {row.fingerprint[:12]}"
+                )
+            )
+            self.stdout.write(f"  {row.sql[:500]}")
+            if options["plans"] and row.plan:
+                for line in row.plan.splitlines():
+                    self.stdout.write(f"    {line}")
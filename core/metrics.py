@@ -0,0 +1,313 @@
+"""
+In-process latency histograms with a Prometheus text exposition.
+
+Each process records into its own registry. When ``METRICS_DIR`` is set, every
+process also dumps its registry to ``<METRICS_DIR>/metrics-<pid>.json`` (at most
+once per ``METRICS_FLUSH_INTERVAL`` seconds) and ``/metrics`` merges all files,
+so the numbers add up across gunicorn workers whichever worker serves the scrape.
+Files left by workers that have exited are deleted on the next scrape; the
+liveness check assumes all workers run on the host serving ``/metrics``.
+
+``/metrics`` needs ``Authorization: Bearer <METRICS_TOKEN>`` when a token is
+configured; otherwise only staff users and ``METRICS_ALLOWED_IPS`` may scrape it.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from core.sql_hooks import sql_wrapper
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "http_request_duration_seconds": "Django request latency by route.",
+    "db_query_duration_seconds": "SQL statement latency by database alias.",
+    "cache_operation_duration_seconds": "Django cache call latency.",
+    "cache_requests_total": "Cache lookups by result.",
+    "cache_tier_requests_total": "Two-tier cache lookups by tier (local LRU, redis) and result.",
+    "event_stream_connections_total": "Status event (SSE) streams opened.",
+    "mongo_operation_duration_seconds": "MongoDB call latency.",
+    "provider_request_duration_seconds": "Payment provider HTTP latency by operation.",
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """Thread-safe counters and fixed-bucket histograms for one process."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._histograms = {}
+        self._counters = {}
+        self._last_flush = 0.0
+
+    def _check_fork(self):
+        # A forked worker must not re-export what its parent recorded.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def observe(self, name, seconds, **labels):
+        with self._lock:
+            self._check_fork()
+            entry = self._histograms.get(_key(name, labels))
+            if entry is None:
+                entry = self._histograms[_key(name, labels)] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry["buckets"][index] += 1
+                    break
+            entry["sum"] += seconds
+            entry["count"] += 1
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            self._check_fork()
+            key = _key(name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """JSON-friendly copy of this process's metrics (bucket counts are not cumulative)."""
+        with self._lock:
+            self._check_fork()
+            return {
+                "buckets": list(self.buckets),
+                "histograms": [[name, labels, dict(e, buckets=list(e["buckets"]))] for (name, labels), e in self._histograms.items()],
+                "counters": [[name, labels, value] for (name, labels), value in self._counters.items()],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def flush(self, directory, force=False):
+        """Write this process's snapshot into ``directory`` if the flush interval has passed."""
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp, path)
+
+
+registry = MetricsRegistry()
+
+# Optional per-request listener, called as ``listener(name, value, labels)`` for
+# every observation and increment made in its context (see core.profiling).
+listener = ContextVar("metrics_listener", default=None)
+
+
+def observe(name, seconds, **labels):
+    hook = listener.get()
+    if hook is not None:
+        hook(name, seconds, labels)
+    if settings.METRICS_ENABLED:
+        registry.observe(name, seconds, **labels)
+
+
+def inc(name, amount=1, **labels):
+    hook = listener.get()
+    if hook is not None:
+        hook(name, amount, labels)
+    if settings.METRICS_ENABLED:
+        registry.inc(name, amount, **labels)
+
+
+@contextmanager
+def timed(name, **labels):
+    """Observe the wall time of the block, e.g. ``with timed("mongo_operation_duration_seconds", operation="find")``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def _snapshots():
+    """This process's snapshot plus, with ``METRICS_DIR``, those flushed by other workers."""
+    own = registry.snapshot()
+    directory = settings.METRICS_DIR
+    if not directory or not os.path.isdir(directory):
+        return [own]
+    own_file = f"metrics-{os.getpid()}.json"
+    snapshots = [own]
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json") or filename == own_file:
+            continue
+        if not _worker_alive(filename):
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError:
+                pass
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as fh:
+                snapshots.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _worker_alive(filename):
+    """False when ``metrics-<pid>.json`` belongs to a process that no longer exists."""
+    try:
+        pid = int(filename[len("metrics-") : -len(".json")])
+    except ValueError:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def render():
+    """Merge every snapshot and return the Prometheus text format (version 0.0.4)."""
+    histograms = {}
+    counters = {}
+    for snap in _snapshots():
+        bounds = snap["buckets"]
+        for name, labels, entry in snap["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(key, {"buckets": dict.fromkeys(bounds, 0), "sum": 0.0, "count": 0})
+            for bound, count in zip(bounds, entry["buckets"]):
+                merged["buckets"][bound] = merged["buckets"].get(bound, 0) + count
+            merged["sum"] += entry["sum"]
+            merged["count"] += entry["count"]
+        for name, labels, value in snap["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+
+    lines = []
+    for kind, items in (("histogram", histograms), ("counter", counters)):
+        seen = set()
+        for name, labels in sorted(items):
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+            value = items[(name, labels)]
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound in sorted(value["buckets"]):
+                cumulative += value["buckets"][bound]
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', repr(float(bound)))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        registry.observe("db_query_duration_seconds", time.perf_counter() - start, alias=context["connection"].alias)
+
+
+class MetricsMiddleware:
+    """Times each request by resolved route and every SQL statement it runs."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        start = time.perf_counter()
+        response = None
+        try:
+            with self._db_timing():
+                response = self.get_response(request)
+            return response
+        finally:
+            self._record(request, response, start)
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        response = None
+        try:
+            with self._db_timing():
+                response = await self.get_response(request)
+            return response
+        finally:
+            self._record(request, response, start)
+
+    @staticmethod
+    def _db_timing():
+        return sql_wrapper(_db_wrapper)
+
+    @staticmethod
+    def _record(request, response, start):
+        match = getattr(request, "resolver_match", None)
+        status_code = response.status_code if response is not None else 500
+        registry.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - start,
+            method=request.method,
+            route=(match.route if match else "") or "unmatched",
+            status=f"{status_code // 100}xx",
+        )
+        if settings.METRICS_DIR:
+            try:
+                registry.flush(settings.METRICS_DIR)
+            except OSError:
+                pass
+
+
+def _may_scrape(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        return constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    user = getattr(request, "user", None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+    return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
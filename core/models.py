@@ -0,0 +1,24 @@
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """Statements slower than ``SLOW_QUERY_THRESHOLD_MS``, aggregated by fingerprint (see core.slow_queries)."""
+
+    fingerprint = models.CharField(max_length=40, unique=True)
+    sql = models.TextField(help_text="Normalized statement.")
+    alias = models.CharField(max_length=64)
+    view = models.CharField(max_length=255, blank=True, help_text="View that last issued it.")
+    calls = models.PositiveBigIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    plan = models.TextField(blank=True)
+    explained_at = models.DateTimeField(null=True, blank=True)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-total_ms",)
+        verbose_name_plural = "Slow queries"
+
+    def __str__(self):
+        return f"{self.fingerprint} ({self.calls} calls, {self.total_ms:.0f} ms)"
@@ -1,3 +1,5 @@
+import asyncio
+import weakref
 from functools import lru_cache
 
 from django.conf import settings
@@ -7,6 +9,14 @@ try:
 except Exception:  # pragma: no cover - pymongo import guard
     MongoClient = None
 
+try:
+    from pymongo import AsyncMongoClient
+except Exception:  # pragma: no cover - pymongo < 4.13
+    AsyncMongoClient = None
+
+# Async clients are bound to the event loop that created them: one per loop.
+_async_clients = weakref.WeakKeyDictionary()
+
 
 @lru_cache
 def get_mongo_client():
@@ -20,9 +30,34 @@ def get_mongo_client():
         return None
 
 
+def get_async_mongo_client():
+    """``AsyncMongoClient`` for the running event loop, or None when Mongo is not configured."""
+    if not AsyncMongoClient or not settings.MONGO_URI:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        try:
+            client = _async_clients[loop] = AsyncMongoClient(settings.MONGO_URI)
+        except Exception:
+            return None
+    return client
+
+
+def _media_collection(client):
+    db_name = settings.MONGO_DB_NAME or "realestate_media"
+    return client[db_name]["property_media"]
+
+
 def get_media_collection():
     client = get_mongo_client()
     if not client:
         return None
-    db_name = settings.MONGO_DB_NAME or "realestate_media"
-    return client[db_name]["property_media"]
+    return _media_collection(client)
+
+
+def get_async_media_collection():
+    client = get_async_mongo_client()
+    if not client:
+        return None
+    return _media_collection(client)
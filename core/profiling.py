@@ -0,0 +1,297 @@
+"""
+On-demand request profiling.
+
+``ProfilingMiddleware`` profiles a request when
+
+* it carries ``X-Profile: <token>``, a signed token from
+  ``manage.py profiles token --email <staff>`` (valid for
+  ``PROFILING_TOKEN_MAX_AGE`` seconds; works with JWT clients),
+* a staff user logged in to the admin adds ``?_profile=1``, or
+* it falls in the ``PROFILING_SAMPLE_RATE`` fraction of traffic.
+
+A profile holds the cProfile stats (hottest functions), every SQL statement
+with its duration, every cache call, and the Mongo / provider calls and cache
+counters reported through ``core.metrics``. Profiles are written as JSON to
+``PROFILING_DIR``, which keeps the newest ``PROFILING_MAX_ENTRIES`` files (a
+ring buffer); the response carries the profile id in ``X-Profile-Id``. Browse
+them with ``manage.py profiles`` and ``manage.py profiles show <id>``.
+
+cProfile runs one request at a time per process; concurrent profiled requests
+still record queries and calls. Under ASGI it sees the event loop thread only,
+so sync work offloaded to threads appears as time spent waiting.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+
+from core import metrics
+from core.sql_hooks import sql_wrapper
+
+logger = logging.getLogger(__name__)
+
+HEADER = "X-Profile"
+QUERY_FLAG = "_profile"
+TOKEN_SALT = "core.profiling"
+MAX_QUERIES = 2000
+MAX_CALLS = 2000
+
+_cprofile_lock = threading.Lock()
+
+
+def make_token(user):
+    """Signed ``X-Profile`` value for staff ``user``."""
+    return signing.dumps({"email": user.email}, salt=TOKEN_SALT, compress=True)
+
+
+def _trigger(request):
+    token = request.headers.get(HEADER)
+    if token:
+        try:
+            data = signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            logger.warning("Rejected profiling token for %s", request.path)
+        else:
+            return f"token:{data.get('email', '')}"
+    if QUERY_FLAG in request.GET:
+        user = getattr(request, "user", None)
+        if user is not None and user.is_staff:
+            return f"staff:{user.email}"
+    rate = settings.PROFILING_SAMPLE_RATE
+    if rate > 0 and random.random() < rate:
+        return "sample"
+    return None
+
+
+class RecordingCache:
+    """Wraps a cache backend for one request and times every call made through it."""
+
+    methods = {
+        "get", "get_many", "set", "set_many", "add", "delete", "delete_many", "incr", "decr", "touch",
+        "has_key", "get_or_set", "clear",
+    }
+
+    def __init__(self, backend, profile):
+        self._backend = backend
+        self._profile = profile
+
+    def __getattr__(self, name):
+        attr = getattr(self._backend, name)
+        if name in self.methods:
+            return self._wrap(name, attr)
+        if name.startswith("a") and name[1:] in self.methods:
+            return self._awrap(name, attr)
+        return attr
+
+    def _describe(self, args):
+        key = args[0] if args else ""
+        return key if isinstance(key, str) else f"<{len(key)} keys>"
+
+    def _wrap(self, name, method):
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._profile.call("cache", name, self._describe(args), time.perf_counter() - start)
+
+        return call
+
+    def _awrap(self, name, method):
+        async def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self._profile.call("cache", name, self._describe(args), time.perf_counter() - start)
+
+        return call
+
+
+class RequestProfile:
+    """Collects one request's profile; use as a context manager around the view."""
+
+    def __init__(self, request, trigger):
+        self.request = request
+        self.trigger = trigger
+        self.id = f"{datetime.now(timezone.utc):%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+        self.queries = []
+        self.calls = []
+        self.counters = {}
+        self.profiler = None
+        self._stack = ExitStack()
+
+    # Recorders -----------------------------------------------------------------
+
+    def _sql(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append(
+                    {"sql": sql, "ms": (time.perf_counter() - start) * 1000, "alias": context["connection"].alias}
+                )
+
+    def call(self, kind, operation, target, seconds):
+        if len(self.calls) < MAX_CALLS:
+            self.calls.append({"kind": kind, "operation": operation, "target": target, "ms": seconds * 1000})
+
+    def _metric(self, name, value, labels):
+        if name.endswith("_total"):
+            label = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+            key = f"{name}{{{label}}}"
+            self.counters[key] = self.counters.get(key, 0) + value
+        elif name != "cache_operation_duration_seconds":  # already recorded by RecordingCache
+            kind = name.split("_", 1)[0]
+            self.call(kind, labels.get("operation", ""), labels.get("provider", ""), value)
+
+    # Lifecycle -----------------------------------------------------------------
+
+    def __enter__(self):
+        self._stack.enter_context(sql_wrapper(self._sql))
+        token = metrics.listener.set(self._metric)
+        self._stack.callback(metrics.listener.reset, token)
+        for alias in settings.CACHES:
+            backend = caches[alias]
+            caches[alias] = RecordingCache(backend, self)
+            self._stack.callback(caches.__setitem__, alias, backend)
+        if _cprofile_lock.acquire(blocking=False):
+            self.profiler = cProfile.Profile()
+            self._stack.callback(_cprofile_lock.release)
+            self.profiler.enable()
+            self._stack.callback(self.profiler.disable)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.duration = time.perf_counter() - self.started
+        self._stack.close()
+        return False
+
+    def finish(self, response):
+        try:
+            save_profile(self.as_dict(response))
+        except Exception as exc:
+            logger.warning("Could not save profile %s: %s", self.id, exc)
+            return response
+        response[f"{HEADER}-Id"] = self.id
+        return response
+
+    def _functions(self):
+        if self.profiler is None:
+            return []
+        stats = pstats.Stats(self.profiler).stats
+        rows = [
+            {
+                "function": f"{filename}:{line}({name})",
+                "calls": calls,
+                "tottime_ms": tottime * 1000,
+                "cumtime_ms": cumtime * 1000,
+            }
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.items()
+        ]
+        limit = settings.PROFILING_TOP_FUNCTIONS
+        by_self = sorted(rows, key=lambda row: row["tottime_ms"], reverse=True)[:limit]
+        by_total = sorted(rows, key=lambda row: row["cumtime_ms"], reverse=True)[:limit]
+        kept = {row["function"]: row for row in by_self + by_total}
+        return sorted(kept.values(), key=lambda row: row["tottime_ms"], reverse=True)
+
+    def as_dict(self, response):
+        return {
+            "id": self.id,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "method": self.request.method,
+            "path": self.request.get_full_path(),
+            "status": response.status_code,
+            "duration_ms": self.duration * 1000,
+            "trigger": self.trigger,
+            "profiled": self.profiler is not None,
+            "functions": self._functions(),
+            "queries": self.queries,
+            "calls": self.calls,
+            "counters": self.counters,
+        }
+
+
+# Storage -------------------------------------------------------------------------
+
+
+def _directory():
+    return Path(settings.PROFILING_DIR)
+
+
+def save_profile(data):
+    directory = _directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = directory / f".{data['id']}.tmp"
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, directory / f"{data['id']}.json")
+    # Ids start with a timestamp, so name order is age order.
+    files = sorted(directory.glob("*.json"))
+    for path in files[: max(len(files) - settings.PROFILING_MAX_ENTRIES, 0)]:
+        path.unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Stored profiles, newest first."""
+    directory = _directory()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def load_profile(profile_id):
+    path = _directory() / f"{Path(profile_id).name}.json"
+    return json.loads(path.read_text()) if path.is_file() else None
+
+
+class ProfilingMiddleware:
+    """Profiles requests selected by ``_trigger``; see the module docstring."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = _trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        profile = RequestProfile(request, trigger)
+        with profile:
+            response = self.get_response(request)
+        return profile.finish(response)
+
+    async def __acall__(self, request):
+        trigger = _trigger(request)
+        if trigger is None:
+            return await self.get_response(request)
+        profile = RequestProfile(request, trigger)
+        with profile:
+            response = await self.get_response(request)
+        return profile.finish(response)
@@ -0,0 +1,46 @@
+from functools import lru_cache
+
+from django.conf import settings
+
+try:
+    import redis
+except Exception:  # pragma: no cover - redis import guard
+    redis = None
+
+
+def get_redis_pool(url=None):
+    """Process-wide connection pool for ``url`` (default ``REDIS_URL``)."""
+    return _pool(url or settings.REDIS_URL)
+
+
+@lru_cache
+def _pool(url):
+    return redis.ConnectionPool.from_url(
+        url,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    )
+
+
+@lru_cache
+def get_redis_client():
+    """Process-wide Redis client for ``REDIS_URL``, or None when Redis is disabled or unavailable."""
+    if not redis or not settings.USE_REDIS or not settings.REDIS_URL:
+        return None
+    try:
+        return redis.Redis(connection_pool=get_redis_pool())
+    except Exception:
+        return None
+
+
+if redis:
+
+    class SharedConnectionPool(redis.ConnectionPool):
+        """``pool_class`` for Django's RedisCache: hands out the shared pool instead of building its own."""
+
+        @classmethod
+        def from_url(cls, url, **kwargs):
+            return get_redis_pool(url)
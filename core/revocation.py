@@ -0,0 +1,168 @@
+"""
+Revoked JWT ids.
+
+Revocations are written to Redis as ``jwt:revoked:<jti>`` keys that expire with
+the token, plus an entry in the ``jwt:revoked:log`` sorted set (scored by
+revocation time). Each worker mirrors the log into an in-process Bloom filter by
+pulling only new entries at most every ``REVOCATION_SYNC_INTERVAL`` seconds, so
+the usual "not revoked" answer costs a few hash lookups and no network call.
+Filter hits are confirmed against the Redis key to rule out false positives.
+With ``REVOCATION_USE_REDIS`` false the list is kept per process (development
+and tests only).
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
+
+from core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "jwt:revoked:"
+LOG_KEY = "jwt:revoked:log"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        capacity = max(int(capacity), 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+def _max_token_lifetime():
+    jwt = settings.SIMPLE_JWT
+    return max(jwt["ACCESS_TOKEN_LIFETIME"], jwt["REFRESH_TOKEN_LIFETIME"]).total_seconds()
+
+
+class RevocationList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = {}
+        self._filter = None
+        self._cursor = None
+        self._next_sync = 0.0
+        self._next_rebuild = 0.0
+
+    @staticmethod
+    def _client():
+        return get_redis_client() if settings.REVOCATION_USE_REDIS else None
+
+    def _new_filter(self, expected=0):
+        capacity = max(settings.REVOCATION_BLOOM_CAPACITY, expected * 2)
+        return BloomFilter(capacity, settings.REVOCATION_BLOOM_ERROR_RATE)
+
+    def revoke(self, jti, exp):
+        """Revoke ``jti`` until ``exp`` (unix seconds). Redis errors propagate: the token is not revoked."""
+        now = time.time()
+        ttl = int(exp - now)
+        if ttl <= 0:
+            return
+        client = self._client()
+        if client is not None:
+            pipe = client.pipeline(transaction=True)
+            pipe.set(f"{KEY_PREFIX}{jti}", 1, ex=ttl)
+            pipe.zadd(LOG_KEY, {f"{jti}:{int(exp)}": int(now * 1000)})
+            pipe.execute()
+        with self._lock:
+            self._local[jti] = exp
+            if self._filter is None:
+                self._filter = self._new_filter()
+            self._filter.add(jti)
+
+    def is_revoked(self, jti):
+        client = self._client()
+        if client is None:
+            exp = self._local.get(jti)
+            return exp is not None and exp > time.time()
+        self._sync(client)
+        bloom = self._filter
+        if bloom is None or jti not in bloom:
+            return False
+        try:
+            return bool(client.exists(f"{KEY_PREFIX}{jti}"))
+        except Exception as exc:
+            # Filter hit and no way to confirm: treat as revoked.
+            logger.warning("Could not confirm revocation of %s: %s", jti, exc)
+            return True
+
+    def _sync(self, client):
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        if not self._lock.acquire(blocking=self._filter is None):
+            return  # another thread is syncing; answer from the current filter
+        try:
+            if now < self._next_sync:
+                return
+            self._next_sync = now + settings.REVOCATION_SYNC_INTERVAL
+            if self._filter is None or now >= self._next_rebuild:
+                self._rebuild(client)
+                self._next_rebuild = now + settings.REVOCATION_REBUILD_INTERVAL
+            else:
+                self._pull(client, self._filter)
+        except Exception as exc:
+            logger.warning("Revocation list sync failed: %s", exc)
+        finally:
+            self._lock.release()
+
+    def _pull(self, client, bloom):
+        entries = client.zrangebyscore(LOG_KEY, self._cursor or "-inf", "+inf", withscores=True)
+        wall = time.time()
+        for member, score in entries:
+            jti, _, exp = member.decode("utf-8").rpartition(":")
+            if int(exp) > wall:
+                bloom.add(jti)
+            # Inclusive cursor: entries sharing the last millisecond are re-read, adds are idempotent.
+            self._cursor = max(self._cursor or 0, int(score))
+        return len(entries)
+
+    def _rebuild(self, client):
+        """Drop expired revocations by rebuilding the filter from the live part of the log."""
+        cutoff = int((time.time() - _max_token_lifetime()) * 1000)
+        client.zremrangebyscore(LOG_KEY, "-inf", f"({cutoff}")
+        self._cursor = None
+        bloom = self._new_filter(client.zcard(LOG_KEY))
+        self._pull(client, bloom)
+        self._filter = bloom
+        self._local = {jti: exp for jti, exp in self._local.items() if exp > time.time()}
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+            self._filter = None
+            self._cursor = None
+            self._next_sync = self._next_rebuild = 0.0
+
+
+revocation_list = RevocationList()
+
+
+def revoke_token(token):
+    """Revoke a simplejwt token (access or refresh) until it expires."""
+    revocation_list.revoke(str(token[api_settings.JTI_CLAIM]), int(token["exp"]))
+
+
+def is_token_revoked(token):
+    jti = token.get(api_settings.JTI_CLAIM)
+    return bool(jti) and revocation_list.is_revoked(str(jti))
@@ -0,0 +1,247 @@
+"""
+Slow query log.
+
+``SlowQueryMiddleware`` times every statement the request runs, in whichever
+thread it runs (``core.sql_hooks``, so ASGI requests are covered). Statements taking
+at least ``SLOW_QUERY_THRESHOLD_MS`` are handed, with the name of the view that
+issued them, to a background thread; the request only pays for a queue put.
+
+The thread groups statements by fingerprint (the SQL with literals and
+placeholder lists collapsed), captures a plan once per fingerprint per day
+(``EXPLAIN`` on PostgreSQL, ``EXPLAIN QUERY PLAN`` on SQLite; SELECTs only, never
+``ANALYZE``) and every ``SLOW_QUERY_FLUSH_INTERVAL`` seconds adds the counts and
+timings to ``core.SlowQuery`` rows. Rank them with ``manage.py slow_queries``.
+"""
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.sql_hooks import sql_wrapper
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_REFRESH = timedelta(days=1)
+QUEUE_SIZE = 1000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """SQL with literals replaced by ``?`` and ``IN (...)`` lists collapsed, so variants group together."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _LIST.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def explain(alias, sql, params):
+    """The plan for a SELECT on ``alias`` as text, or "" for other statements."""
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return ""
+    connection = connections[alias]
+    prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    if connection.vendor == "sqlite":
+        # (id, parent, notused, detail)
+        return "\n".join(row[-1] for row in rows)
+    return "\n".join(str(row[0]) for row in rows)
+
+
+class SlowQueryLog:
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._worker_pid = None
+        self._explained = {}
+
+    def record(self, alias, sql, params, many, duration_ms, view):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((alias, sql, params, many, duration_ms, view))
+        except queue.Full:
+            pass  # the worker is behind; dropping samples beats slowing requests down
+
+    def _ensure_worker(self):
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+            threading.Thread(target=self._run, name="slow-query-log", daemon=True).start()
+
+    def _run(self):
+        while True:
+            deadline = time.monotonic() + settings.SLOW_QUERY_FLUSH_INTERVAL
+            batch = []
+            while True:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if not batch:
+                continue
+            try:
+                self.process(batch)
+            except Exception as exc:
+                logger.warning("Could not store slow queries: %s", exc)
+            finally:
+                close_old_connections()
+
+    def drain(self):
+        """Process everything queued so far in the calling thread."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self.process(batch)
+
+    def process(self, batch):
+        groups = {}
+        for alias, sql, params, many, duration_ms, view in batch:
+            normalized = normalize_sql(sql)
+            key = fingerprint(normalized)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    "sql": normalized,
+                    "alias": alias,
+                    "view": view,
+                    "calls": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "sample": None if many else (sql, params),
+                }
+            group["calls"] += 1
+            group["total_ms"] += duration_ms
+            group["max_ms"] = max(group["max_ms"], duration_ms)
+            group["view"] = view or group["view"]
+        for key, group in groups.items():
+            self._store(key, group)
+
+    def _plan(self, key, group, force=False):
+        now = time.monotonic()
+        if group["sample"] is None or (not force and now < self._explained.get(key, 0)):
+            return None
+        self._explained[key] = now + EXPLAIN_REFRESH.total_seconds()
+        sql, params = group["sample"]
+        try:
+            return explain(group["alias"], sql, params)
+        except Exception as exc:
+            return f"EXPLAIN failed: {exc}"
+
+    def _store(self, key, group):
+        from core.models import SlowQuery
+
+        plan = self._plan(key, group)
+        now = timezone.now()
+        changes = {
+            "calls": F("calls") + group["calls"],
+            "total_ms": F("total_ms") + group["total_ms"],
+            "max_ms": Greatest(F("max_ms"), group["max_ms"]),
+            "last_seen": now,
+        }
+        if group["view"]:
+            changes["view"] = group["view"][:255]
+        if plan is not None:
+            changes.update(plan=plan, explained_at=now)
+        if SlowQuery.objects.filter(fingerprint=key).update(**changes):
+            return
+        if plan is None:
+            # New row (e.g. after --reset): capture its plan even if explained recently.
+            plan = self._plan(key, group, force=True)
+        try:
+            SlowQuery.objects.create(
+                fingerprint=key,
+                sql=group["sql"],
+                alias=group["alias"],
+                view=group["view"][:255],
+                calls=group["calls"],
+                total_ms=group["total_ms"],
+                max_ms=group["max_ms"],
+                plan=plan or "",
+                explained_at=now if plan is not None else None,
+            )
+        except IntegrityError:
+            # Another worker created it first.
+            SlowQuery.objects.filter(fingerprint=key).update(**changes)
+
+
+slow_query_log = SlowQueryLog()
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return request.path_info
+    return match.view_name or match._func_path
+
+
+class SlowQueryMiddleware:
+    """Records statements over ``SLOW_QUERY_THRESHOLD_MS`` with the view that issued them."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if settings.SLOW_QUERY_THRESHOLD_MS <= 0:
+            return self.get_response(request)
+        with self._wrap(request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if settings.SLOW_QUERY_THRESHOLD_MS <= 0:
+            return await self.get_response(request)
+        with self._wrap(request):
+            return await self.get_response(request)
+
+    @staticmethod
+    def _wrap(request):
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if elapsed_ms >= threshold:
+                    alias = context["connection"].alias
+                    slow_query_log.record(alias, sql, params, many, elapsed_ms, _view_name(request))
+
+        return sql_wrapper(wrapper)
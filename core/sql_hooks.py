@@ -0,0 +1,41 @@
+"""
+Per-request SQL hooks that also see queries under ASGI.
+
+Django connections are thread-local, and under ASGI the ORM runs in
+``sync_to_async`` executor threads, so a wrapper that middleware installs with
+``connection.execute_wrapper`` on its own thread's connections never sees
+those statements. Instead, every connection gets one permanent wrapper when it
+is opened (``connection_created``). That wrapper runs the wrappers registered
+in the current context. ``sync_to_async`` copies the context into its thread,
+so wrappers registered by middleware with ``sql_wrapper()`` follow the request
+to wherever its queries run.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+_wrappers = ContextVar("sql_wrappers", default=())
+
+
+@contextmanager
+def sql_wrapper(wrapper):
+    """Run ``wrapper(execute, sql, params, many, context)`` around every statement in this context."""
+    token = _wrappers.set(_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _wrappers.reset(token)
+
+
+def _dispatch(execute, sql, params, many, context):
+    wrappers = _wrappers.get()
+    for wrapper in reversed(wrappers):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    """``connection_created`` receiver; safe to call again for the same connection."""
+    if _dispatch not in connection.execute_wrappers:
+        # First, so that connection.execute_wrapper() blocks still pop their own wrapper.
+        connection.execute_wrappers.insert(0, _dispatch)
@@ -0,0 +1,297 @@
+"""
+Query budgets: every API and template view runs a fixed number of SQL
+statements and Mongo calls, whatever the size of the data it returns.
+
+Each case runs once against a small data set and again after ``grow()`` adds
+realistic volumes (a three-level category tree, a few hundred properties, a
+user with dozens of bookings and payments). Both runs must issue the same
+normalized statements, exactly ``budget`` of them. On failure the message shows
+a diff of the two statement lists, or the numbered list when only the budget
+is off, so an N+1 is visible at once. Caches are cleared before each run, so
+the budgets are for cold requests.
+
+Not budgeted: the status event stream and its ticket (off by default and
+served only under ASGI), ``/metrics``, the API schema and docs, the Django
+admin and password-reset pages (framework code, not ours), and the generic
+``payments/webhook/<provider>/`` route, which is the same view as the Stripe
+and bKash webhooks budgeted here.
+"""
+import difflib
+import re
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from bookings.models import Booking
+from core.slow_queries import normalize_sql
+from payments.models import Payment
+from properties.models import Category, Property
+from users.models import User
+
+# Savepoint names embed the thread id and a counter.
+SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "query-budgets"}}
+
+
+class FakeMongoCollection:
+    """Counts every call made on the media collection."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return []
+
+        return call
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE,
+    THROTTLE_USE_REDIS=False,
+    REVOCATION_USE_REDIS=False,
+    EVENTS_USE_REDIS=False,
+    SLOW_QUERY_THRESHOLD_MS=0,
+    DATABASE_REPLICAS=[],
+)
+class QueryBudgetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="budget@example.com", password="StrongPass123")
+        self.other = User.objects.create_user(email="other@example.com", password="StrongPass123")
+        self.root = Category.objects.create(name="Residential", slug="budget-root")
+        child = Category.objects.create(name="Houses", slug="budget-houses", parent=self.root)
+        self.property = Property.objects.create(
+            name="Budget Villa", slug="budget-villa", description="", location="Hills",
+            price=Decimal("100.00"), category=child,
+        )
+        Property.objects.create(
+            name="Budget Flat", slug="budget-flat", description="", location="Town",
+            price=Decimal("80.00"), category=self.root,
+        )
+        self.bookings = [self._booking(self.user, self.property, day) for day in (1, 2)]
+        for booking in self.bookings:
+            Payment.objects.create(booking=booking, provider=Payment.PROVIDER_STRIPE, transaction_id=f"pi_budget_{booking.id}")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self._slot = 1000
+
+    def _booking(self, user, property_obj, day):
+        start = timezone.now() + timedelta(days=day)
+        return Booking.objects.create(
+            user=user, property=property_obj, total_amount=property_obj.price, start_at=start, end_at=start + timedelta(hours=2)
+        )
+
+    def grow(self):
+        """Add realistic volumes around the small data set."""
+        categories = [self.root]
+        for level in range(2):
+            parents, categories = categories, []
+            for parent in parents:
+                for i in range(4):
+                    categories.append(
+                        Category.objects.create(name=f"C{level}-{parent.id}-{i}", slug=f"c{level}-{parent.id}-{i}", parent=parent)
+                    )
+        Property.objects.bulk_create(
+            Property(
+                name=f"Grown {i}", slug=f"grown-{i}", description="", location="Everywhere",
+                price=Decimal("50.00") + i, category=categories[i % len(categories)],
+            )
+            for i in range(300)
+        )
+        grown = list(Property.objects.filter(slug__startswith="grown-").order_by("id")[:40])
+        start = timezone.now() + timedelta(days=30)
+        bookings = Booking.objects.bulk_create(
+            Booking(
+                user=user, property=grown[i], total_amount=Decimal("50.00"),
+                start_at=start + timedelta(days=i), end_at=start + timedelta(days=i, hours=2),
+            )
+            for i in range(40)
+            for user in (self.user, self.other)
+        )
+        Payment.objects.bulk_create(
+            Payment(booking=booking, provider=provider, transaction_id=f"pi_grown_{booking.id}_{provider}", status=Payment.STATUS_FAILED)
+            for booking in bookings
+            for provider in (Payment.PROVIDER_STRIPE, Payment.PROVIDER_BKASH)
+        )
+
+    def measure(self, request):
+        cache.clear()
+        mongo = FakeMongoCollection()
+        with mock.patch("properties.media_service.get_media_collection", return_value=mongo), CaptureQueriesContext(
+            connection
+        ) as ctx:
+            response = request()
+        self.assertLess(response.status_code, 400, getattr(response, "data", response.content[:500]))
+        return [SAVEPOINT.sub('"sp"', normalize_sql(query["sql"])) for query in ctx.captured_queries], mongo.calls
+
+    def assertBudget(self, request, budget, mongo=0):
+        small, small_mongo = self.measure(request)
+        self.grow()
+        large, large_mongo = self.measure(request)
+        if small != large:
+            diff = "\n".join(difflib.unified_diff(small, large, "small data", "large data", lineterm=""))
+            self.fail(f"Queries depend on data size ({len(small)} -> {len(large)}):\n{diff}")
+        if len(large) != budget:
+            listing = "\n".join(f"{i:3d}. {sql}" for i, sql in enumerate(large, 1))
+            self.fail(f"Expected {budget} queries, ran {len(large)}:\n{listing}")
+        self.assertEqual(len(small_mongo), len(large_mongo), f"Mongo calls depend on data size: {small_mongo} -> {large_mongo}")
+        self.assertLessEqual(len(large_mongo), mongo, f"Mongo calls over budget: {large_mongo}")
+
+    # Template views ---------------------------------------------------------------
+
+    def test_home_page(self):
+        self.assertBudget(lambda: self.client.get(reverse("home")), 1)
+
+    def test_property_page(self):
+        self.assertBudget(lambda: self.client.get(reverse("property-page", args=[self.property.slug])), 1)
+
+    def test_static_pages(self):
+        for name in ("login-page", "register-page", "user-panel", "login-page-root", "register-page-root", "user-panel-root"):
+            with self.subTest(name):
+                small, _ = self.measure(lambda: self.client.get(reverse(name)))
+                self.assertEqual(small, [])
+
+    # Public API -----------------------------------------------------------------
+
+    def test_category_list(self):
+        self.assertBudget(lambda: self.client.get(reverse("category-list")), 2)
+
+    def test_property_list(self):
+        self.assertBudget(lambda: self.client.get(reverse("property-list")), 2)
+
+    def test_property_detail(self):
+        self.assertBudget(lambda: self.client.get(reverse("property-detail", args=[self.property.slug])), 2, mongo=1)
+
+    def test_property_recommendations(self):
+        self.assertBudget(lambda: self.client.get(reverse("property-recommendations", args=[self.property.slug])), 4)
+
+    # Auth -------------------------------------------------------------------------
+
+    def test_register(self):
+        emails = (f"new{i}@example.com" for i in range(2))
+        self.assertBudget(
+            lambda: self.client.post(reverse("auth-register"), {"email": next(emails), "password": "StrongPass123"}, format="json"),
+            3,
+        )
+
+    def test_login(self):
+        def login():
+            # A fresh client each time: logging in also starts a session.
+            self.client.cookies.clear()
+            return self.client.post(
+                reverse("auth-login"), {"identifier": "budget@example.com", "password": "StrongPass123"}, format="json"
+            )
+
+        self.assertBudget(login, 10)
+
+    def test_logout(self):
+        def logout():
+            refresh = RefreshToken.for_user(self.user)
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+            return self.client.post(reverse("auth-logout"), {"refresh": str(refresh)}, format="json")
+
+        self.assertBudget(logout, 1)
+
+    def test_token_refresh(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        self.assertBudget(lambda: self.client.post(reverse("token-refresh"), {"refresh": refresh}, format="json"), 1)
+
+    def test_token_verify(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.assertBudget(lambda: self.client.post(reverse("token-verify"), {"token": token}, format="json"), 0)
+
+    # Payment providers ------------------------------------------------------------
+
+    def test_stripe_webhook(self):
+        events = iter(range(2))
+
+        def deliver():
+            event = {"id": f"evt_budget_{next(events)}", "type": "payment_intent.succeeded", "data": {"object": {"id": "pi_x"}}}
+            return self.client.post(reverse("stripe-webhook"), event, format="json")
+
+        self.assertBudget(deliver, 1)
+
+    def test_bkash_webhook(self):
+        events = iter(range(2))
+
+        def deliver():
+            body = {"paymentID": f"TRBUDGET{next(events)}", "transactionStatus": "Completed"}
+            return self.client.post(reverse("bkash-webhook"), body, format="json")
+
+        self.assertBudget(deliver, 1)
+
+    def _bkash_payments(self):
+        return iter(
+            [
+                Payment.objects.create(booking=booking, provider=Payment.PROVIDER_BKASH, transaction_id=f"TRBUDGET{booking.id}")
+                for booking in self.bookings
+            ]
+        )
+
+    @mock.patch("payments.services.BkashPaymentStrategy._has_credentials", return_value=True)
+    @mock.patch("payments.services.BkashPaymentStrategy._get_token", return_value="token")
+    def test_bkash_execute(self, *mocks):
+        payments = self._bkash_payments()
+        with mock.patch("payments.services.BkashPaymentStrategy._post", return_value={"transactionStatus": "Completed"}):
+            self.assertBudget(
+                lambda: self.client.post(reverse("bkash-execute"), {"payment_id": next(payments).id}, format="json"), 8
+            )
+
+    @mock.patch("payments.services.BkashPaymentStrategy._has_credentials", return_value=True)
+    @mock.patch("payments.services.BkashPaymentStrategy._get_token", return_value="token")
+    def test_bkash_query(self, *mocks):
+        payment = next(self._bkash_payments())
+        with mock.patch("payments.services.BkashPaymentStrategy._post", return_value={"transactionStatus": "Initiated"}):
+            self.assertBudget(lambda: self.client.get(reverse("bkash-query"), {"payment_id": payment.id}), 2)
+
+    # Authenticated API ----------------------------------------------------------
+
+    def test_me(self):
+        self.assertBudget(lambda: self.client.get(reverse("auth-me")), 1)
+
+    def test_my_bookings(self):
+        self.assertBudget(lambda: self.client.get(reverse("auth-me-bookings")), 2)
+
+    def test_my_payments(self):
+        self.assertBudget(lambda: self.client.get(reverse("auth-me-payments")), 2)
+
+    def test_dashboard(self):
+        self.assertBudget(lambda: self.client.get(reverse("auth-me-dashboard")), 3)
+
+    def test_booking_list(self):
+        self.assertBudget(lambda: self.client.get(reverse("booking-list")), 2)
+
+    def test_booking_create(self):
+        def create():
+            self._slot += 1
+            start = timezone.now() + timedelta(days=self._slot)
+            return self.client.post(
+                reverse("booking-create"),
+                {"property_id": self.property.id, "start_at": start.isoformat(), "end_at": (start + timedelta(hours=1)).isoformat()},
+                format="json",
+            )
+
+        self.assertBudget(create, 6)
+
+    def test_booking_cancel(self):
+        pending = iter(self.bookings)
+        self.assertBudget(lambda: self.client.post(reverse("booking-cancel", args=[next(pending).id])), 3)
+
+    def test_payment_initiate(self):
+        unpaid = iter(self.bookings)
+        self.assertBudget(
+            lambda: self.client.post(
+                reverse("payment-initiate"), {"provider": "bkash", "booking_id": next(unpaid).id}, format="json"
+            ),
+            12,
+        )
@@ -0,0 +1,522 @@
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresWrapper
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from bookings.models import Booking
+from core import metrics, tiered_cache
+from core.admin import LargeTablePaginator
+from core.caching import LOCK_SUFFIX, get_or_compute
+from core.db_router import RoutingState, _routing, replica_health
+from core.models import SlowQuery
+from core.profiling import list_profiles, make_token
+from core.slow_queries import SlowQueryLog, normalize_sql, slow_query_log
+from core.redis import get_redis_pool
+from core.tiered_cache import TwoTierRedisCache
+from payments.models import Payment, WebhookEvent
+from properties.models import Category, Property
+from users.models import User
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+
+    @override_settings(METRICS_ALLOWED_IPS=["127.0.0.1"])
+    def test_requests_and_queries_are_exported(self):
+        Category.objects.create(name="Residential", slug="metrics-res")
+        self.client.get(reverse("category-list"))
+
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="api/categories/",status="2xx"} 1', body)
+        self.assertIn('db_query_duration_seconds_bucket{alias="default",le="+Inf"}', body)
+
+    @override_settings(METRICS_ALLOWED_IPS=["127.0.0.1"])
+    async def test_asgi_queries_are_timed(self):
+        await Category.objects.acreate(name="Residential", slug="metrics-asgi")
+        await self.async_client.get(reverse("category-list"))
+
+        body = (await self.async_client.get(reverse("metrics"))).content.decode()
+        self.assertIn('db_query_duration_seconds_bucket{alias="default",le="+Inf"}', body)
+
+    def test_endpoint_merges_worker_files(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            other = metrics.MetricsRegistry()
+            other.observe("provider_request_duration_seconds", 0.2, provider="stripe", operation="POST /v1/payment_intents")
+            # A live process other than this one stands in for another worker.
+            with open(os.path.join(directory, f"metrics-{os.getppid()}.json"), "w") as fh:
+                json.dump(other.snapshot(), fh)
+            metrics.registry.observe("provider_request_duration_seconds", 3.0, provider="stripe", operation="POST /v1/payment_intents")
+
+            body = metrics.render()
+        labels = 'operation="POST /v1/payment_intents",provider="stripe"'
+        self.assertIn(f"provider_request_duration_seconds_count{{{labels}}} 2", body)
+        self.assertIn(f'provider_request_duration_seconds_bucket{{{labels},le="0.25"}} 1', body)
+        self.assertIn(f"provider_request_duration_seconds_sum{{{labels}}} 3.2", body)
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_token_protects_endpoint(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        resp = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape-token")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_files_of_exited_workers_are_deleted(self):
+        exited = subprocess.Popen([sys.executable, "-c", ""])
+        exited.wait()
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            other = metrics.MetricsRegistry()
+            other.inc("event_stream_connections_total")
+            path = os.path.join(directory, f"metrics-{exited.pid}.json")
+            with open(path, "w") as fh:
+                json.dump(other.snapshot(), fh)
+
+            self.assertNotIn("event_stream_connections_total", metrics.render())
+            self.assertFalse(os.path.exists(path))
+
+    def test_endpoint_is_restricted_without_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=["127.0.0.1"]):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+        self.client.force_login(User.objects.create_user(email="ops@example.com", password="StrongPass123", is_staff=True))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "router-tests"}}
+# Defined by realestate.test_settings (SQLITE_REPLICA); absent under other settings.
+HAS_REPLICA = "replica" in settings.DATABASES
+
+
+@skipUnless(HAS_REPLICA, "needs the replica alias from realestate.test_settings")
+@override_settings(DATABASE_REPLICAS=["replica"], CACHES=LOCMEM_CACHE, THROTTLE_USE_REDIS=False)
+class ReplicaRoutingTests(APITestCase):
+    databases = {"default", "replica"} if HAS_REPLICA else {"default"}
+
+    def setUp(self):
+        cache.clear()
+        replica_health.reset()
+        self.addCleanup(replica_health.reset)
+        for alias, name in (("default", "Primary Villa"), ("replica", "Replica Villa")):
+            category = Category.objects.using(alias).create(id=1, name="Residential", slug="router-res")
+            Property.objects.using(alias).create(
+                id=1, name=name, slug="router-villa", location="Hills", price=Decimal("100.00"),
+                status=Property.STATUS_ACTIVE, category=category,
+            )
+        self.user = User.objects.create_user(email="router@example.com", password="StrongPass123")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def _listed_name(self, client=None):
+        return (client or self.client).get(reverse("property-list")).data[0]["name"]
+
+    def test_catalog_reads_use_replica_and_writes_stick_to_primary(self):
+        self.assertEqual(self._listed_name(), "Replica Villa")
+        start = timezone.now() + timedelta(days=1)
+        resp = self.client.post(
+            reverse("booking-create"),
+            {"property_id": 1, "start_at": start.isoformat(), "end_at": (start + timedelta(hours=1)).isoformat()},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._listed_name(), "Primary Villa")
+        self.assertEqual(self._listed_name(APIClient()), "Replica Villa")
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        with override_settings(DATABASE_REPLICA_MAX_LAG=1), mock.patch("core.db_router.measure_lag", return_value=30.0):
+            self.assertEqual(self._listed_name(), "Primary Villa")
+
+    def test_locking_reads_use_primary(self):
+        token = _routing.set(RoutingState(use_replica=True))
+        self.addCleanup(_routing.reset, token)
+        self.assertEqual(Property.objects.all().db, "replica")
+        self.assertEqual(Property.objects.select_for_update().db, "default")
+        self.assertEqual(User.objects.all().db, "default")
+
+
+class RedisPoolTests(SimpleTestCase):
+    def test_cache_uses_the_shared_pool(self):
+        backend = RedisCache(settings.REDIS_URL, {"OPTIONS": {"pool_class": "core.redis.SharedConnectionPool"}})
+        pool = backend._cache._get_connection_pool(write=True)
+        self.assertIs(pool, get_redis_pool())
+        self.assertIs(backend._cache._get_connection_pool(write=False), pool)
+        self.assertEqual(pool.max_connections, settings.REDIS_MAX_CONNECTIONS)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class StampedeCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value="fresh", delay=0.0):
+        def inner():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+
+        return inner
+
+    def test_empty_result_is_cached(self):
+        self.assertIsNone(get_or_compute("stampede:none", self.compute(None), 60))
+        self.assertIsNone(get_or_compute("stampede:none", self.compute(None), 60))
+        self.assertEqual(self.calls, 1)
+
+    def test_concurrent_cold_miss_computes_once(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute("stampede:cold", self.compute(delay=0.2), 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["fresh"] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_value_without_envelope_is_a_miss(self):
+        cache.set("stampede:legacy", {1: [2, 3]}, 60)
+        self.assertEqual(get_or_compute("stampede:legacy", self.compute(), 60), "fresh")
+        cache.set("stampede:legacy", ("a", "b"), 60)
+        self.assertEqual(get_or_compute("stampede:legacy", self.compute(), 60), "fresh")
+        self.assertEqual(get_or_compute("stampede:legacy", self.compute(), 60), "fresh")
+        self.assertEqual(self.calls, 2)
+
+    def test_expired_entry_is_served_stale_while_another_worker_refreshes(self):
+        cache.set("stampede:graph", ("old", time.time() - 1, 0.01), 60)
+        cache.add("stampede:graph" + LOCK_SUFFIX, 1, 10)
+        self.assertEqual(get_or_compute("stampede:graph", self.compute(), 60), "old")
+        self.assertEqual(self.calls, 0)
+
+        cache.delete("stampede:graph" + LOCK_SUFFIX)
+        self.assertEqual(get_or_compute("stampede:graph", self.compute(), 60), "fresh")
+        self.assertEqual(get_or_compute("stampede:graph", self.compute(), 60), "fresh")
+        self.assertEqual(self.calls, 1)
+
+
+class FakeRedisCacheClient:
+    """Stands in for Django's RedisCacheClient (no Redis server in tests)."""
+
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+        self.client = mock.Mock()
+
+    def get_client(self, key=None, *, write=False):
+        return self.client
+
+    def get(self, key, default):
+        self.gets += 1
+        return self.data.get(key, default)
+
+    def set(self, key, value, timeout):
+        self.data[key] = value
+
+    def delete(self, key):
+        return self.data.pop(key, None) is not None
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        tiered_cache._tiers.clear()
+        self.addCleanup(tiered_cache._tiers.clear)
+        self.backend = TwoTierRedisCache("redis://localhost:6379/9", {"OPTIONS": {"LOCAL_TTL": 30, "LOCAL_MAX_ENTRIES": 2}})
+        self.remote = self.backend.__dict__["_cache"] = FakeRedisCacheClient()
+        # Pretend the invalidation listener is connected.
+        self.tier = self.backend.tier
+        self.tier._pid = os.getpid()
+        self.tier.listening = True
+
+    def _counter(self, tier, result):
+        for name, labels, value in metrics.registry.snapshot()["counters"]:
+            if name == "cache_tier_requests_total" and dict(labels) == {"tier": tier, "result": result}:
+                return value
+        return 0
+
+    def test_repeat_reads_are_served_in_process(self):
+        self.remote.data[self.backend.make_key("graph")] = {"1": [2]}
+        self.assertEqual(self.backend.get("graph"), {"1": [2]})
+        self.assertEqual(self.backend.get("graph"), {"1": [2]})
+        self.assertEqual(self.remote.gets, 1)
+        self.assertEqual(self._counter("local", "hit"), 1)
+        self.assertEqual(self._counter("redis", "hit"), 1)
+
+    def test_writes_publish_and_peer_invalidations_drop_local_entries(self):
+        self.backend.set("graph", "v1")
+        key = self.backend.make_key("graph")
+        self.remote.client.publish.assert_called_once_with("cache:invalidate", f"{self.tier.origin}:{key}")
+        self.assertEqual(self.backend.get("graph"), "v1")
+        self.assertEqual(self.remote.gets, 0)
+
+        self.tier.handle_invalidation(f"{self.tier.origin}:{key}")
+        self.assertEqual(self.backend.get("graph"), "v1")
+        self.assertEqual(self.remote.gets, 0)
+
+        self.remote.data[key] = "v2"
+        self.tier.handle_invalidation(f"other-worker:{key}")
+        self.assertEqual(self.backend.get("graph"), "v2")
+
+    def test_local_tier_is_bounded_and_bypassed_without_listener(self):
+        for name in ("a", "b", "c"):
+            self.backend.set(name, name)
+        self.assertEqual(len(self.backend.local), 2)
+        self.tier.listening = False
+        self.remote.data[self.backend.make_key("b")] = "remote-b"
+        self.assertEqual(self.backend.get("b"), "remote-b")
+
+    def test_backends_of_different_contexts_share_one_tier(self):
+        tiered_cache._tiers.clear()
+        config = {"default": {"BACKEND": "core.tiered_cache.TwoTierRedisCache", "LOCATION": "redis://localhost:6379/9"}}
+        backends = []
+
+        async def build():
+            backends.append(caches["default"])
+
+        with override_settings(CACHES=config):
+            # An event loop per thread, as ASGI servers and sync_to_async give each request.
+            for _ in range(3):
+                worker = threading.Thread(target=asyncio.run, args=(build(),))
+                worker.start()
+                worker.join()
+        with mock.patch("threading.Thread") as thread:
+            for backend in backends:
+                backend._local_enabled()
+
+        self.assertEqual(len({id(backend) for backend in backends}), 3)
+        self.assertEqual(len({id(backend.local) for backend in backends}), 1)
+        thread.assert_called_once()
+
+
+@override_settings(CACHES=LOCMEM_CACHE, ADMIN_KEYSET_OFFSET=4, ADMIN_ESTIMATED_COUNT_THRESHOLD=10)
+class LargeTableAdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(email="admin@example.com", password="StrongPass123")
+        self.client.force_login(self.admin)
+        category = Category.objects.create(name="Residential", slug="admin-res")
+        self.property = Property.objects.create(
+            name="Admin Villa", slug="admin-villa", location="Hills", price=Decimal("100.00"), category=category,
+        )
+        for i in range(3):
+            self._booking(i)
+
+    def _booking(self, i):
+        user = User.objects.create_user(email=f"guest{i}@example.com", password="StrongPass123")
+        return Booking.objects.create(user=user, property=self.property, total_amount=Decimal("100.00"))
+
+    def _changelist_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse("admin:bookings_booking_changelist"))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return len(ctx)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        baseline = self._changelist_queries()
+        for i in range(3, 12):
+            self._booking(i)
+        self.assertEqual(self._changelist_queries(), baseline)
+
+    def test_unfiltered_count_uses_estimate(self):
+        queryset = Booking.objects.order_by("-pk")
+        with mock.patch("core.admin.estimated_row_count", return_value=5_000_000):
+            self.assertEqual(LargeTablePaginator(queryset, 2).count, 5_000_000)
+            self.assertEqual(LargeTablePaginator(queryset.filter(status="pending"), 2).count, 3)
+
+    def test_keyset_pages_match_offset_pages(self):
+        for i in range(3, 12):
+            self._booking(i)
+        queryset = Booking.objects.order_by("-pk")
+        ids = list(queryset.values_list("pk", flat=True))
+        expected = [ids[i : i + 2] for i in range(0, len(ids), 2)]
+
+        paginator = LargeTablePaginator(queryset, 2)
+        self.assertEqual([[b.pk for b in paginator.page(n)] for n in paginator.page_range], expected)
+        cache.clear()
+        self.assertEqual([b.pk for b in LargeTablePaginator(queryset, 2).page(5)], expected[4])
+
+    def test_cancel_action_is_one_update_and_invalidates_dashboards(self):
+        ids = list(Booking.objects.values_list("pk", flat=True))
+        with mock.patch("bookings.admin.invalidate_dashboards") as invalidate_dashboards, CaptureQueriesContext(
+            connection
+        ) as ctx:
+            resp = self.client.post(
+                reverse("admin:bookings_booking_changelist"),
+                {"action": "cancel_bookings", "_selected_action": ids},
+            )
+        self.assertEqual(resp.status_code, 302)
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "bookings_booking"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(set(Booking.objects.values_list("status", flat=True)), {Booking.STATUS_CANCELED})
+        self.assertEqual(len(set(invalidate_dashboards.call_args.args[0])), 3)
+
+    def test_mark_failed_skips_payments_settled_meanwhile(self):
+        payments = [
+            Payment.objects.create(booking=booking, provider=Payment.PROVIDER_STRIPE, transaction_id=f"pi_admin_{booking.pk}")
+            for booking in Booking.objects.order_by("pk")
+        ]
+        settled = payments[0]
+        transition_many = Payment.objects.transition_many
+
+        def settle_first(*args, **kwargs):
+            # A webhook lands between the changelist selection and the action's update.
+            Payment.objects.filter(pk=settled.pk).update(status=Payment.STATUS_SUCCESS)
+            return transition_many(*args, **kwargs)
+
+        with mock.patch.object(Payment.objects, "transition_many", side_effect=settle_first), mock.patch(
+            "payments.models.publish_payment_statuses"
+        ) as publish:
+            resp = self.client.post(
+                reverse("admin:payments_payment_changelist"),
+                {"action": "mark_failed", "_selected_action": [p.pk for p in payments]},
+            )
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(Payment.objects.get(pk=settled.pk).status, Payment.STATUS_SUCCESS)
+        self.assertEqual(
+            sorted(payment_id for payment_id, _, _ in publish.call_args.args[0]), [p.pk for p in payments[1:]]
+        )
+
+    def test_webhook_event_search_is_exact(self):
+        for event_id in ("evt_1", "evt_10"):
+            WebhookEvent.objects.create(provider="stripe", event_id=event_id, payload="{}")
+        resp = self.client.get(reverse("admin:payments_webhookevent_changelist"), {"q": "evt_1"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([event.event_id for event in resp.context["cl"].result_list], ["evt_1"])
+
+    def _search(self, changelist, term):
+        resp = self.client.get(reverse(f"admin:{changelist}_changelist"), {"q": term})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return list(resp.context["cl"].result_list)
+
+    def test_search_matches_ids_emails_and_name_prefixes(self):
+        booking = Booking.objects.order_by("pk").first()
+        self.assertEqual(self._search("bookings_booking", str(booking.pk)), [booking])
+        self.assertEqual(self._search("bookings_booking", booking.user.email.upper()), [booking])
+        self.assertEqual(len(self._search("bookings_booking", "admin vi")), 3)
+        self.assertEqual(self._search("bookings_booking", "nobody"), [])
+        self.assertEqual(self._search("properties_property", "ADMIN"), [self.property])
+        self.assertEqual(self._search("properties_property", "villa"), [])
+
+    def test_search_predicates_are_index_friendly_on_postgres(self):
+        postgres = PostgresWrapper(
+            dict(connection.settings_dict, ENGINE="django.db.backends.postgresql", NAME="x", OPTIONS={}), alias="pg"
+        )
+        for model, term in ((Property, "Admin"), (Booking, "guest0@example.com"), (Payment, "42"), (WebhookEvent, "evt_1")):
+            with self.subTest(model=model.__name__):
+                queryset, _ = admin.site._registry[model].get_search_results(None, model.objects.all(), term)
+                sql, _ = queryset.query.get_compiler(connection=postgres).as_sql()
+                self.assertNotIn("UPPER(%s)", sql)
+                self.assertNotIn("::text = ", sql)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, THROTTLE_USE_REDIS=False, PROFILING_SAMPLE_RATE=0)
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PROFILING_DIR=directory.name, PROFILING_MAX_ENTRIES=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user(email="ops@example.com", password="StrongPass123", is_staff=True)
+        self.user = User.objects.create_user(email="guest@example.com", password="StrongPass123")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_signed_header_profiles_request(self):
+        resp = self.client.get(reverse("auth-me-dashboard"), HTTP_X_PROFILE=make_token(self.staff))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        [profile] = list_profiles()
+        self.assertEqual(resp["X-Profile-Id"], profile["id"])
+        self.assertEqual(profile["trigger"], "token:ops@example.com")
+        self.assertTrue(profile["profiled"])
+        self.assertTrue(profile["functions"])
+        self.assertTrue(any("bookings_booking" in q["sql"] for q in profile["queries"]))
+        self.assertIn(("cache", "get"), {(c["kind"], c["operation"]) for c in profile["calls"]})
+
+        out = io.StringIO()
+        call_command("profiles", "show", profile["id"], stdout=out)
+        self.assertIn("Hot functions", out.getvalue())
+        self.assertIn("bookings_booking", out.getvalue())
+
+    def test_untrusted_requests_are_not_profiled(self):
+        resp = self.client.get(reverse("property-list"), {"_profile": "1"}, HTTP_X_PROFILE="forged")
+        self.assertNotIn("X-Profile-Id", resp)
+        self.client.credentials()
+        self.client.force_login(self.staff)
+        resp = self.client.get(reverse("property-list"), {"_profile": "1"})
+        self.assertIn("X-Profile-Id", resp)
+
+    async def test_asgi_request_records_queries(self):
+        # Under ASGI the sync views' queries run in a sync_to_async thread, not the middleware's.
+        resp = await self.async_client.get(reverse("property-list"), headers={"X-Profile": make_token(self.staff)})
+        [profile] = list_profiles()
+        self.assertEqual(resp["X-Profile-Id"], profile["id"])
+        self.assertTrue(any("properties_property" in q["sql"] for q in profile["queries"]))
+
+    def test_ring_buffer_keeps_newest_entries(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            ids = [self.client.get(reverse("property-list"))["X-Profile-Id"] for _ in range(3)]
+        self.assertEqual([p["id"] for p in list_profiles()], ids[:0:-1])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, SLOW_QUERY_THRESHOLD_MS=0.000001)
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(SlowQueryLog, "_ensure_worker")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        slow_query_log.drain()
+        SlowQuery.objects.all().delete()
+        category = Category.objects.create(name="Residential", slug="slow-res")
+        Property.objects.create(name="Slow Villa", slug="slow-villa", location="Hills", price=Decimal("1.00"), category=category)
+
+    def test_normalize_groups_literals_and_in_lists(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+        self.assertEqual(normalize_sql("SELECT 1 WHERE a IN (%s)"), normalize_sql("SELECT 2 WHERE a IN (%s, %s)"))
+
+    def test_requests_record_fingerprints_with_view_and_plan(self):
+        for _ in range(2):
+            self.client.get(reverse("property-list"))
+        slow_query_log.drain()
+        row = SlowQuery.objects.get(sql__contains='FROM "properties_property"')
+        self.assertEqual(row.view, "property-list")
+        self.assertEqual(row.calls, 2)
+        self.assertGreater(row.total_ms, 0)
+        self.assertTrue(row.plan)
+        self.assertIsNotNone(row.explained_at)
+
+        out = io.StringIO()
+        call_command("slow_queries", "--plans", stdout=out)
+        self.assertIn("property-list", out.getvalue())
+
+    async def test_asgi_requests_are_recorded(self):
+        await self.async_client.get(reverse("property-list"))
+        await sync_to_async(slow_query_log.drain)()
+        row = await SlowQuery.objects.aget(sql__contains='FROM "properties_property"')
+        self.assertEqual(row.view, "property-list")
+        self.assertEqual(row.calls, 1)
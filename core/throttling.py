@@ -0,0 +1,159 @@
+"""
+Sliding-window throttles for DRF views.
+
+Each throttle keeps a log of request timestamps per key over the rate's window
+and rejects once the log is full. With ``THROTTLE_USE_REDIS`` the check and the
+insert run as one Lua script, so the limit holds across all workers; otherwise
+a per-process store is used. Rates come from ``DEFAULT_THROTTLE_RATES`` by scope;
+an empty rate disables the throttle.
+"""
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+SLIDING_WINDOW_LUA = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now_ms - window)
+if redis.call('ZCARD', KEYS[1]) >= limit then
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return {0, tonumber(oldest[2]) + window - now_ms}
+end
+redis.call('ZADD', KEYS[1], now_ms, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], window)
+return {1, 0}
+"""
+
+
+class LocalSlidingWindow:
+    """Per-process fallback with the same semantics as the Lua script."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._logs = {}
+
+    def hit(self, key, window, limit):
+        now = time.monotonic()
+        with self._lock:
+            log = self._logs.setdefault(key, deque())
+            while log and log[0] <= now - window:
+                log.popleft()
+            if len(log) >= limit:
+                return False, log[0] + window - now
+            log.append(now)
+            return True, 0.0
+
+    def clear(self):
+        with self._lock:
+            self._logs.clear()
+
+
+local_window = LocalSlidingWindow()
+_script = None
+
+
+def _redis_hit(client, key, window, limit):
+    global _script
+    if _script is None:
+        _script = client.register_script(SLIDING_WINDOW_LUA)
+    allowed, wait_ms = _script(keys=[key], args=[int(window * 1000), limit, uuid.uuid4().hex], client=client)
+    return bool(allowed), int(wait_ms) / 1000.0
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """``SimpleRateThrottle`` with an atomic sliding-window check; subclasses set ``scope`` and ``get_cache_key``."""
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def get_rate(self):
+        # Read per call rather than DRF's import-time class attribute so settings overrides apply.
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if not self.rate:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self._wait = self.hit(self.key)
+        return allowed
+
+    def hit(self, key):
+        client = get_redis_client() if settings.THROTTLE_USE_REDIS else None
+        if client is None:
+            return local_window.hit(key, self.duration, self.num_requests)
+        try:
+            return _redis_hit(client, key, self.duration, self.num_requests)
+        except Exception as exc:
+            # Fail open: an unreachable Redis must not lock everyone out.
+            logger.warning("Throttle check for %s skipped: %s", self.scope, exc)
+            return True, 0.0
+
+    def wait(self):
+        return max(self._wait, 0.0)
+
+    def parse_rate(self, rate):
+        if not rate:
+            return None, None
+        return super().parse_rate(rate)
+
+
+class IPThrottle(SlidingWindowThrottle):
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class IdentifierThrottle(SlidingWindowThrottle):
+    """Keys on a login identifier from the request body, whichever IP it comes from."""
+
+    field = "identifier"
+
+    def get_cache_key(self, request, view):
+        value = request.data.get(self.field) if hasattr(request.data, "get") else None
+        if not value or not isinstance(value, str):
+            return None
+        ident = hashlib.sha256(value.strip().lower().encode("utf-8")).hexdigest()[:32]
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class UserThrottle(SlidingWindowThrottle):
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = "login_ip"
+
+
+class LoginIdentifierThrottle(IdentifierThrottle):
+    scope = "login_identifier"
+
+
+class RegisterIPThrottle(IPThrottle):
+    scope = "register_ip"
+
+
+class RegisterEmailThrottle(IdentifierThrottle):
+    scope = "register_email"
+    field = "email"
+
+
+class BookingCreateThrottle(UserThrottle):
+    scope = "booking_create"
@@ -0,0 +1,288 @@
+"""
+Two-tier cache backend: a bounded in-process LRU in front of Redis.
+
+Reads are served from the worker's LRU when possible (entries live at most
+``LOCAL_TTL`` seconds, ``LOCAL_MAX_ENTRIES`` at most), then from Redis; Redis
+hits are copied into the LRU. Every write goes to Redis and publishes the key on
+``CHANNEL``; each worker runs a listener thread that drops published keys from
+its LRU, so other workers see a change after one pub/sub hop instead of after
+``LOCAL_TTL``. While the listener is disconnected the LRU is bypassed. The LRU
+and the listener are per process (``LocalTier``), shared by the backend
+instances Django creates for each thread and async context.
+
+Configure with ``"BACKEND": "core.tiered_cache.TwoTierRedisCache"`` and, in
+``OPTIONS``, ``LOCAL_MAX_ENTRIES``, ``LOCAL_TTL`` (0 disables the local tier) and
+``CHANNEL``; the remaining options go to Django's RedisCache.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+
+from core.metrics import inc
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """Thread-safe LRU of pickled values with a per-entry deadline."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            blob, deadline = entry
+            if deadline <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+        return pickle.loads(blob)
+
+    def set(self, key, value, ttl):
+        if ttl <= 0 or self.max_entries <= 0:
+            self.delete(key)
+            return
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (blob, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LocalTier:
+    """
+    A process's LRU and invalidation listener for one Redis location and channel.
+
+    Django builds a cache backend per thread and per async context, so the tier
+    lives in a module-level registry (``shared_tier``) and every backend instance
+    for the same location and channel uses the same LRU and the same listener.
+    """
+
+    def __init__(self, channel, max_entries, get_client):
+        self.channel = channel
+        self.lru = LocalLRU(max_entries)
+        self.origin = uuid.uuid4().hex
+        self._get_client = get_client
+        self._lock = threading.Lock()
+        self._pid = None
+        self.listening = False
+
+    def ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Also runs after a fork: the parent's thread does not exist in the child.
+            self._pid = os.getpid()
+            self.listening = False
+            self.lru.clear()
+            threading.Thread(target=self._listen, name="cache-invalidation", daemon=True).start()
+
+    def handle_invalidation(self, message):
+        origin, _, key = message.partition(":")
+        if origin == self.origin:
+            return
+        if key == "*":
+            self.lru.clear()
+        else:
+            self.lru.delete(key)
+
+    def _listen(self):
+        backoff = 0.5
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._get_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Anything cached before the subscription may have missed an invalidation.
+                self.lru.clear()
+                self.listening = True
+                backoff = 0.5
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        data = message["data"]
+                        self.handle_invalidation(data.decode() if isinstance(data, bytes) else data)
+            except Exception as exc:
+                if self.listening:
+                    logger.warning("Cache invalidation listener disconnected: %s", exc)
+                self.listening = False
+                self.lru.clear()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def shared_tier(servers, channel, max_entries, get_client):
+    """The process's ``LocalTier`` for ``(servers, channel)``; the first caller's size and client win."""
+    key = (tuple(servers), channel)
+    with _tiers_lock:
+        tier = _tiers.get(key)
+        if tier is None:
+            tier = _tiers[key] = LocalTier(channel, max_entries, get_client)
+        return tier
+
+
+class TwoTierRedisCache(RedisCache):
+    def __init__(self, server, params):
+        options = dict(params.get("OPTIONS", {}))
+        self.local_ttl = float(options.pop("LOCAL_TTL", 5))
+        channel = options.pop("CHANNEL", "cache:invalidate")
+        max_entries = int(options.pop("LOCAL_MAX_ENTRIES", 1000))
+        super().__init__(server, dict(params, OPTIONS=options))
+        self.tier = shared_tier(self._servers, channel, max_entries, lambda: self._cache.get_client(write=True))
+        self.local = self.tier.lru
+
+    # Local tier -------------------------------------------------------------
+
+    def _local_enabled(self):
+        if self.local_ttl <= 0:
+            return False
+        self.tier.ensure_listener()
+        return self.tier.listening
+
+    def _local_ttl(self, timeout):
+        backend_timeout = self.get_backend_timeout(timeout)
+        return self.local_ttl if backend_timeout is None else min(self.local_ttl, backend_timeout)
+
+    def _publish(self, keys):
+        self._drop_local(keys)
+        try:
+            client = self._cache.get_client(write=True)
+            for key in keys:
+                client.publish(self.tier.channel, f"{self.tier.origin}:{key}")
+        except Exception as exc:
+            logger.warning("Could not publish cache invalidation: %s", exc)
+
+    def _drop_local(self, keys):
+        for key in keys:
+            self.local.delete(key)
+
+    # Cache API ---------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        use_local = self._local_enabled()
+        if use_local:
+            value = self.local.get(key)
+            if value is not _MISSING:
+                inc("cache_tier_requests_total", tier="local", result="hit")
+                return value
+            inc("cache_tier_requests_total", tier="local", result="miss")
+        value = self._cache.get(key, _MISSING)
+        if value is _MISSING:
+            inc("cache_tier_requests_total", tier="redis", result="miss")
+            return default
+        inc("cache_tier_requests_total", tier="redis", result="hit")
+        if use_local:
+            self.local.set(key, value, self.local_ttl)
+        return value
+
+    def get_many(self, keys, version=None):
+        result = {}
+        remote = []
+        use_local = self._local_enabled()
+        for key in keys:
+            made = self.make_and_validate_key(key, version=version)
+            value = self.local.get(made) if use_local else _MISSING
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                result[key] = value
+        if use_local:
+            inc("cache_tier_requests_total", len(result), tier="local", result="hit")
+            inc("cache_tier_requests_total", len(remote), tier="local", result="miss")
+        if remote:
+            fetched = super().get_many(remote, version=version)
+            inc("cache_tier_requests_total", len(fetched), tier="redis", result="hit")
+            inc("cache_tier_requests_total", len(remote) - len(fetched), tier="redis", result="miss")
+            for key, value in fetched.items():
+                if use_local:
+                    self.local.set(self.make_and_validate_key(key, version=version), value, self.local_ttl)
+            result.update(fetched)
+        return result
+
+    def has_key(self, key, version=None):
+        if self._local_enabled() and self.local.get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return super().has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, value, timeout, version=version)
+        made = self.make_and_validate_key(key, version=version)
+        self._publish([made])
+        if self._local_enabled():
+            self.local.set(made, value, self._local_ttl(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = super().add(key, value, timeout, version=version)
+        if added:
+            self._publish([self.make_and_validate_key(key, version=version)])
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = super().touch(key, timeout, version=version)
+        if touched and self.get_backend_timeout(timeout) == 0:
+            self._publish([self.make_and_validate_key(key, version=version)])
+        return touched
+
+    def delete(self, key, version=None):
+        deleted = super().delete(key, version=version)
+        self._publish([self.make_and_validate_key(key, version=version)])
+        return deleted
+
+    def incr(self, key, delta=1, version=None):
+        value = super().incr(key, delta, version=version)
+        self._publish([self.make_and_validate_key(key, version=version)])
+        return value
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = super().set_many(data, timeout, version=version)
+        self._publish([self.make_and_validate_key(key, version=version) for key in data])
+        return failed
+
+    def delete_many(self, keys, version=None):
+        super().delete_many(keys, version=version)
+        self._publish([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def clear(self):
+        cleared = super().clear()
+        self.local.clear()
+        self._publish(["*"])
+        return cleared
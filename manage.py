@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'realestate.settings')
+    # The test command gets the test settings (adds the SQLite replica alias).
+    settings_module = 'realestate.test_settings' if sys.argv[1:2] == ['test'] else 'realestate.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
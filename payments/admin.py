@@ -1,11 +1,78 @@
-from django.contrib import admin
+import json
+from collections import defaultdict
 
-from .models import Payment
+from django.contrib import admin, messages
+from django.db import transaction
+from django.utils.html import format_html
+
+from core.admin import LargeTableAdminMixin
+
+from .models import Payment, PaymentPayload, WebhookEvent
+
+
+class PaymentPayloadInline(admin.TabularInline):
+    model = PaymentPayload
+    fields = ("source", "created_at", "decoded")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Payload")
+    def decoded(self, obj):
+        return format_html("<pre>{}</pre>", json.dumps(obj.content, indent=2))
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("id", "booking", "provider", "transaction_id", "status", "created_at")
     list_filter = ("provider", "status")
-    search_fields = ("transaction_id", "booking__id")
+    # Booking.__str__ includes the property name.
+    list_select_related = ("booking__property",)
+    list_only = (
+        "id",
+        "provider",
+        "transaction_id",
+        "status",
+        "created_at",
+        "booking__id",
+        "booking__property__id",
+        "booking__property__name",
+    )
+    search_lookups = {"transaction_id": "exact", "booking": "pk"}
     raw_id_fields = ("booking",)
+    inlines = (PaymentPayloadInline,)
+    actions = ("mark_failed",)
+
+    @admin.action(description="Mark selected pending payments failed", permissions=["change"])
+    def mark_failed(self, request, queryset):
+        # Through the guarded transition, so a payment settled meanwhile is left alone;
+        # transition_many invalidates dashboards and publishes only the rows it moved.
+        by_provider = defaultdict(list)
+        for provider, transaction_id in queryset.filter(status=Payment.STATUS_PENDING).values_list(
+            "provider", "transaction_id"
+        ):
+            by_provider[provider].append((transaction_id, Payment.STATUS_FAILED, None))
+        with transaction.atomic():
+            moved = [
+                row
+                for provider, updates in by_provider.items()
+                for row in Payment.objects.transition_many(provider, updates)
+            ]
+        self.message_user(request, f"{len(moved)} payments marked failed.", messages.SUCCESS)
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ("id", "provider", "event_id", "status", "attempts", "received_at", "processed_at")
+    list_filter = ("provider", "status")
+    search_lookups = {"event_id": "exact"}
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term.strip():
+            # event_id is indexed only as the second column of (provider, event_id).
+            queryset = queryset.filter(provider__in=[value for value, _ in Payment.PROVIDER_CHOICES])
+        return queryset, may_have_duplicates
@@ -0,0 +1,277 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Provider object ids (Stripe ``pi_...``, ``ch_...``, ...); fixed segments such as
+# ``payment_intents`` also contain underscores, so only known prefixes count.
+_PREFIXED_ID = re.compile(
+    r"^(?:acct|ba|card|ch|cs|cus|evt|in|pi|pm|po|price|prod|py|re|seti|si|src|sub|tok|tr|txn)_[A-Za-z0-9_]+$"
+)
+_VERSION = re.compile(r"^v\d+$")
+
+
+def _is_id(segment):
+    if _PREFIXED_ID.match(segment):
+        return True
+    return any(char.isdigit() for char in segment) and not _VERSION.match(segment)
+
+
+def operation_name(method, url):
+    """Low-cardinality label for a provider call, e.g. ``GET /v1/payment_intents/{id}``."""
+    segments = (urlsplit(url).path or "/").split("/")
+    path = "/".join("{id}" if segment and _is_id(segment) else segment for segment in segments)
+    return f"{method.upper()} {path}"
+
+
+class LatencyStats:
+    """Thread-safe per-operation call counters and latency totals."""
+
+    def __init__(self, provider=""):
+        self.provider = provider
+        self._lock = threading.Lock()
+        self._ops = defaultdict(lambda: {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+
+    def record(self, operation, elapsed, ok=True):
+        with self._lock:
+            entry = self._ops[operation]
+            entry["count"] += 1
+            entry["total_seconds"] += elapsed
+            entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+            if not ok:
+                entry["errors"] += 1
+        metrics.observe("provider_request_duration_seconds", elapsed, provider=self.provider, operation=operation)
+
+    def snapshot(self):
+        with self._lock:
+            return {op: dict(entry) for op, entry in self._ops.items()}
+
+
+class ProviderHTTPClient:
+    """
+    Pooled HTTP client for one payment provider.
+
+    Keeps a ``requests.Session`` with its own connection pool so TCP/TLS
+    connections are reused across calls. Idempotent calls are retried with
+    jittered exponential backoff; every call is bounded by a total timeout
+    budget that covers all attempts.
+    """
+
+    def __init__(
+        self,
+        name,
+        base_url="",
+        *,
+        timeout=10.0,
+        connect_timeout=3.05,
+        max_retries=2,
+        backoff=0.2,
+        pool_maxsize=10,
+    ):
+        self.name = name
+        self.base_url = (base_url or "").rstrip("/")
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = LatencyStats(name)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _url(self, path):
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}{path}"
+
+    def _sleep_before_retry(self, attempt, deadline):
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        remaining = deadline - time.monotonic()
+        if delay >= remaining:
+            return False
+        time.sleep(delay)
+        return True
+
+    def request(self, method, path, *, idempotent=None, timeout=None, **kwargs):
+        """
+        Send a request and return the ``requests.Response``.
+
+        ``idempotent`` defaults to the HTTP method semantics; pass True for
+        provider POST endpoints that are safe to repeat (token grants, queries).
+        ``timeout`` is the total budget in seconds across all attempts.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        url = self._url(path)
+        operation = operation_name(method, url)
+        deadline = time.monotonic() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise requests.Timeout(f"{self.name} {operation}: timeout budget exhausted")
+            start = time.monotonic()
+            try:
+                resp = self.session.request(
+                    method,
+                    url,
+                    timeout=(min(self.connect_timeout, remaining), remaining),
+                    **kwargs,
+                )
+            except requests.ConnectTimeout:
+                # The request never left this host, so any method may be retried.
+                self.stats.record(operation, time.monotonic() - start, ok=False)
+                if attempt >= self.max_retries or not self._sleep_before_retry(attempt, deadline):
+                    raise
+            except (requests.ConnectionError, requests.Timeout):
+                self.stats.record(operation, time.monotonic() - start, ok=False)
+                if not idempotent or attempt >= self.max_retries or not self._sleep_before_retry(attempt, deadline):
+                    raise
+            else:
+                ok = resp.status_code < 500
+                self.stats.record(operation, time.monotonic() - start, ok=ok)
+                if (
+                    resp.status_code in RETRY_STATUSES
+                    and idempotent
+                    and attempt < self.max_retries
+                    and self._sleep_before_retry(attempt, deadline)
+                ):
+                    resp.close()
+                else:
+                    return resp
+            attempt += 1
+            logger.info("Retrying %s %s (attempt %s)", self.name, operation, attempt + 1)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class StripeRequestsClient(stripe.RequestsClient):
+    """
+    Stripe HTTP client that shares a provider session and records latencies.
+
+    Stripe retries inside ``_request_with_retries_internal``; the provider's
+    ``timeout`` is enforced as a total budget across those attempts: each
+    attempt's read timeout and each backoff sleep are capped by what is left,
+    and no attempt starts once it is spent.
+    """
+
+    def __init__(self, provider_client, **kwargs):
+        self._deadline = threading.local()
+        kwargs.setdefault("timeout", (provider_client.connect_timeout, provider_client.timeout))
+        super().__init__(session=provider_client.session, **kwargs)
+        self.provider_client = provider_client
+
+    def _remaining(self):
+        deadline = getattr(self._deadline, "value", None)
+        return None if deadline is None else deadline - time.monotonic()
+
+    @property
+    def _timeout(self):
+        # Read by stripe.RequestsClient for every attempt.
+        remaining = self._remaining()
+        if remaining is None:
+            return self._default_timeout
+        return (min(self.provider_client.connect_timeout, remaining), remaining)
+
+    @_timeout.setter
+    def _timeout(self, value):
+        self._default_timeout = value
+
+    def _request_with_retries_internal(self, *args, **kwargs):
+        self._deadline.value = time.monotonic() + self.provider_client.timeout
+        try:
+            return super()._request_with_retries_internal(*args, **kwargs)
+        finally:
+            self._deadline.value = None
+
+    def _should_retry(self, response, api_connection_error, num_retries, max_network_retries):
+        remaining = self._remaining()
+        if remaining is not None and remaining <= 0:
+            return False
+        return super()._should_retry(response, api_connection_error, num_retries, max_network_retries)
+
+    def _sleep_time_seconds(self, num_retries, response=None):
+        sleep = super()._sleep_time_seconds(num_retries, response)
+        remaining = self._remaining()
+        return sleep if remaining is None else max(0.0, min(sleep, remaining))
+
+    def request(self, method, url, headers, post_data=None):
+        remaining = self._remaining()
+        if remaining is not None and remaining <= 0:
+            raise stripe.APIConnectionError(
+                f"{self.provider_client.name} {operation_name(method, url)}: timeout budget exhausted", should_retry=False
+            )
+        start = time.monotonic()
+        ok = False
+        try:
+            content, status_code, response_headers = super().request(method, url, headers, post_data)
+            ok = status_code < 500
+            return content, status_code, response_headers
+        finally:
+            self.provider_client.stats.record(operation_name(method, url), time.monotonic() - start, ok=ok)
+
+
+def build_stripe_client(provider_client, api_key, api_base=""):
+    # Stripe retries with jittered backoff itself and sends idempotency keys on POST retries.
+    return stripe.StripeClient(
+        api_key,
+        http_client=StripeRequestsClient(provider_client),
+        max_network_retries=provider_client.max_retries,
+        base_addresses={"api": api_base} if api_base else None,
+    )
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_provider_client(name, base_url=""):
+    """Return the process-wide pooled client for a provider, creating it on first use."""
+    key = (name, base_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = ProviderHTTPClient(
+                name,
+                base_url,
+                timeout=settings.PAYMENT_HTTP_TIMEOUT,
+                connect_timeout=settings.PAYMENT_HTTP_CONNECT_TIMEOUT,
+                max_retries=settings.PAYMENT_HTTP_MAX_RETRIES,
+                backoff=settings.PAYMENT_HTTP_BACKOFF,
+                pool_maxsize=settings.PAYMENT_HTTP_POOL_MAXSIZE,
+            )
+            _clients[key] = client
+    return client
+
+
+def reset_provider_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
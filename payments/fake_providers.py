@@ -0,0 +1,287 @@
+"""
+Local stand-in for the Stripe and bKash endpoints used by ``payments.services``.
+
+Stripe is served under ``/v1/...`` (point ``STRIPE_API_BASE`` at the server root)
+and bKash under ``/bkash/...`` (point ``BKASH_BASE_URL`` at ``<root>/bkash``).
+Latency, injected 503s and webhook callbacks are controlled by ``FakeProviderConfig``.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FakeProviderConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    # App root to deliver webhooks to, e.g. http://127.0.0.1:8000; empty disables callbacks.
+    webhook_url: str = ""
+    webhook_delay: float = 0.0
+    # "succeeded" or "failed": outcome reported for every created payment.
+    outcome: str = "succeeded"
+    stripe_webhook_secret: str = ""
+
+    def sleep(self):
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+def stripe_signature(payload, secret, timestamp=None):
+    """Build a ``Stripe-Signature`` header value the way Stripe signs webhooks."""
+    timestamp = int(timestamp or time.time())
+    signed = f"{timestamp}.{payload}".encode("utf-8")
+    digest = hmac.new(secret.encode("utf-8"), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+class FakeProviderState:
+    """In-memory Stripe PaymentIntents and bKash payments."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stripe_intents = {}
+        self.bkash_payments = {}
+        self.idempotency_keys = {}
+
+    def create_intent(self, params, idempotency_key=None):
+        """Create an intent; returns ``(intent, created)`` so idempotent replays are visible."""
+        if idempotency_key:
+            with self.lock:
+                intent_id = self.idempotency_keys.get(idempotency_key)
+                if intent_id:
+                    return dict(self.stripe_intents[intent_id]), False
+        intent_id = f"pi_fake{uuid.uuid4().hex[:20]}"
+        metadata = {key[len("metadata["):-1]: value for key, value in params.items() if key.startswith("metadata[")}
+        intent = {
+            "id": intent_id,
+            "object": "payment_intent",
+            "amount": int(params.get("amount", 0)),
+            "currency": params.get("currency", "usd"),
+            "status": "requires_payment_method",
+            "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex[:12]}",
+            "metadata": metadata,
+            "last_payment_error": None,
+        }
+        with self.lock:
+            self.stripe_intents[intent_id] = intent
+            if idempotency_key:
+                self.idempotency_keys[idempotency_key] = intent_id
+        return dict(intent), True
+
+    def set_intent_status(self, intent_id, status, **fields):
+        with self.lock:
+            intent = self.stripe_intents.setdefault(
+                intent_id, {"id": intent_id, "object": "payment_intent", "metadata": {}, "last_payment_error": None}
+            )
+            intent.update(status=status, **fields)
+            return dict(intent)
+
+    def create_bkash_payment(self, body):
+        payment_id = f"TR{uuid.uuid4().hex[:16].upper()}"
+        payment = {
+            "paymentID": payment_id,
+            "amount": body.get("amount"),
+            "currency": body.get("currency", "BDT"),
+            "merchantInvoiceNumber": body.get("merchantInvoiceNumber"),
+            "transactionStatus": "Initiated",
+            "bkashURL": f"https://bkash.fake/checkout/{payment_id}",
+        }
+        with self.lock:
+            self.bkash_payments[payment_id] = payment
+        return dict(payment)
+
+    def set_bkash_status(self, payment_id, status):
+        with self.lock:
+            payment = self.bkash_payments.setdefault(payment_id, {"paymentID": payment_id})
+            payment["transactionStatus"] = status
+            if status == "Completed":
+                payment.setdefault("trxID", f"TRX{uuid.uuid4().hex[:10].upper()}")
+            return dict(payment)
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length).decode("utf-8") if length else ""
+
+    def _send(self, status_code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        self._send(404, {"error": {"message": f"Unknown route {self.command} {self.path}"}})
+
+    def _inject_faults(self):
+        """Apply configured latency; returns True if an error response was sent instead."""
+        self.config.sleep()
+        if self.config.should_fail():
+            self._send(503, {"error": {"type": "api_error", "message": "Injected failure"}})
+            return True
+        return False
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if self._inject_faults():
+            return None
+        if path.startswith("/v1/payment_intents/"):
+            intent_id = path.rsplit("/", 1)[-1]
+            with self.state.lock:
+                intent = self.state.stripe_intents.get(intent_id)
+                intent = dict(intent) if intent else None
+            if not intent:
+                return self._send(404, {"error": {"type": "invalid_request_error", "message": "No such payment_intent"}})
+            return self._send(200, intent)
+        return self._not_found()
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        raw = self._read_body()
+        if self._inject_faults():
+            return None
+        if path == "/v1/payment_intents":
+            intent, created = self.state.create_intent(dict(parse_qsl(raw)), self.headers.get("Idempotency-Key"))
+            if created:
+                self.server.schedule_stripe_webhook(intent["id"])
+            return self._send(200, intent)
+        if path.startswith("/bkash/"):
+            return self._bkash(path[len("/bkash"):], json.loads(raw or "{}"))
+        return self._not_found()
+
+    def _bkash(self, path, body):
+        if path == "/token/grant":
+            return self._send(200, {"id_token": f"fake-token-{uuid.uuid4().hex}", "token_type": "Bearer", "expires_in": 3600})
+        if not self.headers.get("authorization"):
+            return self._send(401, {"statusMessage": "Unauthorized"})
+        if path == "/checkout/payment/create":
+            payment = self.state.create_bkash_payment(body)
+            self.server.schedule_bkash_webhook(payment["paymentID"])
+            return self._send(200, payment)
+        payment_id = body.get("paymentID")
+        with self.state.lock:
+            known = payment_id in self.state.bkash_payments
+        if not known:
+            return self._send(200, {"errorCode": "2056", "errorMessage": "Invalid Payment State"})
+        if path == "/checkout/payment/execute":
+            return self._send(200, self.state.set_bkash_status(payment_id, "Completed"))
+        if path == "/checkout/payment/query":
+            with self.state.lock:
+                return self._send(200, dict(self.state.bkash_payments[payment_id]))
+        return self._not_found()
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, config=None, verbose=False):
+        super().__init__((host, port), FakeProviderHandler)
+        self.state = FakeProviderState()
+        self.config = config or FakeProviderConfig()
+        self.verbose = verbose
+        self._thread = None
+        self._webhooks = requests.Session()
+
+    def _later(self, func, *args):
+        timer = threading.Timer(self.config.webhook_delay, func, args)
+        timer.daemon = True
+        timer.start()
+
+    def _deliver(self, path, payload, headers):
+        try:
+            resp = self._webhooks.post(
+                f"{self.config.webhook_url.rstrip('/')}{path}",
+                data=payload,
+                headers={"Content-Type": "application/json", **headers},
+                timeout=10,
+            )
+            if resp.status_code >= 400:
+                logger.warning("Webhook %s answered %s", path, resp.status_code)
+        except requests.RequestException as exc:
+            logger.warning("Webhook %s failed: %s", path, exc)
+
+    def schedule_stripe_webhook(self, intent_id):
+        if self.config.webhook_url:
+            self._later(self._send_stripe_webhook, intent_id)
+
+    def _send_stripe_webhook(self, intent_id):
+        succeeded = self.config.outcome == "succeeded"
+        intent = self.state.set_intent_status(
+            intent_id,
+            "succeeded" if succeeded else "requires_payment_method",
+            last_payment_error=None if succeeded else {"code": "card_declined"},
+        )
+        event = {
+            "id": f"evt_fake{uuid.uuid4().hex[:20]}",
+            "object": "event",
+            "type": "payment_intent.succeeded" if succeeded else "payment_intent.payment_failed",
+            "data": {"object": intent},
+        }
+        payload = json.dumps(event)
+        headers = {}
+        if self.config.stripe_webhook_secret:
+            headers["Stripe-Signature"] = stripe_signature(payload, self.config.stripe_webhook_secret)
+        self._deliver("/api/payments/webhook/stripe/", payload, headers)
+
+    def schedule_bkash_webhook(self, payment_id):
+        if self.config.webhook_url:
+            self._later(self._send_bkash_webhook, payment_id)
+
+    def _send_bkash_webhook(self, payment_id):
+        status = "Completed" if self.config.outcome == "succeeded" else "Failed"
+        payment = self.state.set_bkash_status(payment_id, status)
+        self._deliver("/api/payments/webhook/bkash/", json.dumps(payment), {})
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-providers", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._webhooks.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
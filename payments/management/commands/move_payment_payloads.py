@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from payments.models import PaymentPayload, compress_payload
+
+
+class Command(BaseCommand):
+    help = "Move legacy payments_payment.raw_response values into compressed PaymentPayload rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # raw_response is no longer a model field, so the legacy column is read with SQL.
+        with connection.cursor() as cursor:
+            columns = {col.name for col in connection.introspection.get_table_description(cursor, "payments_payment")}
+        if "raw_response" not in columns:
+            self.stdout.write("No legacy raw_response column; nothing to move.")
+            return
+        table = connection.ops.quote_name("payments_payment")
+        select_sql = (
+            f"SELECT id, raw_response FROM {table} "
+            f"WHERE raw_response IS NOT NULL AND id > %s ORDER BY id LIMIT %s"
+        )
+        moved = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(select_sql, [last_id, batch_size])
+                    rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                payloads = []
+                secrets = []
+                for payment_id, raw in rows:
+                    if isinstance(raw, (str, bytes)):
+                        raw = json.loads(raw)
+                    if raw:
+                        payloads.append(
+                            PaymentPayload(payment_id=payment_id, source=PaymentPayload.SOURCE_LEGACY, data=compress_payload(raw))
+                        )
+                        if isinstance(raw, dict) and raw.get("client_secret"):
+                            secrets.append((raw["client_secret"], payment_id))
+                PaymentPayload.objects.bulk_create(payloads)
+                with connection.cursor() as cursor:
+                    if secrets:
+                        cursor.executemany(
+                            f"UPDATE {table} SET client_secret = %s WHERE id = %s AND client_secret = ''",
+                            secrets,
+                        )
+                    ids = [row[0] for row in rows]
+                    placeholders = ", ".join(["%s"] * len(ids))
+                    cursor.execute(f"UPDATE {table} SET raw_response = NULL WHERE id IN ({placeholders})", ids)
+            moved += len(rows)
+            self.stdout.write(f"Moved {moved} payment(s) (last id {last_id}).")
+        self.stdout.write(self.style.SUCCESS(f"Done. {moved} payment(s) moved."))
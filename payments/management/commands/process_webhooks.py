@@ -0,0 +1,40 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+
+from payments.webhooks import process_webhook_batch
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Process queued payment provider webhooks in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--max-attempts", type=int, default=5)
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new events instead of exiting when drained.")
+        parser.add_argument("--idle-sleep", type=float, default=1.0, help="Seconds to wait between polls when idle (with --loop).")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            try:
+                processed = process_webhook_batch(options["batch_size"], options["max_attempts"])
+            except DatabaseError:
+                if not options["loop"]:
+                    raise
+                # Keep a long-running worker alive across transient DB errors.
+                logger.exception("Webhook batch failed; retrying")
+                close_old_connections()
+                time.sleep(options["idle_sleep"])
+                continue
+            total += processed
+            if processed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["idle_sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} webhook event(s)."))
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payments.reconciliation import reconcile_pending_payments
+
+
+class Command(BaseCommand):
+    help = "Query providers for stale pending payments and apply the results."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=15, help="Minutes a payment must have been pending.")
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--rate", type=float, default=10.0, help="Max provider queries per second (0 = unlimited).")
+        parser.add_argument("--provider", choices=list(settings.PAYMENT_PROVIDERS))
+        parser.add_argument("--dry-run", action="store_true", help="Query providers but do not update payments.")
+
+    def handle(self, *args, **options):
+        def progress(summary):
+            self.stdout.write(
+                "checked={checked} success={success} failed={failed} pending={pending} "
+                "errors={errors} expired={expired}".format(**summary)
+            )
+
+        summary = reconcile_pending_payments(
+            older_than=timedelta(minutes=options["older_than"]),
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            rate=options["rate"],
+            provider=options["provider"],
+            dry_run=options["dry_run"],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Reconciliation complete: {summary}"))
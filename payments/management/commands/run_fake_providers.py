@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from payments.fake_providers import FakeProviderConfig, FakeProviderServer
+
+
+class Command(BaseCommand):
+    help = "Run a local fake Stripe/bKash server for offline and load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=12111)
+        parser.add_argument("--latency-ms", type=float, default=0.0)
+        parser.add_argument("--jitter-ms", type=float, default=0.0)
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 503.")
+        parser.add_argument("--webhook-url", default="", help="App root to send webhooks to, e.g. http://127.0.0.1:8000")
+        parser.add_argument("--webhook-delay", type=float, default=0.5)
+        parser.add_argument("--outcome", choices=["succeeded", "failed"], default="succeeded")
+        parser.add_argument("--stripe-webhook-secret", default="", help="Sign Stripe webhooks with this secret.")
+        parser.add_argument("--verbose", action="store_true")
+
+    def handle(self, *args, **options):
+        config = FakeProviderConfig(
+            latency_ms=options["latency_ms"],
+            jitter_ms=options["jitter_ms"],
+            error_rate=options["error_rate"],
+            webhook_url=options["webhook_url"],
+            webhook_delay=options["webhook_delay"],
+            outcome=options["outcome"],
+            stripe_webhook_secret=options["stripe_webhook_secret"],
+        )
+        server = FakeProviderServer(options["host"], options["port"], config=config, verbose=options["verbose"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Fake providers on {server.base_url}\n"
+                f"  STRIPE_API_BASE={server.base_url}\n"
+                f"  BKASH_BASE_URL={server.base_url}/bkash"
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
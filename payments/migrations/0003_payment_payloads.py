@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_webhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='client_secret',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        # Keep the legacy column (now nullable) until `move_payment_payloads` has
+        # copied it into PaymentPayload; the model no longer reads or writes it.
+        migrations.AlterField(
+            model_name='payment',
+            name='raw_response',
+            field=models.JSONField(blank=True, default=dict, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='payment',
+                    name='raw_response',
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PaymentPayload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('initiate', 'Initiate'), ('webhook', 'Webhook'), ('execute', 'Execute'), ('query', 'Query'), ('error', 'Error'), ('legacy', 'Legacy raw_response')], max_length=20)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payloads', to='payments.payment')),
+            ],
+            options={
+                'ordering': ('-id',),
+            },
+        ),
+    ]
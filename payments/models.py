@@ -1,4 +1,131 @@
-from django.db import models
+import json
+import sqlite3
+import uuid
+import zlib
+from collections import defaultdict
+
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+
+from bookings.models import Booking
+from users.dashboard import invalidate_dashboards
+from users.events import publish_payment_statuses
+
+
+def compress_payload(data):
+    return zlib.compress(json.dumps(data, separators=(",", ":"), default=str).encode("utf-8"), 6)
+
+
+def decompress_payload(blob):
+    return json.loads(zlib.decompress(bytes(blob)).decode("utf-8"))
+
+
+def _supports_update_returning(connection):
+    if connection.vendor == "postgresql":
+        return True
+    return connection.vendor == "sqlite" and sqlite3.sqlite_version_info >= (3, 35)
+
+
+class PaymentQuerySet(models.QuerySet):
+    def transition(self, provider, transaction_id, status, raw=None, source=None):
+        """Single-payment form of ``transition_many``; returns True if the payment moved."""
+        return bool(self.transition_many(provider, [(transaction_id, status, raw)], source=source))
+
+    def transition_many(self, provider, updates, source=None):
+        """
+        Move pending payments to a final status.
+
+        ``updates`` is an iterable of ``(transaction_id, status, raw)``. Each status
+        group is one ``UPDATE ... WHERE status = 'pending'`` so a late or concurrent
+        event can never regress a settled payment, and bookings of successful
+        payments are marked paid in the same transaction (in the same statement on
+        PostgreSQL). Returns ``[(payment_id, booking_id, status), ...]`` for the rows
+        that actually moved.
+        """
+        by_status = defaultdict(dict)
+        for transaction_id, status, raw in updates:
+            by_status[status].setdefault(transaction_id, raw)
+        if not by_status:
+            return []
+
+        source = source or PaymentPayload.SOURCE_WEBHOOK
+        db = router.db_for_write(Payment)
+        connection = connections[db]
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        moved = []
+        payloads = []
+        with transaction.atomic(using=db):
+            # Success first: if one batch carries both outcomes, the money wins.
+            for status in sorted(by_status, key=lambda value: value != Payment.STATUS_SUCCESS):
+                raws = by_status[status]
+                rows = self._transition_rows(connection, provider, list(raws), status, now)
+                for payment_id, booking_id, transaction_id in rows:
+                    moved.append((payment_id, booking_id, status))
+                    if raws[transaction_id] is not None:
+                        payloads.append(
+                            PaymentPayload(payment_id=payment_id, source=source, data=compress_payload(raws[transaction_id]))
+                        )
+            if payloads:
+                PaymentPayload.objects.using(db).bulk_create(payloads)
+            # Raw UPDATEs send no signals, so owners' dashboards are invalidated here.
+            if moved:
+                owners = dict(
+                    Booking.objects.using(db).filter(id__in={booking_id for _, booking_id, _ in moved}).values_list("id", "user_id")
+                )
+                invalidate_dashboards(owners.values())
+                publish_payment_statuses(moved, owners)
+        return moved
+
+    def _transition_rows(self, connection, provider, transaction_ids, status, now):
+        qn = connection.ops.quote_name
+        payment_table = qn(Payment._meta.db_table)
+        booking_table = qn(Booking._meta.db_table)
+        placeholders = ", ".join(["%s"] * len(transaction_ids))
+        where = f"provider = %s AND status = %s AND transaction_id IN ({placeholders})"
+        where_params = [provider, Payment.STATUS_PENDING, *transaction_ids]
+        cascade = status == Payment.STATUS_SUCCESS
+
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql" and cascade:
+                cursor.execute(
+                    f"WITH moved AS ("
+                    f"UPDATE {payment_table} SET status = %s, updated_at = %s WHERE {where} "
+                    f"RETURNING id, booking_id, transaction_id"
+                    f"), paid AS ("
+                    f"UPDATE {booking_table} SET status = %s, updated_at = %s "
+                    f"WHERE id IN (SELECT booking_id FROM moved) AND status <> %s"
+                    f") SELECT id, booking_id, transaction_id FROM moved",
+                    [status, now, *where_params, Booking.STATUS_PAID, now, Booking.STATUS_PAID],
+                )
+                return cursor.fetchall()
+
+            if _supports_update_returning(connection):
+                cursor.execute(
+                    f"UPDATE {payment_table} SET status = %s, updated_at = %s WHERE {where} "
+                    f"RETURNING id, booking_id, transaction_id",
+                    [status, now, *where_params],
+                )
+                rows = cursor.fetchall()
+            else:
+                rows = list(
+                    Payment.objects.using(connection.alias)
+                    .select_for_update()
+                    .filter(provider=provider, status=Payment.STATUS_PENDING, transaction_id__in=transaction_ids)
+                    .values_list("id", "booking_id", "transaction_id")
+                )
+                if rows:
+                    Payment.objects.using(connection.alias).filter(
+                        id__in=[row[0] for row in rows], status=Payment.STATUS_PENDING
+                    ).update(status=status, updated_at=timezone.now())
+
+            if cascade and rows:
+                booking_ids = [row[1] for row in rows]
+                cursor.execute(
+                    f"UPDATE {booking_table} SET status = %s, updated_at = %s "
+                    f"WHERE id IN ({', '.join(['%s'] * len(booking_ids))}) AND status <> %s",
+                    [Booking.STATUS_PAID, now, *booking_ids, Booking.STATUS_PAID],
+                )
+        return rows
 
 
 class Payment(models.Model):
@@ -18,14 +145,20 @@ class Payment(models.Model):
         (STATUS_FAILED, "Failed"),
     ]
 
+    # Placeholder transaction ids for payments reserved before the provider call returns.
+    RESERVED_PREFIX = "reserved-"
+
     booking = models.ForeignKey("bookings.Booking", related_name="payments", on_delete=models.CASCADE)
     provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES)
     transaction_id = models.CharField(max_length=255, unique=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
-    raw_response = models.JSONField(default=dict, blank=True)
+    # Full provider responses live in PaymentPayload; only what the flows read stays here.
+    client_secret = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PaymentQuerySet.as_manager()
+
     class Meta:
         ordering = ("-created_at",)
         indexes = [
@@ -35,3 +168,84 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"Payment #{self.id} - {self.provider}"
+
+    @classmethod
+    def reserved_transaction_id(cls):
+        return f"{cls.RESERVED_PREFIX}{uuid.uuid4().hex}"
+
+    @property
+    def is_reserved(self):
+        return self.transaction_id.startswith(self.RESERVED_PREFIX)
+
+    def record_payload(self, source, data):
+        return PaymentPayload.objects.create(payment=self, source=source, data=compress_payload(data))
+
+    def latest_payload(self):
+        payload = self.payloads.order_by("-id").first()
+        return payload.content if payload else {}
+
+
+class PaymentPayload(models.Model):
+    """Append-only, zlib-compressed provider payloads kept off the hot Payment row."""
+
+    SOURCE_INITIATE = "initiate"
+    SOURCE_WEBHOOK = "webhook"
+    SOURCE_EXECUTE = "execute"
+    SOURCE_QUERY = "query"
+    SOURCE_ERROR = "error"
+    SOURCE_LEGACY = "legacy"
+    SOURCE_CHOICES = [
+        (SOURCE_INITIATE, "Initiate"),
+        (SOURCE_WEBHOOK, "Webhook"),
+        (SOURCE_EXECUTE, "Execute"),
+        (SOURCE_QUERY, "Query"),
+        (SOURCE_ERROR, "Error"),
+        (SOURCE_LEGACY, "Legacy raw_response"),
+    ]
+
+    payment = models.ForeignKey(Payment, related_name="payloads", on_delete=models.CASCADE)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-id",)
+
+    def __str__(self):
+        return f"Payment #{self.payment_id} {self.source} payload"
+
+    @property
+    def content(self):
+        return decompress_payload(self.data)
+
+
+class WebhookEvent(models.Model):
+    """Raw inbound provider webhook, queued for asynchronous processing."""
+
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSED = "processed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSED, "Processed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    provider = models.CharField(max_length=20, choices=Payment.PROVIDER_CHOICES)
+    event_id = models.CharField(max_length=255)
+    payload = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("id",)
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "event_id"], name="payments_webhook_provider_event_uniq"),
+        ]
+        indexes = [models.Index(fields=["status", "id"])]
+
+    def __str__(self):
+        return f"{self.provider} webhook {self.event_id}"
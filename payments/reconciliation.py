@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Payment, PaymentPayload
+from .registry import get_payment_strategy
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing ``rate`` calls per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _query(strategy, limiter, payment):
+    limiter.acquire()
+    try:
+        status, raw = strategy.fetch_status(payment.transaction_id)
+        return payment, status, raw, None
+    except Exception as exc:
+        return payment, None, None, exc
+
+
+def reconcile_pending_payments(
+    older_than=timedelta(minutes=15),
+    batch_size=200,
+    workers=8,
+    rate=10.0,
+    provider=None,
+    dry_run=False,
+    progress=None,
+):
+    """
+    Page through pending payments older than ``older_than`` and ask each provider for
+    their state, ``workers`` at a time and at most ``rate`` queries per second overall.
+    Decided payments are applied per page with one ``transition_many`` per provider.
+    """
+    cutoff = timezone.now() - older_than
+    reservation_cutoff = timezone.now() - timedelta(seconds=settings.PAYMENT_RESERVATION_TTL)
+    limiter = RateLimiter(rate)
+    summary = {"checked": 0, "success": 0, "failed": 0, "pending": 0, "errors": 0, "expired": 0}
+    queryset = Payment.objects.filter(status=Payment.STATUS_PENDING, created_at__lt=cutoff).order_by("id")
+    if provider:
+        queryset = queryset.filter(provider=provider)
+
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            page = list(queryset.filter(id__gt=last_id).only("id", "booking_id", "provider", "transaction_id", "created_at")[:batch_size])
+            if not page:
+                break
+            last_id = page[-1].id
+
+            # Reservations never reached the provider; expire abandoned ones instead of querying.
+            expired = defaultdict(list)
+            for payment in page:
+                if payment.is_reserved and payment.created_at < reservation_cutoff:
+                    expired[payment.provider].append(
+                        (payment.transaction_id, Payment.STATUS_FAILED, {"error": "Reservation expired."})
+                    )
+            if dry_run:
+                summary["expired"] += sum(len(updates) for updates in expired.values())
+            else:
+                # Guarded like any transition: a reservation finalized or released meanwhile
+                # is not moved, so it gets no failure event or error payload.
+                for provider_name, updates in expired.items():
+                    moved = Payment.objects.transition_many(provider_name, updates, source=PaymentPayload.SOURCE_ERROR)
+                    summary["expired"] += len(moved)
+
+            jobs = []
+            for payment in page:
+                if payment.is_reserved:
+                    continue
+                strategy = get_payment_strategy(payment.provider)
+                jobs.append(executor.submit(_query, strategy, limiter, payment))
+
+            decided = defaultdict(list)
+            for job in jobs:
+                payment, status, raw, error = job.result()
+                summary["checked"] += 1
+                if error is not None:
+                    summary["errors"] += 1
+                    logger.warning("Reconciliation query failed for payment %s: %s", payment.id, error)
+                elif status is None:
+                    summary["pending"] += 1
+                else:
+                    summary[status] += 1
+                    decided[payment.provider].append((payment.transaction_id, status, raw))
+
+            if decided and not dry_run:
+                for provider_name, updates in decided.items():
+                    Payment.objects.transition_many(provider_name, updates, source=PaymentPayload.SOURCE_QUERY)
+            if progress:
+                progress(dict(summary))
+    return summary
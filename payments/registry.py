@@ -0,0 +1,46 @@
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .clients import reset_provider_clients
+
+_strategies = {}
+_lock = threading.Lock()
+
+
+def available_providers():
+    return tuple(settings.PAYMENT_PROVIDERS)
+
+
+def get_payment_strategy(provider):
+    """
+    Return the shared strategy for ``provider``, built once per process from the
+    dotted path in ``PAYMENT_PROVIDERS`` and reused with its clients and pools.
+    """
+    strategy = _strategies.get(provider)
+    if strategy is not None:
+        return strategy
+    path = settings.PAYMENT_PROVIDERS.get(provider)
+    if not path:
+        raise ValueError("Unsupported payment provider")
+    with _lock:
+        strategy = _strategies.get(provider)
+        if strategy is None:
+            strategy = _strategies[provider] = import_string(path)()
+    return strategy
+
+
+def reload_providers():
+    """Drop built strategies and pooled clients so the next lookup reads settings again."""
+    with _lock:
+        _strategies.clear()
+        reset_provider_clients()
+
+
+@receiver(setting_changed)
+def _reload_on_setting_change(setting, **kwargs):
+    if setting.startswith(("PAYMENT_", "STRIPE_", "BKASH_")):
+        reload_providers()
@@ -1,48 +1,124 @@
+import hashlib
 import json
+import logging
 from abc import ABC, abstractmethod
 
-import requests
 import stripe
 from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
 
 from bookings.models import Booking
-from .models import Payment
+from users.events import publish_payment_statuses
+from .clients import build_stripe_client, get_provider_client
+from .models import Payment, PaymentPayload
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationReleased(Exception):
+    """The reserved payment was released (e.g. expired) before the provider call returned."""
+
+
+def payload_event_id(payload):
+    """Stable id for webhook payloads that carry no provider event id."""
+    return "sha256:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
 class PaymentStrategy(ABC):
     provider: str
+    webhook_signature_header = ""
 
     @abstractmethod
-    def initiate(self, booking, request=None):
+    def initiate(self, booking, payment, request=None):
+        """
+        Call the provider for a reserved placeholder ``payment`` and finalize it.
+        Runs outside any transaction; raising leaves compensation to the caller.
+        """
         raise NotImplementedError
 
-    def handle_webhook(self, payload, sig_header):
+    def pending_response(self, payment):
+        """Response body for re-initiating a booking that already has a pending payment."""
+        return {
+            "payment_id": payment.id,
+            "provider": payment.provider,
+            "transaction_id": payment.transaction_id,
+            "status": payment.status,
+        }
+
+    def verify_webhook(self, payload, sig_header):
+        """Validate an inbound webhook and return its provider event id (None if it carries nothing)."""
         raise NotImplementedError
 
+    def parse_webhook(self, payload):
+        """Return ``(transaction_id, status, raw)`` for a verified webhook, or None if no action is needed."""
+        raise NotImplementedError
+
+    def fetch_status(self, transaction_id):
+        """Ask the provider for a payment's state. Returns ``(status, raw)``; status is None while undecided."""
+        raise NotImplementedError
+
+    def handle_webhook(self, payload, sig_header):
+        """Verify and apply a webhook synchronously."""
+        if not self.verify_webhook(payload, sig_header):
+            return {"received": False}
+        update = self.parse_webhook(payload)
+        if update:
+            self._mark_payment(*update)
+        return {"received": True}
+
+    def _mark_payment(self, transaction_id, status, raw, source=PaymentPayload.SOURCE_WEBHOOK):
+        """Move a pending payment to ``status``; settled payments are left alone."""
+        return Payment.objects.transition(self.provider, transaction_id, status, raw, source=source)
+
+    def void(self, transaction_id):
+        """Cancel a provider payment created for a reservation that was released meanwhile (best effort)."""
+
+    def _finalize(self, payment, transaction_id, raw, status=Payment.STATUS_PENDING, client_secret=""):
+        """
+        Swap the reservation placeholder for the provider's payment. Guarded like
+        any other transition: if the reservation expired and was released while
+        the provider was called, nothing is written, the provider payment is
+        voided and ``ReservationReleased`` is raised.
+        """
+        moved = Payment.objects.filter(
+            id=payment.id, status=Payment.STATUS_PENDING, transaction_id=payment.transaction_id
+        ).update(transaction_id=transaction_id, status=status, client_secret=client_secret or "", updated_at=timezone.now())
+        if not moved:
+            try:
+                self.void(transaction_id)
+            except Exception as exc:
+                logger.warning("Could not void %s payment %s: %s", self.provider, transaction_id, exc)
+            raise ReservationReleased("Payment reservation expired before the provider responded; try again.")
+        payment.transaction_id = transaction_id
+        payment.status = status
+        payment.client_secret = client_secret or ""
+        payment.record_payload(PaymentPayload.SOURCE_INITIATE, raw)
+        return payment
+
 
 class StripePaymentStrategy(PaymentStrategy):
     provider = Payment.PROVIDER_STRIPE
+    webhook_signature_header = "HTTP_STRIPE_SIGNATURE"
 
     def __init__(self):
-        stripe.api_key = settings.STRIPE_SECRET_KEY
+        self.http = get_provider_client(self.provider)
+        self.client = build_stripe_client(self.http, settings.STRIPE_SECRET_KEY, settings.STRIPE_API_BASE)
 
-    def initiate(self, booking, request=None):
+    def initiate(self, booking, payment, request=None):
         if not settings.STRIPE_SECRET_KEY:
             raise ValueError("Stripe secret key not configured.")
 
-        intent = stripe.PaymentIntent.create(
-            amount=int(booking.total_amount * 100),
-            currency="usd",
-            metadata={"booking_id": booking.id, "user_id": booking.user_id},
-        )
-        payment = Payment.objects.create(
-            booking=booking,
-            provider=self.provider,
-            transaction_id=intent.id,
-            status=Payment.STATUS_PENDING,
-            raw_response=intent.to_dict_recursive(),
+        # The idempotency key ties retries of this call to the reserved payment row.
+        intent = self.client.v1.payment_intents.create(
+            params={
+                "amount": int(booking.total_amount * 100),
+                "currency": "usd",
+                "metadata": {"booking_id": booking.id, "user_id": booking.user_id, "payment_id": payment.id},
+            },
+            options={"idempotency_key": f"payment-{payment.id}"},
         )
+        self._finalize(payment, intent.id, intent.to_dict_recursive(), client_secret=intent.client_secret)
         return {
             "payment_id": payment.id,
             "provider": self.provider,
@@ -51,7 +127,28 @@ class StripePaymentStrategy(PaymentStrategy):
             "status": payment.status,
         }
 
-    def handle_webhook(self, payload, sig_header):
+    def pending_response(self, payment):
+        data = super().pending_response(payment)
+        data["client_secret"] = payment.client_secret or None
+        return data
+
+    def void(self, transaction_id):
+        self.client.v1.payment_intents.cancel(transaction_id)
+
+    def fetch_status(self, transaction_id):
+        if not settings.STRIPE_SECRET_KEY:
+            raise ValueError("Stripe secret key not configured.")
+        intent = self.client.v1.payment_intents.retrieve(transaction_id)
+        raw = intent.to_dict_recursive()
+        if intent.status == "succeeded":
+            return Payment.STATUS_SUCCESS, raw
+        if intent.status == "canceled" or (
+            intent.status == "requires_payment_method" and raw.get("last_payment_error")
+        ):
+            return Payment.STATUS_FAILED, raw
+        return None, raw
+
+    def verify_webhook(self, payload, sig_header):
         webhook_secret = settings.STRIPE_WEBHOOK_SECRET
         try:
             if webhook_secret:
@@ -59,39 +156,27 @@ class StripePaymentStrategy(PaymentStrategy):
                     payload=payload, sig_header=sig_header, secret=webhook_secret
                 )
             else:
-                event = stripe.Event.construct_from(json.loads(payload), stripe.api_key)
+                event = stripe.Event.construct_from(json.loads(payload), settings.STRIPE_SECRET_KEY)
         except Exception as exc:
             raise ValueError(f"Invalid Stripe webhook: {exc}")
+        return event.get("id") or payload_event_id(payload)
 
+    def parse_webhook(self, payload):
+        event = json.loads(payload)
         event_type = event["type"]
         data_object = event["data"]["object"]
 
         if event_type == "payment_intent.succeeded":
-            self._mark_payment(data_object["id"], Payment.STATUS_SUCCESS, data_object)
-        elif event_type == "payment_intent.payment_failed":
-            self._mark_payment(data_object["id"], Payment.STATUS_FAILED, data_object)
-
-        return {"received": True}
-
-    def _mark_payment(self, transaction_id, status, raw):
-        payment = (
-            Payment.objects.select_related("booking")
-            .filter(transaction_id=transaction_id, provider=self.provider)
-            .first()
-        )
-        if not payment:
-            return
-
-        with transaction.atomic():
-            payment.status = status
-            payment.raw_response = raw
-            payment.save(update_fields=["status", "raw_response", "updated_at"])
-            if status == Payment.STATUS_SUCCESS:
-                Booking.objects.filter(id=payment.booking_id).update(status=Booking.STATUS_PAID)
+            return data_object["id"], Payment.STATUS_SUCCESS, data_object
+        if event_type == "payment_intent.payment_failed":
+            return data_object["id"], Payment.STATUS_FAILED, data_object
+        return None
 
 
 class BkashPaymentStrategy(PaymentStrategy):
     provider = Payment.PROVIDER_BKASH
+    webhook_signature_header = "HTTP_X_SIGNATURE"
+    FAILED_STATUSES = ("Failed", "Cancelled", "Expired")
 
     def __init__(self):
         self.base_url = (settings.BKASH_BASE_URL or "").rstrip("/")
@@ -99,15 +184,16 @@ class BkashPaymentStrategy(PaymentStrategy):
         self.app_secret = settings.BKASH_APP_SECRET
         self.username = settings.BKASH_USERNAME
         self.password = settings.BKASH_PASSWORD
+        self.http = get_provider_client(self.provider, self.base_url)
 
     def _has_credentials(self):
         return all([self.base_url, self.app_key, self.app_secret, self.username, self.password])
 
     def _get_token(self):
-        url = f"{self.base_url}/token/grant"
         payload = {"app_key": self.app_key, "app_secret": self.app_secret}
         headers = {"username": self.username, "password": self.password, "Content-Type": "application/json"}
-        resp = requests.post(url, json=payload, headers=headers, timeout=10)
+        # Granting a token has no side effects, so it is safe to retry.
+        resp = self.http.post("/token/grant", json=payload, headers=headers, idempotent=True)
         resp.raise_for_status()
         data = resp.json()
         token = data.get("id_token")
@@ -118,23 +204,22 @@ class BkashPaymentStrategy(PaymentStrategy):
     def _headers(self, token):
         return {"authorization": token, "x-app-key": self.app_key, "Content-Type": "application/json"}
 
-    def _post(self, path, token, payload):
-        url = f"{self.base_url}{path}"
-        resp = requests.post(url, json=payload, headers=self._headers(token), timeout=10)
+    def _post(self, path, token, payload, idempotent=False):
+        resp = self.http.post(path, json=payload, headers=self._headers(token), idempotent=idempotent)
         resp.raise_for_status()
         return resp.json()
 
-    def _mock_success(self, booking):
-        transaction_id = f"bkash-mock-{booking.id}-{booking.payments.count() + 1}"
+    def _mock_success(self, booking, payment):
+        transaction_id = f"bkash-mock-{booking.id}-{payment.id}"
         with transaction.atomic():
-            payment = Payment.objects.create(
-                booking=booking,
-                provider=self.provider,
-                transaction_id=transaction_id,
+            self._finalize(
+                payment,
+                transaction_id,
+                {"message": "Mock bKash payment success"},
                 status=Payment.STATUS_SUCCESS,
-                raw_response={"message": "Mock bKash payment success"},
             )
             Booking.objects.filter(id=booking.id).update(status=Booking.STATUS_PAID)
+            publish_payment_statuses([(payment.id, booking.id, Payment.STATUS_SUCCESS)], {booking.id: booking.user_id})
         return {
             "payment_id": payment.id,
             "provider": self.provider,
@@ -142,9 +227,9 @@ class BkashPaymentStrategy(PaymentStrategy):
             "status": payment.status,
         }
 
-    def initiate(self, booking, request=None):
+    def initiate(self, booking, payment, request=None):
         if not self._has_credentials():
-            return self._mock_success(booking)
+            return self._mock_success(booking, payment)
 
         token = self._get_token()
         payload = {
@@ -157,15 +242,10 @@ class BkashPaymentStrategy(PaymentStrategy):
             "merchantInvoiceNumber": f"inv-{booking.id}",
         }
         data = self._post("/checkout/payment/create", token, payload)
-        payment_id = data.get("paymentID") or f"bkash-{booking.id}-pending"
-        with transaction.atomic():
-            payment = Payment.objects.create(
-                booking=booking,
-                provider=self.provider,
-                transaction_id=payment_id,
-                status=Payment.STATUS_PENDING,
-                raw_response=data,
-            )
+        payment_id = data.get("paymentID")
+        if not payment_id:
+            raise ValueError(data.get("statusMessage") or "bKash did not return a paymentID.")
+        self._finalize(payment, payment_id, data)
         return {
             "payment_id": payment.id,
             "provider": self.provider,
@@ -181,45 +261,48 @@ class BkashPaymentStrategy(PaymentStrategy):
         token = self._get_token()
         data = self._post("/checkout/payment/execute", token, {"paymentID": payment_id})
         status = Payment.STATUS_SUCCESS if data.get("transactionStatus") == "Completed" else Payment.STATUS_FAILED
-        self._mark_payment(payment_id, status, data)
+        self._mark_payment(payment_id, status, data, source=PaymentPayload.SOURCE_EXECUTE)
         return data, status
 
     def query_payment(self, payment_id):
         if not self._has_credentials():
             raise ValueError("bKash credentials not configured.")
         token = self._get_token()
-        data = self._post("/checkout/payment/query", token, {"paymentID": payment_id})
+        data = self._post("/checkout/payment/query", token, {"paymentID": payment_id}, idempotent=True)
         return data
 
-    def handle_webhook(self, payload, sig_header):
-        body = json.loads(payload or "{}")
+    def pending_response(self, payment):
+        data = super().pending_response(payment)
+        data["bkash_payment_id"] = payment.transaction_id
+        return data
+
+    def void(self, transaction_id):
+        """Nothing to cancel: a created bKash payment that is never executed expires on bKash's side."""
+
+    def fetch_status(self, transaction_id):
+        data = self.query_payment(transaction_id)
+        flag = data.get("transactionStatus")
+        if flag == "Completed":
+            return Payment.STATUS_SUCCESS, data
+        if flag in self.FAILED_STATUSES:
+            return Payment.STATUS_FAILED, data
+        return None, data
+
+    def verify_webhook(self, payload, sig_header):
+        try:
+            body = json.loads(payload or "{}")
+        except ValueError as exc:
+            raise ValueError(f"Invalid bKash webhook: {exc}")
         payment_id = body.get("paymentID")
-        status_flag = body.get("transactionStatus")
         if not payment_id:
-            return {"received": False}
-        status = Payment.STATUS_SUCCESS if status_flag == "Completed" else Payment.STATUS_FAILED
-        self._mark_payment(payment_id, status, body)
-        return {"received": True}
+            return None
+        # bKash sends no event id; treat each payment state notification as one event.
+        return f"{payment_id}:{body.get('transactionStatus', '')}"
 
-    def _mark_payment(self, payment_id, status, raw):
-        payment = (
-            Payment.objects.select_related("booking")
-            .filter(transaction_id=payment_id, provider=self.provider)
-            .first()
-        )
-        if not payment:
-            return
-        with transaction.atomic():
-            payment.status = status
-            payment.raw_response = raw
-            payment.save(update_fields=["status", "raw_response", "updated_at"])
-            if status == Payment.STATUS_SUCCESS:
-                Booking.objects.filter(id=payment.booking_id).update(status=Booking.STATUS_PAID)
-
-
-def get_payment_strategy(provider: str) -> PaymentStrategy:
-    if provider == Payment.PROVIDER_STRIPE:
-        return StripePaymentStrategy()
-    if provider == Payment.PROVIDER_BKASH:
-        return BkashPaymentStrategy()
-    raise ValueError("Unsupported payment provider")
+    def parse_webhook(self, payload):
+        body = json.loads(payload or "{}")
+        payment_id = body.get("paymentID")
+        if not payment_id:
+            return None
+        status = Payment.STATUS_SUCCESS if body.get("transactionStatus") == "Completed" else Payment.STATUS_FAILED
+        return payment_id, status, body
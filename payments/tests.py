@@ -1,15 +1,29 @@
+import io
 import json
+import time
+from contextlib import contextmanager
 from decimal import Decimal
 from datetime import timedelta
+from unittest import mock
 
+import requests
+import stripe
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from bookings.models import Booking
-from payments.models import Payment
+from payments.clients import ProviderHTTPClient, StripeRequestsClient, operation_name
+from payments.fake_providers import FakeProviderServer
+from payments.models import Payment, PaymentPayload, WebhookEvent
+from payments.reconciliation import reconcile_pending_payments
+from payments.registry import get_payment_strategy
+from payments.services import BkashPaymentStrategy, PaymentStrategy, StripePaymentStrategy
 from properties.models import Category, Property
 from users.models import User
 
@@ -46,7 +60,6 @@ class StripeWebhookTests(APITestCase):
             provider=Payment.PROVIDER_STRIPE,
             transaction_id="pi_test_123",
             status=Payment.STATUS_PENDING,
-            raw_response={},
         )
 
     def test_stripe_webhook_marks_payment_and_booking_paid(self):
@@ -59,16 +72,90 @@ class StripeWebhookTests(APITestCase):
         )
         resp = self.client.post(url, data=payload, content_type="application/json")
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        call_command("process_webhooks", stdout=io.StringIO())
 
         self.payment.refresh_from_db()
         self.booking.refresh_from_db()
         self.assertEqual(self.payment.status, Payment.STATUS_SUCCESS)
         self.assertEqual(self.booking.status, Booking.STATUS_PAID)
 
+    def test_duplicate_webhook_deliveries_are_queued_once(self):
+        url = reverse("stripe-webhook")
+        payload = json.dumps(
+            {
+                "id": "evt_dup_1",
+                "type": "payment_intent.succeeded",
+                "data": {"object": {"id": self.payment.transaction_id, "object": "payment_intent"}},
+            }
+        )
+        for _ in range(3):
+            resp = self.client.post(url, data=payload, content_type="application/json")
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        # Acknowledged before any processing happens.
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_PENDING)
+
+        call_command("process_webhooks", stdout=io.StringIO())
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, WebhookEvent.STATUS_PROCESSED)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_SUCCESS)
+
+    def test_late_failure_does_not_regress_settled_payment(self):
+        strategy = get_payment_strategy(Payment.PROVIDER_STRIPE)
+        self.assertTrue(strategy._mark_payment(self.payment.transaction_id, Payment.STATUS_SUCCESS, {"n": 1}))
+        self.assertFalse(strategy._mark_payment(self.payment.transaction_id, Payment.STATUS_FAILED, {"n": 2}))
+
+        self.payment.refresh_from_db()
+        self.booking.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_SUCCESS)
+        self.assertEqual(self.booking.status, Booking.STATUS_PAID)
+        self.assertEqual([p.content for p in self.payment.payloads.all()], [{"n": 1}])
+
+    def test_transition_many_moves_only_pending_rows(self):
+        other = Payment.objects.create(
+            booking=self.booking,
+            provider=Payment.PROVIDER_STRIPE,
+            transaction_id="pi_test_456",
+            status=Payment.STATUS_FAILED,
+        )
+        moved = Payment.objects.transition_many(
+            Payment.PROVIDER_STRIPE,
+            [
+                (self.payment.transaction_id, Payment.STATUS_SUCCESS, None),
+                (other.transaction_id, Payment.STATUS_SUCCESS, None),
+                ("pi_unknown", Payment.STATUS_FAILED, None),
+            ],
+        )
+        self.assertEqual(moved, [(self.payment.id, self.booking.id, Payment.STATUS_SUCCESS)])
+        other.refresh_from_db()
+        self.booking.refresh_from_db()
+        self.assertEqual(other.status, Payment.STATUS_FAILED)
+        self.assertEqual(self.booking.status, Booking.STATUS_PAID)
+
+    def test_move_payment_payloads_compresses_legacy_raw_response(self):
+        raw = {"id": self.payment.transaction_id, "client_secret": "secret_legacy", "charges": ["x" * 50] * 20}
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE payments_payment SET raw_response = %s WHERE id = %s", [json.dumps(raw), self.payment.id]
+            )
+        call_command("move_payment_payloads", "--batch-size", "1", stdout=io.StringIO())
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.client_secret, "secret_legacy")
+        payload = self.payment.payloads.get()
+        self.assertEqual(payload.source, PaymentPayload.SOURCE_LEGACY)
+        self.assertEqual(payload.content, raw)
+        self.assertLess(len(payload.data), len(json.dumps(raw)))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT raw_response FROM payments_payment WHERE id = %s", [self.payment.id])
+            self.assertIsNone(cursor.fetchone()[0])
+
     def test_initiate_reuses_pending_payment(self):
         # Seed a pending payment with client_secret
-        self.payment.raw_response = {"client_secret": "secret_123"}
-        self.payment.save(update_fields=["raw_response"])
+        self.payment.client_secret = "secret_123"
+        self.payment.save(update_fields=["client_secret"])
 
         url = reverse("payment-initiate")
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
@@ -80,3 +167,293 @@ class StripeWebhookTests(APITestCase):
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(resp.data["payment_id"], self.payment.id)
         self.assertEqual(resp.data["client_secret"], "secret_123")
+
+
+def _response(status_code, body=b"{}"):
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp._content = body
+    resp.raw = io.BytesIO(body)
+    return resp
+
+
+class ProviderHTTPClientTests(SimpleTestCase):
+    def setUp(self):
+        self.client_ = ProviderHTTPClient("test", "https://provider.test", max_retries=2, backoff=0)
+
+    def test_idempotent_call_retries_on_transient_status(self):
+        with mock.patch.object(self.client_.session, "request", side_effect=[_response(503), _response(200)]) as send:
+            resp = self.client_.post("/query", json={}, idempotent=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(send.call_count, 2)
+        stats = self.client_.stats.snapshot()["POST /query"]
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["errors"], 1)
+
+    def test_operation_name_replaces_only_ids(self):
+        base = "https://api.stripe.com"
+        self.assertEqual(operation_name("get", f"{base}/v1/payment_intents/pi_3Ab_secret_Cd"), "GET /v1/payment_intents/{id}")
+        self.assertEqual(operation_name("post", f"{base}/v1/payment_intents"), "POST /v1/payment_intents")
+        self.assertEqual(
+            operation_name("post", f"{base}/v1/payment_intents/pi_x/confirm"), "POST /v1/payment_intents/{id}/confirm"
+        )
+        self.assertEqual(operation_name("get", "https://bkash.test/checkout/payment/query/TR0011"), "GET /checkout/payment/query/{id}")
+
+    def test_stripe_retries_stay_within_total_timeout(self):
+        provider = ProviderHTTPClient("stripe", timeout=0.3, connect_timeout=0.2)
+        client = StripeRequestsClient(provider)
+        started = time.monotonic()
+        with mock.patch.object(provider.session, "request", side_effect=requests.ConnectionError("down")) as send:
+            with self.assertRaises(stripe.APIConnectionError):
+                client.request_with_retries("get", "https://api.stripe.com/v1/payment_intents/pi_x", {}, max_network_retries=10)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertLess(send.call_count, 11)
+        for call in send.call_args_list:
+            connect, read = call.kwargs["timeout"]
+            self.assertLessEqual(read, 0.3)
+            self.assertLessEqual(connect, 0.2)
+        # Outside a call the configured timeouts apply again.
+        self.assertEqual(client._timeout, (0.2, 0.3))
+
+    def test_non_idempotent_call_is_not_retried(self):
+        with mock.patch.object(self.client_.session, "request", side_effect=requests.ReadTimeout("slow")) as send:
+            with self.assertRaises(requests.ReadTimeout):
+                self.client_.post("/create", json={})
+        self.assertEqual(send.call_count, 1)
+
+
+class PaymentInitiateLockTests(TransactionTestCase):
+    """The provider call must not run while the booking row lock is held."""
+
+    client_class = APIClient
+    provider_latency = 0.3
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="locks@example.com", password="StrongPass123")
+        category = Category.objects.create(name="Residential", slug="lock-res")
+        property_obj = Property.objects.create(
+            name="Loft",
+            slug="loft",
+            description="Loft",
+            location="City",
+            price=Decimal("1000.00"),
+            category=category,
+        )
+        start = timezone.now() + timedelta(days=3)
+        self.booking = Booking.objects.create(
+            user=self.user,
+            property=property_obj,
+            total_amount=property_obj.price,
+            start_at=start,
+            end_at=start + timedelta(hours=1),
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def _initiate(self, strategy):
+        hold_times = []
+        real_atomic = transaction.atomic
+
+        @contextmanager
+        def timed_atomic(*args, **kwargs):
+            outermost = not connection.in_atomic_block
+            start = time.monotonic()
+            with real_atomic(*args, **kwargs):
+                yield
+            if outermost:
+                hold_times.append(time.monotonic() - start)
+
+        with mock.patch("payments.views.transaction.atomic", timed_atomic), mock.patch(
+            "payments.views.get_payment_strategy", return_value=strategy
+        ):
+            resp = self.client.post(
+                reverse("payment-initiate"),
+                {"provider": Payment.PROVIDER_STRIPE, "booking_id": self.booking.id},
+                format="json",
+            )
+        return resp, hold_times
+
+    def test_lock_hold_time_excludes_provider_latency(self):
+        observed = {}
+        latency = self.provider_latency
+
+        class SlowStrategy:
+            def initiate(self, booking, payment, request=None):
+                observed["in_atomic"] = connection.in_atomic_block
+                time.sleep(latency)
+                payment.transaction_id = "pi_slow"
+                payment.save(update_fields=["transaction_id"])
+                return {"payment_id": payment.id, "transaction_id": payment.transaction_id}
+
+        resp, hold_times = self._initiate(SlowStrategy())
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(observed["in_atomic"])
+        self.assertLess(max(hold_times), 0.05)
+        self.assertEqual(Payment.objects.get().transaction_id, "pi_slow")
+
+    def test_provider_failure_releases_reservation(self):
+        class FailingStrategy:
+            def initiate(self, booking, payment, request=None):
+                raise requests.Timeout("provider timed out")
+
+        resp, _ = self._initiate(FailingStrategy())
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        payment = Payment.objects.get()
+        self.assertEqual(payment.status, Payment.STATUS_FAILED)
+        self.assertEqual(payment.latest_payload(), {"error": "provider timed out"})
+
+    def _expire_reservation(self):
+        # What the next initiate or the reconciliation job does once the TTL has passed.
+        Payment.objects.filter(status=Payment.STATUS_PENDING).update(status=Payment.STATUS_FAILED)
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test_released")
+    def test_reservation_released_during_provider_call_is_not_revived(self):
+        strategy = StripePaymentStrategy()
+        strategy.client = mock.Mock()
+
+        def create_intent(**kwargs):
+            self._expire_reservation()
+            return mock.Mock(id="pi_late", client_secret="secret", to_dict_recursive=lambda: {"id": "pi_late"})
+
+        strategy.client.v1.payment_intents.create.side_effect = create_intent
+        resp, _ = self._initiate(strategy)
+
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        payment = Payment.objects.get()
+        self.assertEqual(payment.status, Payment.STATUS_FAILED)
+        self.assertTrue(payment.is_reserved)
+        self.assertFalse(payment.payloads.filter(source=PaymentPayload.SOURCE_INITIATE).exists())
+        strategy.client.v1.payment_intents.cancel.assert_called_once_with("pi_late")
+
+    def test_released_mock_bkash_payment_does_not_mark_booking_paid(self):
+        strategy = BkashPaymentStrategy()
+
+        def no_credentials():
+            self._expire_reservation()
+            return False
+
+        with mock.patch.object(strategy, "_has_credentials", side_effect=no_credentials):
+            resp, _ = self._initiate(strategy)
+
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Payment.objects.get().status, Payment.STATUS_FAILED)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, Booking.STATUS_PENDING)
+
+
+class ReconcilePaymentsTests(APITestCase):
+    def setUp(self):
+        self.server = FakeProviderServer().start()
+        self.addCleanup(self.server.stop)
+        user = User.objects.create_user(email="recon@example.com", password="StrongPass123")
+        category = Category.objects.create(name="Residential", slug="recon-res")
+        property_obj = Property.objects.create(
+            name="Cabin", slug="cabin", description="Cabin", location="Hills", price=Decimal("900.00"), category=category
+        )
+        start = timezone.now() + timedelta(days=4)
+        self.bookings = [
+            Booking.objects.create(
+                user=user,
+                property=property_obj,
+                total_amount=property_obj.price,
+                start_at=start + timedelta(days=i),
+                end_at=start + timedelta(days=i, hours=1),
+            )
+            for i in range(3)
+        ]
+
+    def _payment(self, booking, provider, transaction_id):
+        return Payment.objects.create(booking=booking, provider=provider, transaction_id=transaction_id)
+
+    def test_reconcile_applies_provider_state(self):
+        paid = self._payment(self.bookings[0], Payment.PROVIDER_STRIPE, "pi_paid")
+        waiting = self._payment(self.bookings[1], Payment.PROVIDER_STRIPE, "pi_waiting")
+        bkash = self._payment(self.bookings[2], Payment.PROVIDER_BKASH, "TRBKASH1")
+        self.server.state.set_intent_status("pi_paid", "succeeded")
+        self.server.state.set_intent_status("pi_waiting", "processing")
+        self.server.state.set_bkash_status("TRBKASH1", "Failed")
+
+        out = io.StringIO()
+        with override_settings(
+            STRIPE_SECRET_KEY="sk_test_fake",
+            STRIPE_API_BASE=self.server.base_url,
+            BKASH_BASE_URL=f"{self.server.base_url}/bkash",
+            BKASH_APP_KEY="key",
+            BKASH_APP_SECRET="secret",
+            BKASH_USERNAME="user",
+            BKASH_PASSWORD="pass",
+        ):
+            call_command("reconcile_payments", "--older-than", "0", "--rate", "0", "--workers", "2", stdout=out)
+
+        for payment in (paid, waiting, bkash):
+            payment.refresh_from_db()
+        self.assertEqual(paid.status, Payment.STATUS_SUCCESS)
+        self.assertEqual(waiting.status, Payment.STATUS_PENDING)
+        self.assertEqual(bkash.status, Payment.STATUS_FAILED)
+        self.bookings[0].refresh_from_db()
+        self.assertEqual(self.bookings[0].status, Booking.STATUS_PAID)
+        self.assertIn("checked=3 success=1 failed=1 pending=1", out.getvalue())
+
+    @override_settings(PAYMENT_RESERVATION_TTL=0)
+    def test_expiry_reports_only_reservations_it_moved(self):
+        finalized, abandoned = (
+            self._payment(booking, Payment.PROVIDER_STRIPE, Payment.reserved_transaction_id()) for booking in self.bookings[:2]
+        )
+        transition_many = Payment.objects.transition_many
+
+        def finalize_first(*args, **kwargs):
+            # The slow initiate of `finalized` finishes between the page read and the expiry.
+            Payment.objects.filter(pk=finalized.pk).update(transaction_id="pi_finalized")
+            return transition_many(*args, **kwargs)
+
+        with mock.patch.object(Payment.objects, "transition_many", side_effect=finalize_first), mock.patch(
+            "payments.models.publish_payment_statuses"
+        ) as publish:
+            summary = reconcile_pending_payments(older_than=timedelta(0), rate=0)
+
+        self.assertEqual(summary["expired"], 1)
+        self.assertEqual([row[0] for row in publish.call_args.args[0]], [abandoned.pk])
+        finalized.refresh_from_db()
+        self.assertEqual(finalized.status, Payment.STATUS_PENDING)
+        self.assertFalse(finalized.payloads.exists())
+        self.assertEqual(abandoned.latest_payload(), {"error": "Reservation expired."})
+
+
+class DummyPaymentStrategy(PaymentStrategy):
+    provider = "dummy"
+
+    def initiate(self, booking, payment, request=None):
+        self._finalize(payment, f"dummy-{payment.id}", {"ok": True})
+        return {"payment_id": payment.id, "provider": self.provider, "status": payment.status}
+
+
+@override_settings(
+    PAYMENT_PROVIDERS={
+        "stripe": "payments.services.StripePaymentStrategy",
+        "dummy": "payments.tests.DummyPaymentStrategy",
+    }
+)
+class PaymentRegistryTests(APITestCase):
+    def test_strategies_are_built_once_and_reused(self):
+        self.assertIs(get_payment_strategy("stripe"), get_payment_strategy("stripe"))
+        with self.assertRaises(ValueError):
+            get_payment_strategy("bkash")
+
+    def test_settings_change_rebuilds_strategy(self):
+        before = get_payment_strategy("stripe")
+        with override_settings(STRIPE_SECRET_KEY="sk_test_other"):
+            self.assertIsNot(get_payment_strategy("stripe"), before)
+
+    def test_pluggable_provider_can_initiate(self):
+        user = User.objects.create_user(email="dummy@example.com", password="StrongPass123")
+        category = Category.objects.create(name="Residential", slug="dummy-res")
+        property_obj = Property.objects.create(
+            name="Studio", slug="studio", description="Studio", location="City", price=Decimal("10.00"), category=category
+        )
+        start = timezone.now() + timedelta(days=5)
+        booking = Booking.objects.create(
+            user=user, property=property_obj, total_amount=property_obj.price, start_at=start, end_at=start + timedelta(hours=1)
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        resp = self.client.post(reverse("payment-initiate"), {"provider": "dummy", "booking_id": booking.id}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Payment.objects.get().transaction_id, f"dummy-{resp.data['payment_id']}")
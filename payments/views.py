@@ -1,13 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from bookings.models import Booking
-from .models import Payment
-from .services import BkashPaymentStrategy, StripePaymentStrategy, get_payment_strategy
+from users.dashboard import invalidate_booking_dashboards
+from users.events import publish_payment_statuses
+from .models import Payment, PaymentPayload
+from .registry import available_providers, get_payment_strategy
+from .services import ReservationReleased
+from .webhooks import enqueue_webhook
 
 # API endpoints (payments)
 
@@ -19,11 +27,13 @@ class PaymentInitiateView(APIView):
         provider = str(request.data.get("provider", "")).lower()
         booking_id = request.data.get("booking_id")
 
-        if provider not in (Payment.PROVIDER_STRIPE, Payment.PROVIDER_BKASH):
+        if provider not in available_providers():
             return Response({"detail": "Invalid provider."}, status=status.HTTP_400_BAD_REQUEST)
         if not booking_id:
             return Response({"detail": "booking_id is required."}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Reserve: a short transaction holds the booking row lock only long enough to
+        # apply the duplicate guards and insert a placeholder pending payment.
         with transaction.atomic():
             booking = get_object_or_404(
                 Booking.objects.select_for_update(),
@@ -43,58 +53,84 @@ class PaymentInitiateView(APIView):
                 .order_by("-created_at")
                 .first()
             )
+            if existing_pending and existing_pending.is_reserved:
+                reserved_for = timezone.now() - existing_pending.created_at
+                if reserved_for < timedelta(seconds=settings.PAYMENT_RESERVATION_TTL):
+                    return Response(
+                        {"detail": "Payment initiation already in progress."},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                # The process that reserved it died before finalizing; release it.
+                _release_reservation(existing_pending, "Reservation expired.")
+                existing_pending = None
             if existing_pending:
-                data = {
-                    "payment_id": existing_pending.id,
-                    "provider": existing_pending.provider,
-                    "transaction_id": existing_pending.transaction_id,
-                    "status": existing_pending.status,
-                }
-                if provider == Payment.PROVIDER_STRIPE:
-                    client_secret = existing_pending.raw_response.get("client_secret") if isinstance(
-                        existing_pending.raw_response, dict
-                    ) else None
-                    data["client_secret"] = client_secret
-                if provider == Payment.PROVIDER_BKASH:
-                    data["bkash_payment_id"] = existing_pending.transaction_id
+                data = get_payment_strategy(provider).pending_response(existing_pending)
                 return Response(data, status=status.HTTP_200_OK)
 
-            strategy = get_payment_strategy(provider)
-            try:
-                data = strategy.initiate(booking, request)
-            except Exception as exc:
-                return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            payment = Payment.objects.create(
+                booking=booking,
+                provider=provider,
+                transaction_id=Payment.reserved_transaction_id(),
+                status=Payment.STATUS_PENDING,
+            )
+
+        # Call the provider with no transaction open, then finalize the placeholder.
+        strategy = get_payment_strategy(provider)
+        try:
+            data = strategy.initiate(booking, payment, request)
+        except ReservationReleased as exc:
+            # Already failed and published by whoever released it.
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except Exception as exc:
+            _release_reservation(payment, str(exc))
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(data, status=status.HTTP_201_CREATED)
 
 
-class StripeWebhookView(APIView):
-    permission_classes = [AllowAny]
-    authentication_classes = []
+def _release_reservation(payment, reason):
+    """Compensate a reservation whose provider call failed, timed out or was abandoned."""
+    released = Payment.objects.filter(id=payment.id, status=Payment.STATUS_PENDING).update(
+        status=Payment.STATUS_FAILED,
+        updated_at=timezone.now(),
+    )
+    if released:
+        invalidate_booking_dashboards([payment.booking_id])
+        publish_payment_statuses([(payment.id, payment.booking_id, Payment.STATUS_FAILED)])
+        payment.record_payload(PaymentPayload.SOURCE_ERROR, {"error": reason})
 
-    def post(self, request):
-        payload = request.body.decode("utf-8")
-        sig_header = request.META.get("HTTP_STRIPE_SIGNATURE", "")
-        strategy = StripePaymentStrategy()
-        try:
-            data = strategy.handle_webhook(payload, sig_header)
-        except Exception as exc:
-            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
-        return Response(data, status=status.HTTP_200_OK)
 
+class WebhookIngestView(APIView):
+    """
+    Verify a provider webhook, queue it with one INSERT and acknowledge immediately.
+    The `process_webhooks` command applies queued events.
+    """
 
-class BkashWebhookView(APIView):
     permission_classes = [AllowAny]
     authentication_classes = []
+    provider = None
 
-    def post(self, request):
+    def post(self, request, provider=None):
+        try:
+            strategy = get_payment_strategy(self.provider or provider)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_404_NOT_FOUND)
         payload = request.body.decode("utf-8")
-        strategy = BkashPaymentStrategy()
         try:
-            data = strategy.handle_webhook(payload, request.META.get("HTTP_X_SIGNATURE", ""))
+            event_id = strategy.verify_webhook(payload, request.META.get(strategy.webhook_signature_header, ""))
         except Exception as exc:
             return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
-        return Response(data, status=status.HTTP_200_OK)
+        if event_id:
+            enqueue_webhook(strategy.provider, event_id, payload)
+        return Response({"received": bool(event_id)}, status=status.HTTP_200_OK)
+
+
+class StripeWebhookView(WebhookIngestView):
+    provider = Payment.PROVIDER_STRIPE
+
+
+class BkashWebhookView(WebhookIngestView):
+    provider = Payment.PROVIDER_BKASH
 
 
 class BkashExecuteView(APIView):
@@ -110,7 +146,7 @@ class BkashExecuteView(APIView):
             provider=Payment.PROVIDER_BKASH,
             booking__user=request.user,
         )
-        strategy = BkashPaymentStrategy()
+        strategy = get_payment_strategy(Payment.PROVIDER_BKASH)
         try:
             data, status_flag = strategy.execute_payment(payment.transaction_id)
         except Exception as exc:
@@ -131,7 +167,7 @@ class BkashQueryView(APIView):
             provider=Payment.PROVIDER_BKASH,
             booking__user=request.user,
         )
-        strategy = BkashPaymentStrategy()
+        strategy = get_payment_strategy(Payment.PROVIDER_BKASH)
         try:
             data = strategy.query_payment(payment.transaction_id)
         except Exception as exc:
@@ -0,0 +1,76 @@
+import logging
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Payment, WebhookEvent
+from .registry import get_payment_strategy
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_webhook(provider, event_id, payload):
+    """
+    Store a verified webhook with a single INSERT.
+    Duplicate deliveries hit the (provider, event_id) constraint and are dropped.
+    """
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(provider=provider, event_id=event_id, payload=payload)],
+        ignore_conflicts=True,
+    )
+
+
+def _done(event, now):
+    event.status = WebhookEvent.STATUS_PROCESSED
+    event.error = ""
+    event.processed_at = now
+
+
+def _fail(event, exc, max_attempts):
+    event.error = str(exc)
+    if event.attempts >= max_attempts:
+        event.status = WebhookEvent.STATUS_FAILED
+
+
+def process_webhook_batch(batch_size=100, max_attempts=5):
+    """Apply up to ``batch_size`` pending webhook events. Returns the number of events claimed."""
+    with transaction.atomic():
+        queryset = WebhookEvent.objects.filter(status=WebhookEvent.STATUS_PENDING).order_by("id")
+        if connection.features.has_select_for_update_skip_locked:
+            # Lets several workers drain the queue without blocking each other.
+            queryset = queryset.select_for_update(skip_locked=True)
+        events = list(queryset[:batch_size])
+        if not events:
+            return 0
+
+        now = timezone.now()
+        updates = defaultdict(list)
+        for event in events:
+            event.attempts += 1
+            try:
+                update = get_payment_strategy(event.provider).parse_webhook(event.payload)
+            except Exception as exc:
+                logger.exception("Failed to parse %s webhook %s", event.provider, event.event_id)
+                _fail(event, exc, max_attempts)
+                continue
+            if update:
+                updates[event.provider].append((event, update))
+            else:
+                _done(event, now)
+
+        # One guarded UPDATE per provider and status instead of a round trip per event.
+        for provider, items in updates.items():
+            try:
+                with transaction.atomic():
+                    Payment.objects.transition_many(provider, [update for _, update in items])
+            except Exception as exc:
+                logger.exception("Failed to apply %s %s webhooks", len(items), provider)
+                for event, _ in items:
+                    _fail(event, exc, max_attempts)
+                continue
+            for event, _ in items:
+                _done(event, now)
+
+        WebhookEvent.objects.bulk_update(events, ["status", "attempts", "error", "processed_at"])
+    return len(events)
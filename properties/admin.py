@@ -1,19 +1,62 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils import timezone
+
+from bookings.models import Booking
+from core.admin import LargeTableAdminMixin
+from core.caching import invalidate
+from users.dashboard import invalidate_dashboards
 
 from .models import Category, Property
+from .views import CATEGORY_GRAPH_KEY
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ("name", "parent")
+    list_select_related = ("parent",)
     prepopulated_fields = {"slug": ("name",)}
     search_fields = ("name", "slug")
 
+    # Recommendations walk the cached category graph; edits must rebuild it.
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate(CATEGORY_GRAPH_KEY)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate(CATEGORY_GRAPH_KEY)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        invalidate(CATEGORY_GRAPH_KEY)
+
 
 @admin.register(Property)
-class PropertyAdmin(admin.ModelAdmin):
+class PropertyAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("name", "status", "price", "category", "created_at")
     list_filter = ("status", "category")
-    search_fields = ("name", "slug", "location")
+    list_select_related = ("category",)
+    list_only = ("id", "name", "status", "price", "created_at", "category__id", "category__name")
+    # Served by the slug unique index and the Upper(name) / Upper(location) prefix indexes.
+    search_lookups = {"slug": "exact", "name": "iprefix", "location": "iprefix"}
     prepopulated_fields = {"slug": ("name",)}
     raw_id_fields = ("category",)
+    actions = ("make_active", "make_inactive")
+
+    def _set_status(self, request, queryset, status):
+        # Owners' dashboards show property summaries; collect them before the
+        # UPDATE in case the changelist is filtered on status.
+        owners = list(
+            Booking.objects.filter(property__in=queryset.values("pk")).values_list("user_id", flat=True).distinct()
+        )
+        updated = queryset.exclude(status=status).update(status=status, updated_at=timezone.now())
+        invalidate_dashboards(owners)
+        self.message_user(request, f"{updated} properties marked {status}.", messages.SUCCESS)
+
+    @admin.action(description="Mark selected properties active", permissions=["change"])
+    def make_active(self, request, queryset):
+        self._set_status(request, queryset, Property.STATUS_ACTIVE)
+
+    @admin.action(description="Mark selected properties inactive", permissions=["change"])
+    def make_inactive(self, request, queryset):
+        self._set_status(request, queryset, Property.STATUS_INACTIVE)
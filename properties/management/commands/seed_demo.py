@@ -1,15 +1,49 @@
+import random
+import time
+from datetime import timedelta
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
 
+from bookings.models import Booking
+from payments.models import Payment
 from properties.models import Category, Property
 
+# Generated rows follow these patterns so load drivers (benchmarks/load.py) can
+# address them without listing millions of rows first.
+PROPERTY_SLUG = "demo-property-{}"
+USER_EMAIL = "demo-user{}@example.com"
+USER_PASSWORD = "DemoPass123"
+CATEGORY_SLUG = "demo-cat-{}"
+LOCATIONS = ["Dhaka", "Chittagong", "Sylhet", "Dubai Marina", "New York", "London", "Lisbon", "Singapore"]
+AMENITIES = ["pool", "gym", "parking", "concierge", "rooftop deck", "garden", "smart home", "sea view"]
+
 
 class Command(BaseCommand):
-    help = "Seed demo data: admin user, categories, and properties."
+    help = (
+        "Seed demo data: admin user, categories, and properties. With --properties N also generate a large "
+        "synthetic data set (category tree, properties, users, bookings, payments) in batches; re-runs top it up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--properties", type=int, default=0, help="Synthetic properties to generate (e.g. 2000000).")
+        parser.add_argument("--category-depth", type=int, default=5, help="Levels in the synthetic category tree.")
+        parser.add_argument("--category-fanout", type=int, default=4, help="Children per synthetic category.")
+        parser.add_argument("--users", type=int, default=1000, help="Synthetic users (password DemoPass123).")
+        parser.add_argument("--bookings", type=int, default=None, help="Synthetic bookings (default: properties / 2).")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42, help="Random seed, so runs are reproducible.")
 
     def handle(self, *args, **options):
+        self.seed_demo()
+        if options["properties"] > 0:
+            self.seed_synthetic(options)
+
+    def seed_demo(self):
         User = get_user_model()
         admin_email = "admin@example.com"
         admin_password = "Admin123!"
@@ -84,3 +118,134 @@ class Command(BaseCommand):
             self.stdout.write(f"{'Created' if created else 'Existing'} property: {obj.name}")
 
         self.stdout.write(self.style.SUCCESS("Seeding complete."))
+
+    # Synthetic data ------------------------------------------------------------------
+
+    def seed_synthetic(self, options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+        started = time.perf_counter()
+        leaves = self.seed_categories(options["category_depth"], options["category_fanout"])
+        self.seed_properties(options["properties"], leaves, batch_size, rng)
+        self.seed_users(options["users"], batch_size)
+        bookings = options["bookings"] if options["bookings"] is not None else options["properties"] // 2
+        self.seed_bookings(bookings, batch_size, rng)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                for model in (Category, Property, get_user_model(), Booking, Payment):
+                    cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+        self.stdout.write(self.style.SUCCESS(f"Synthetic data ready in {time.perf_counter() - started:.1f}s."))
+
+    def _progress(self, label, done, total):
+        self.stdout.write(f"{label}: {done}/{total}", ending="\r" if done < total else "\n")
+        self.stdout.flush()
+
+    def seed_categories(self, depth, fanout):
+        """A ``fanout``-ary tree ``depth`` levels deep; returns the leaf categories' ids."""
+        existing = dict(Category.objects.filter(slug__startswith=CATEGORY_SLUG.format("")).values_list("slug", "id"))
+        level = [(None, "")]
+        for depth_index in range(depth):
+            wanted = [
+                (parent_id, f"{path}-{i}" if path else str(i))
+                for parent_id, path in level
+                for i in range(fanout)
+            ]
+            missing = [
+                Category(name=f"Category {path}", slug=CATEGORY_SLUG.format(path), parent_id=parent_id)
+                for parent_id, path in wanted
+                if CATEGORY_SLUG.format(path) not in existing
+            ]
+            for obj in Category.objects.bulk_create(missing, batch_size=1000):
+                existing[obj.slug] = obj.id
+            level = [(existing[CATEGORY_SLUG.format(path)], path) for _, path in wanted]
+            self.stdout.write(f"Category level {depth_index + 1}: {len(level)} categories")
+        return [category_id for category_id, _ in level]
+
+    def seed_properties(self, total, category_ids, batch_size, rng):
+        existing = Property.objects.filter(slug__startswith=PROPERTY_SLUG.format("")).count()
+        for offset in range(existing, total, batch_size):
+            with transaction.atomic():
+                Property.objects.bulk_create(
+                    Property(
+                        name=f"Demo property {i}",
+                        slug=PROPERTY_SLUG.format(i),
+                        description=f"Synthetic listing {i}.",
+                        location=rng.choice(LOCATIONS),
+                        price=Decimal(rng.randrange(50_000, 5_000_000)),
+                        bedrooms=rng.randint(1, 8),
+                        bathrooms=rng.randint(1, 6),
+                        amenities=rng.sample(AMENITIES, rng.randint(0, 4)),
+                        status=Property.STATUS_ACTIVE if rng.random() < 0.95 else Property.STATUS_INACTIVE,
+                        category_id=rng.choice(category_ids),
+                    )
+                    for i in range(offset, min(offset + batch_size, total))
+                )
+            self._progress("Properties", min(offset + batch_size, total), total)
+
+    def seed_users(self, total, batch_size):
+        User = get_user_model()
+        existing = User.objects.filter(email__startswith="demo-user", email__endswith="@example.com").count()
+        # One hash for every user: hashing millions of passwords would dominate the run.
+        password = make_password(USER_PASSWORD)
+        for offset in range(existing, total, batch_size):
+            User.objects.bulk_create(
+                [User(email=USER_EMAIL.format(i), password=password) for i in range(offset, min(offset + batch_size, total))],
+                batch_size=batch_size,
+            )
+            self._progress("Users", min(offset + batch_size, total), total)
+
+    def seed_bookings(self, total, batch_size, rng):
+        """
+        Bookings over the synthetic users and active properties. Booking ``i`` goes
+        to property ``i % P`` in 30-day round ``i // P``, so no two overlap; the
+        rounds are centred on today. Past bookings are paid (with a successful
+        payment); future ones are pending (every other one with a pending payment)
+        or canceled.
+        """
+        User = get_user_model()
+        user_ids = list(User.objects.filter(email__startswith="demo-user", email__endswith="@example.com").values_list("id", flat=True))
+        property_ids = list(
+            Property.objects.filter(slug__startswith=PROPERTY_SLUG.format(""), status=Property.STATUS_ACTIVE)
+            .order_by("id")
+            .values_list("id", flat=True)
+            .iterator(chunk_size=batch_size)
+        )
+        if not user_ids or not property_ids:
+            return
+        existing = Booking.objects.filter(property_id__gte=property_ids[0], property_id__lte=property_ids[-1]).count()
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        rounds = -(-total // len(property_ids))
+        origin = now - timedelta(days=15 + 30 * (rounds // 2))
+        for offset in range(existing, total, batch_size):
+            bookings = []
+            for i in range(offset, min(offset + batch_size, total)):
+                round_index, slot = divmod(i, len(property_ids))
+                start_at = origin + timedelta(days=30 * round_index, hours=rng.randrange(30 * 24))
+                if start_at < now:
+                    status = Booking.STATUS_PAID
+                else:
+                    status = Booking.STATUS_CANCELED if rng.random() < 0.1 else Booking.STATUS_PENDING
+                bookings.append(
+                    Booking(
+                        user_id=rng.choice(user_ids),
+                        property_id=property_ids[slot],
+                        total_amount=Decimal(rng.randrange(100, 10_000)),
+                        start_at=start_at,
+                        end_at=start_at + timedelta(hours=1),
+                        status=status,
+                    )
+                )
+            with transaction.atomic():
+                Booking.objects.bulk_create(bookings)
+                payments = [
+                    Payment(
+                        booking_id=booking.id,
+                        provider=Payment.PROVIDER_STRIPE if booking.id % 2 else Payment.PROVIDER_BKASH,
+                        transaction_id=f"demo-{booking.id}",
+                        status=Payment.STATUS_SUCCESS if booking.status == Booking.STATUS_PAID else Payment.STATUS_PENDING,
+                    )
+                    for booking in bookings
+                    if booking.status == Booking.STATUS_PAID or (booking.status == Booking.STATUS_PENDING and booking.id % 2)
+                ]
+                Payment.objects.bulk_create(payments)
+            self._progress("Bookings", min(offset + batch_size, total), total)
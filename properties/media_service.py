@@ -1,6 +1,11 @@
 from typing import List
 
-from core.mongo import get_media_collection
+from core.metrics import timed
+from core.mongo import get_async_media_collection, get_media_collection
+
+
+def _media_item(doc: dict) -> dict:
+    return {"url": doc.get("url"), "title": doc.get("title"), "type": doc.get("type")}
 
 
 def list_media(property_id: int) -> List[dict]:
@@ -12,8 +17,21 @@ def list_media(property_id: int) -> List[dict]:
     if collection is None:
         return []
     try:
-        cursor = collection.find({"property_id": property_id})
-        return [{"url": doc.get("url"), "title": doc.get("title"), "type": doc.get("type")} for doc in cursor]
+        with timed("mongo_operation_duration_seconds", operation="find"):
+            cursor = collection.find({"property_id": property_id})
+            return [_media_item(doc) for doc in cursor]
+    except Exception:
+        return []
+
+
+async def alist_media(property_id: int) -> List[dict]:
+    """Async ``list_media`` through the event loop's ``AsyncMongoClient``."""
+    collection = get_async_media_collection()
+    if collection is None:
+        return []
+    try:
+        with timed("mongo_operation_duration_seconds", operation="find"):
+            return [_media_item(doc) async for doc in collection.find({"property_id": property_id})]
     except Exception:
         return []
 
@@ -24,7 +42,8 @@ def add_media(property_id: int, url: str, title: str = "", media_type: str = "")
     if collection is None:
         return False
     try:
-        collection.insert_one({"property_id": property_id, "url": url, "title": title, "type": media_type})
+        with timed("mongo_operation_duration_seconds", operation="insert"):
+            collection.insert_one({"property_id": property_id, "url": url, "title": title, "type": media_type})
         return True
     except Exception:
         return False
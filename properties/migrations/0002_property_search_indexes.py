@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 19:20
+
+import core.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=core.indexes.PrefixIndex(django.db.models.functions.text.Upper('name'), name='properties_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=core.indexes.PrefixIndex(django.db.models.functions.text.Upper('location'), name='properties_location_upper_idx'),
+        ),
+    ]
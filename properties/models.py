@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models.functions import Upper
+
+from core.indexes import PrefixIndex
 
 
 class Category(models.Model):
@@ -45,7 +48,12 @@ class Property(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
-        indexes = [models.Index(fields=["slug", "status"])]
+        indexes = [
+            models.Index(fields=["slug", "status"]),
+            # Case-insensitive prefix search in the admin (core.admin search_lookups).
+            PrefixIndex(Upper("name"), name="properties_name_upper_idx"),
+            PrefixIndex(Upper("location"), name="properties_location_upper_idx"),
+        ]
 
     def __str__(self):
         return self.name
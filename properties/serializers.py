@@ -45,4 +45,7 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_media(self, obj):
+        # Async views fetch media themselves and pass it in the context.
+        if "media" in self.context:
+            return self.context["media"]
         return list_media(obj.id)
@@ -1,10 +1,21 @@
+import io
+import json
 from decimal import Decimal
 
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Q
+from django.test import AsyncRequestFactory, TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from bookings.models import Booking
+from payments.models import Payment
+from users.models import User
+
 from .models import Category, Property
+from .views import AsyncPropertyDetailView, AsyncPropertyListView, AsyncPropertyRecommendationsView
 
 
 class PropertyPublicTests(APITestCase):
@@ -35,3 +46,85 @@ class PropertyPublicTests(APITestCase):
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(resp.data["name"], self.property.name)
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "property-tests"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MONGO_URI="")
+class AsyncPropertyViewTests(APITestCase):
+    factory = AsyncRequestFactory()
+
+    def setUp(self):
+        PropertyPublicTests.setUp(self)
+        cache.clear()
+
+    async def _get(self, view, **kwargs):
+        response = await view.as_view()(self.factory.get("/"), **kwargs)
+        return response.status_code, json.loads(response.content)
+
+    async def test_async_list_matches_sync_list(self):
+        code, data = await self._get(AsyncPropertyListView)
+        self.assertEqual(code, status.HTTP_200_OK)
+        sync_data = (await self.async_client.get(reverse("property-list"))).json()
+        self.assertEqual(data, sync_data)
+
+    async def test_async_detail_and_missing_slug(self):
+        code, data = await self._get(AsyncPropertyDetailView, slug=self.property.slug)
+        self.assertEqual(code, status.HTTP_200_OK)
+        self.assertEqual(data["name"], self.property.name)
+        self.assertEqual(data["media"], [])
+        code, _ = await self._get(AsyncPropertyDetailView, slug="missing")
+        self.assertEqual(code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_recommendations_include_child_categories(self):
+        child = await Category.objects.acreate(name="Villas", slug="villas", parent=self.category)
+        await Property.objects.acreate(
+            name="Garden Villa",
+            slug="garden-villa",
+            description="Garden",
+            location="Suburbs",
+            price=Decimal("900000.00"),
+            status=Property.STATUS_ACTIVE,
+            category=child,
+        )
+        code, data = await self._get(AsyncPropertyRecommendationsView, slug=self.property.slug)
+        self.assertEqual(code, status.HTTP_200_OK)
+        self.assertEqual([p["slug"] for p in data], ["garden-villa"])
+
+
+class SeedDemoTests(TestCase):
+    def seed(self, properties=60):
+        call_command(
+            "seed_demo", properties=properties, users=5, bookings=150, category_depth=3, category_fanout=2,
+            batch_size=25, stdout=io.StringIO(),
+        )
+
+    def test_synthetic_data_set(self):
+        self.seed()
+
+        self.assertEqual(Category.objects.filter(slug__startswith="demo-cat-").count(), 2 + 4 + 8)
+        leaf = Category.objects.get(slug="demo-cat-1-0-1")
+        self.assertEqual(leaf.parent.parent.slug, "demo-cat-1")
+        self.assertEqual(Property.objects.filter(slug__startswith="demo-property-").count(), 60)
+        self.assertTrue(Property.objects.filter(slug="demo-property-59", category__slug__startswith="demo-cat-").exists())
+        self.assertTrue(User.objects.get(email="demo-user4@example.com").check_password("DemoPass123"))
+        self.assertEqual(Booking.objects.count(), 150)
+        self.assertEqual(
+            Payment.objects.filter(status=Payment.STATUS_SUCCESS).count(), Booking.objects.filter(status=Booking.STATUS_PAID).count()
+        )
+        # Bookings never overlap on a property.
+        for booking in Booking.objects.all()[:50]:
+            overlapping = Booking.objects.filter(
+                ~Q(id=booking.id), property_id=booking.property_id, start_at__lt=booking.end_at, end_at__gt=booking.start_at
+            )
+            self.assertFalse(overlapping.exists())
+
+    def test_rerun_tops_up(self):
+        self.seed()
+        self.seed(properties=80)
+
+        self.assertEqual(Category.objects.filter(slug__startswith="demo-cat-").count(), 14)
+        self.assertEqual(Property.objects.filter(slug__startswith="demo-property-").count(), 80)
+        self.assertEqual(User.objects.filter(email__startswith="demo-user").count(), 5)
+        self.assertEqual(Booking.objects.count(), 150)
@@ -1,6 +1,11 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import (
+    AsyncCategoryListView,
+    AsyncPropertyDetailView,
+    AsyncPropertyListView,
+    AsyncPropertyRecommendationsView,
     CategoryListView,
     HomePageView,
     PropertyPageView,
@@ -9,15 +14,23 @@ from .views import (
     PropertyRecommendationsView,
 )
 
+# Async read views under ASGI, DRF views otherwise (see ASYNC_PROPERTY_VIEWS).
+if settings.ASYNC_PROPERTY_VIEWS:
+    category_list, property_list = AsyncCategoryListView, AsyncPropertyListView
+    property_detail, property_recommendations = AsyncPropertyDetailView, AsyncPropertyRecommendationsView
+else:
+    category_list, property_list = CategoryListView, PropertyListView
+    property_detail, property_recommendations = PropertyDetailView, PropertyRecommendationsView
+
 urlpatterns = [
     path("", HomePageView.as_view(), name="home"),
     path("p/<slug:slug>/", PropertyPageView.as_view(), name="property-page"),
-    path("categories/", CategoryListView.as_view(), name="category-list"),
-    path("properties/", PropertyListView.as_view(), name="property-list"),
-    path("properties/<slug:slug>/", PropertyDetailView.as_view(), name="property-detail"),
+    path("categories/", category_list.as_view(), name="category-list"),
+    path("properties/", property_list.as_view(), name="property-list"),
+    path("properties/<slug:slug>/", property_detail.as_view(), name="property-detail"),
     path(
         "properties/<slug:slug>/recommendations/",
-        PropertyRecommendationsView.as_view(),
+        property_recommendations.as_view(),
         name="property-recommendations",
     ),
 ]
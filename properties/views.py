@@ -1,13 +1,18 @@
+import asyncio
 from collections import defaultdict, deque
 
-from django.core.cache import cache
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.views import View
 from django.views.generic import TemplateView
 
+from core.caching import aget_or_compute, get_or_compute
+
+from .media_service import alist_media
 from .models import Category, Property
 from .serializers import CategorySerializer, PropertyDetailSerializer, PropertySummarySerializer
 
@@ -15,12 +20,14 @@ from .serializers import CategorySerializer, PropertyDetailSerializer, PropertyS
 
 
 class CategoryListView(generics.ListAPIView):
+    read_replica = True
     queryset = Category.objects.select_related("parent").all()
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
 
 
 class PropertyListView(generics.ListAPIView):
+    read_replica = True
     queryset = (
         Property.objects.filter(status=Property.STATUS_ACTIVE)
         .select_related("category", "category__parent")
@@ -31,43 +38,56 @@ class PropertyListView(generics.ListAPIView):
 
 
 class PropertyDetailView(generics.RetrieveAPIView):
+    read_replica = True
     lookup_field = "slug"
     queryset = Property.objects.select_related("category", "category__parent").all()
     serializer_class = PropertyDetailSerializer
     permission_classes = [AllowAny]
 
 
+# Versioned: older workers cache the bare graph dict under "category_graph".
+CATEGORY_GRAPH_KEY = "category_graph:v2"
+
+
+def build_category_graph(rows):
+    """Parent id -> child ids from ``{"id", "parent_id"}`` rows."""
+    graph = defaultdict(list)
+    for cat in rows:
+        parent_id = cat["parent_id"]
+        if parent_id:
+            graph[parent_id].append(cat["id"])
+    return graph
+
+
+def dfs_collect(graph, start_id):
+    visited = set()
+    stack = deque([start_id])
+    result = []
+    while stack:
+        node = stack.pop()
+        if node in visited:
+            continue
+        visited.add(node)
+        result.append(node)
+        for child in graph.get(node, []):
+            stack.append(child)
+    return result
+
+
 class PropertyRecommendationsView(APIView):
+    read_replica = True
     permission_classes = [AllowAny]
     cache_timeout = 300  # seconds
 
     def get_category_graph(self):
-        graph = cache.get("category_graph")
-        if graph:
-            return graph
-
-        graph = defaultdict(list)
-        categories = Category.objects.all().values("id", "parent_id")
-        for cat in categories:
-            parent_id = cat["parent_id"]
-            if parent_id:
-                graph[parent_id].append(cat["id"])
-        cache.set("category_graph", graph, timeout=self.cache_timeout)
-        return graph
+        return get_or_compute(
+            CATEGORY_GRAPH_KEY,
+            lambda: build_category_graph(Category.objects.all().values("id", "parent_id")),
+            self.cache_timeout,
+        )
 
     def dfs_collect(self, graph, start_id):
-        visited = set()
-        stack = deque([start_id])
-        result = []
-        while stack:
-            node = stack.pop()
-            if node in visited:
-                continue
-            visited.add(node)
-            result.append(node)
-            for child in graph.get(node, []):
-                stack.append(child)
-        return result
+        return dfs_collect(graph, start_id)
 
     def get(self, request, slug):
         property_obj = get_object_or_404(
@@ -89,7 +109,89 @@ class PropertyRecommendationsView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+# Async variants of the public read endpoints, mounted instead of the views above
+# when ASYNC_PROPERTY_VIEWS is set (serve with an ASGI server such as uvicorn).
+# They run the ORM through its async API and read media with AsyncMongoClient, so
+# a request awaiting Postgres or Mongo does not hold a worker thread.
+
+
+def _not_found():
+    return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+
+class AsyncCategoryListView(View):
+    read_replica = True
+
+    async def get(self, request):
+        categories = [c async for c in CategoryListView.queryset.all().aiterator()]
+        return JsonResponse(CategorySerializer(categories, many=True).data, safe=False)
+
+
+class AsyncPropertyListView(View):
+    read_replica = True
+
+    async def get(self, request):
+        properties = [p async for p in PropertyListView.queryset.all().aiterator()]
+        return JsonResponse(PropertySummarySerializer(properties, many=True).data, safe=False)
+
+
+class AsyncPropertyDetailView(View):
+    read_replica = True
+    # slug -> property id, so media can be fetched alongside the row on repeat visits.
+    slug_ids = {}
+    slug_ids_max = 10000
+
+    async def get(self, request, slug):
+        queryset = PropertyDetailView.queryset
+        known_id = self.slug_ids.get(slug)
+        try:
+            if known_id is None:
+                property_obj = await queryset.aget(slug=slug)
+                media = await alist_media(property_obj.id)
+            else:
+                property_obj, media = await asyncio.gather(queryset.aget(slug=slug), alist_media(known_id))
+                if property_obj.id != known_id:
+                    media = await alist_media(property_obj.id)
+        except Property.DoesNotExist:
+            self.slug_ids.pop(slug, None)
+            return _not_found()
+        if len(self.slug_ids) >= self.slug_ids_max:
+            self.slug_ids.clear()
+        self.slug_ids[slug] = property_obj.id
+        return JsonResponse(PropertyDetailSerializer(property_obj, context={"media": media}).data)
+
+
+class AsyncPropertyRecommendationsView(View):
+    read_replica = True
+    cache_timeout = PropertyRecommendationsView.cache_timeout
+
+    async def get_category_graph(self):
+        async def compute():
+            return build_category_graph([row async for row in Category.objects.values("id", "parent_id").aiterator()])
+
+        return await aget_or_compute(CATEGORY_GRAPH_KEY, compute, self.cache_timeout)
+
+    async def get(self, request, slug):
+        lookup = Property.objects.only("id", "category_id").aget(slug=slug, status=Property.STATUS_ACTIVE)
+        try:
+            property_obj, graph = await asyncio.gather(lookup, self.get_category_graph())
+        except Property.DoesNotExist:
+            return _not_found()
+        category_ids = dfs_collect(graph, property_obj.category_id)
+
+        recommendations = [
+            p
+            async for p in Property.objects.filter(status=Property.STATUS_ACTIVE, category_id__in=category_ids)
+            .exclude(id=property_obj.id)
+            .select_related("category")
+            .order_by("-created_at")[:10]
+            .aiterator()
+        ]
+        return JsonResponse(PropertySummarySerializer(recommendations, many=True).data, safe=False)
+
+
 class HomePageView(TemplateView):
+    read_replica = True
     template_name = "home.html"
 
     def get_context_data(self, **kwargs):
@@ -103,6 +205,7 @@ class HomePageView(TemplateView):
 
 
 class PropertyPageView(TemplateView):
+    read_replica = True
     template_name = "property_detail.html"
 
     def get_context_data(self, **kwargs):
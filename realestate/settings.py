@@ -39,9 +39,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # OpClass for pattern-ops expression indexes (core.indexes.PrefixIndex).
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'drf_spectacular',
+    'core',
     'users',
     'properties',
     'bookings',
@@ -49,11 +52,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # After authentication so `?_profile=1` can check request.user.is_staff.
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -89,15 +97,46 @@ if POSTGRES_DB:
             "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
             "HOST": os.getenv("POSTGRES_HOST", "localhost"),
             "PORT": os.getenv("POSTGRES_PORT", "5432"),
+            # Persistent connections, checked before reuse so a dropped one is replaced transparently.
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
         }
     }
+    if os.getenv("POSTGRES_POOL", "false").lower() == "true":
+        # psycopg 3 connection pool (needs psycopg[pool]); replaces persistent connections.
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.getenv("POSTGRES_POOL_MIN_SIZE", "2")),
+                "max_size": int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10")),
+                "timeout": float(os.getenv("POSTGRES_POOL_TIMEOUT", "10")),
+            }
+        }
+    # Streaming replicas of the primary, one alias each (replica1, replica2, ...).
+    for index, host in enumerate(filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")), start=1):
+        DATABASES[f"replica{index}"] = dict(DATABASES["default"], HOST=host.strip())
 else:
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
-        }
+        },
     }
+    # Separate file so replica routing can be exercised locally; realestate.test_settings
+    # turns it on for the routing tests (as an in-memory test database).
+    if os.getenv("SQLITE_REPLICA", "false").lower() == "true":
+        DATABASES["replica"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.replica.sqlite3",
+        }
+
+# Read replicas (core.db_router): aliases that serve reads of views marked read_replica.
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+_default_replicas = ",".join(alias for alias in DATABASES if alias != "default") if POSTGRES_DB else ""
+DATABASE_REPLICAS = [alias.strip() for alias in os.getenv("DATABASE_REPLICAS", _default_replicas).split(",") if alias.strip()]
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", "10"))
+DATABASE_REPLICA_MAX_LAG = float(os.getenv("DATABASE_REPLICA_MAX_LAG", "5"))
+DATABASE_REPLICA_CHECK_INTERVAL = float(os.getenv("DATABASE_REPLICA_CHECK_INTERVAL", "5"))
 
 
 # Password validation
@@ -143,32 +182,91 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Trusted reverse proxies in front of the app. Per-IP throttles use the X-Forwarded-For
+    # address appended by the outermost of them; 0 uses REMOTE_ADDR and ignores the
+    # client-controlled header.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
+    # Sliding-window limits for core.throttling scopes; an empty value disables one.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('THROTTLE_LOGIN_IP_RATE', '30/min'),
+        'login_identifier': os.getenv('THROTTLE_LOGIN_IDENTIFIER_RATE', '10/min'),
+        'register_ip': os.getenv('THROTTLE_REGISTER_IP_RATE', '20/hour'),
+        'register_email': os.getenv('THROTTLE_REGISTER_EMAIL_RATE', '5/hour'),
+        'booking_create': os.getenv('THROTTLE_BOOKING_RATE', '30/min'),
+    },
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "users.serializers.TokenVerifySerializer",
 }
 
 AUTH_USER_MODEL = "users.User"
+# Seconds a JWT-authenticated user stays cached (dropped on save); 0 disables the cache.
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+# User dashboard (users.dashboard): seconds a user's bookings/payments stay cached; 0 disables the cache.
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+DASHBOARD_BOOKING_LIMIT = int(os.getenv("DASHBOARD_BOOKING_LIMIT", "20"))
 AUTHENTICATION_BACKENDS = [
     "core.auth_backends.EmailOrAdminUsernameBackend",
 ]
 
+# Admin changelists on large tables (core.admin): planner estimates instead of COUNT(*)
+# for unfiltered lists, capped counts for filtered ones, keyset paging past the offset.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv("ADMIN_ESTIMATED_COUNT_THRESHOLD", "100000"))
+ADMIN_COUNT_LIMIT = int(os.getenv("ADMIN_COUNT_LIMIT", "100000"))
+ADMIN_KEYSET_OFFSET = int(os.getenv("ADMIN_KEYSET_OFFSET", "10000"))
+ADMIN_KEYSET_CACHE_TTL = int(os.getenv("ADMIN_KEYSET_CACHE_TTL", "300"))
+# Admin search across a relation (e.g. a booking's property name) matches at most this many related rows.
+ADMIN_SEARCH_RELATED_LIMIT = int(os.getenv("ADMIN_SEARCH_RELATED_LIMIT", "1000"))
+
+# Serve the public property read endpoints with async views (enable when running under uvicorn / ASGI).
+ASYNC_PROPERTY_VIEWS = os.getenv("ASYNC_PROPERTY_VIEWS", "false").lower() == "true"
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/1")
 USE_REDIS = os.getenv("USE_REDIS", "true").lower() == "true"
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+# One connection pool per process (core.redis), shared by the cache, throttles and revocation list.
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+# Revoked JWT ids (core.revocation): shared through Redis, mirrored per worker in a Bloom filter.
+REVOCATION_USE_REDIS = os.getenv("REVOCATION_USE_REDIS", str(USE_REDIS)).lower() == "true"
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "2"))
+REVOCATION_REBUILD_INTERVAL = float(os.getenv("REVOCATION_REBUILD_INTERVAL", "600"))
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+# Booking/payment status events for the panel's SSE stream (users.events).
+# The stream needs an ASGI server; enable it only there (off by default so WSGI workers are never pinned).
+EVENTS_STREAM_ENABLED = os.getenv("EVENTS_STREAM_ENABLED", "false").lower() == "true"
+# Lifetime in seconds of the signed ticket a client exchanges its JWT for to open the stream.
+EVENTS_TICKET_MAX_AGE = int(os.getenv("EVENTS_TICKET_MAX_AGE", "30"))
+EVENTS_USE_REDIS = os.getenv("EVENTS_USE_REDIS", str(USE_REDIS)).lower() == "true"
+EVENTS_BACKLOG = int(os.getenv("EVENTS_BACKLOG", "100"))
+EVENTS_BACKLOG_TTL = int(os.getenv("EVENTS_BACKLOG_TTL", "86400"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "3000"))
+# Throttle state in Redis (shared by all workers) or per process when false.
+THROTTLE_USE_REDIS = os.getenv("THROTTLE_USE_REDIS", str(USE_REDIS)).lower() == "true"
 if USE_REDIS:
     CACHES = {
         "default": {
-            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            # Per-worker LRU in front of Redis, kept coherent over pub/sub (core.tiered_cache).
+            "BACKEND": "core.tiered_cache.TwoTierRedisCache",
             "LOCATION": REDIS_URL,
+            "OPTIONS": {
+                "pool_class": "core.redis.SharedConnectionPool",
+                "LOCAL_MAX_ENTRIES": int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "1000")),
+                "LOCAL_TTL": float(os.getenv("CACHE_LOCAL_TTL", "5")),
+            },
         }
     }
 else:
@@ -181,12 +279,52 @@ else:
 
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+# Override the Stripe API host, e.g. to point at the local fake provider server.
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "")
 BKASH_BASE_URL = os.getenv("BKASH_BASE_URL", "")
 BKASH_APP_KEY = os.getenv("BKASH_APP_KEY", "")
 BKASH_APP_SECRET = os.getenv("BKASH_APP_SECRET", "")
 BKASH_USERNAME = os.getenv("BKASH_USERNAME", "")
 BKASH_PASSWORD = os.getenv("BKASH_PASSWORD", "")
 
+# Payment strategies by provider name; add a provider by adding its dotted path.
+PAYMENT_PROVIDERS = {
+    "stripe": "payments.services.StripePaymentStrategy",
+    "bkash": "payments.services.BkashPaymentStrategy",
+}
+
+# Outbound provider HTTP (pooled sessions, bounded retries, total timeout budget per call)
+PAYMENT_HTTP_TIMEOUT = float(os.getenv("PAYMENT_HTTP_TIMEOUT", "10"))
+PAYMENT_HTTP_CONNECT_TIMEOUT = float(os.getenv("PAYMENT_HTTP_CONNECT_TIMEOUT", "3.05"))
+PAYMENT_HTTP_MAX_RETRIES = int(os.getenv("PAYMENT_HTTP_MAX_RETRIES", "2"))
+PAYMENT_HTTP_BACKOFF = float(os.getenv("PAYMENT_HTTP_BACKOFF", "0.2"))
+PAYMENT_HTTP_POOL_MAXSIZE = int(os.getenv("PAYMENT_HTTP_POOL_MAXSIZE", "20"))
+# Seconds before an unfinalized payment reservation is considered abandoned.
+PAYMENT_RESERVATION_TTL = int(os.getenv("PAYMENT_RESERVATION_TTL", "120"))
+
+# Slow query log (core.slow_queries): statements at or over the threshold are grouped by
+# fingerprint with their EXPLAIN plan in core.SlowQuery; 0 disables it.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_FLUSH_INTERVAL = float(os.getenv("SLOW_QUERY_FLUSH_INTERVAL", "5"))
+
+# On-demand request profiling (core.profiling): staff trigger it with a signed X-Profile
+# header or ?_profile=1; PROFILING_SAMPLE_RATE profiles that fraction of all requests.
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", str(BASE_DIR / "var" / "profiles"))
+PROFILING_MAX_ENTRIES = int(os.getenv("PROFILING_MAX_ENTRIES", "200"))
+PROFILING_TOKEN_MAX_AGE = int(os.getenv("PROFILING_TOKEN_MAX_AGE", "3600"))
+PROFILING_TOP_FUNCTIONS = int(os.getenv("PROFILING_TOP_FUNCTIONS", "40"))
+
+# Latency metrics served at /metrics. Set METRICS_DIR to a directory shared by all
+# gunicorn workers so the endpoint aggregates every process.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+# Bearer token required to scrape /metrics. Without one, only staff users and the
+# addresses below (REMOTE_ADDR, comma-separated) may scrape it.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()]
+
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "realestate_media")
 
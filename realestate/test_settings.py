@@ -0,0 +1,12 @@
+"""
+Settings for the test suite: the project settings plus the SQLite `replica`
+alias the routing tests need. `manage.py test` uses this module unless
+DJANGO_SETTINGS_MODULE is already set.
+"""
+
+import os
+
+# The SQLite opt-in must be set before the project settings read it.
+os.environ.setdefault("SQLITE_REPLICA", "true")
+
+from .settings import *  # noqa: E402,F401,F403
@@ -0,0 +1,65 @@
+"""
+Per-user dashboard cache.
+
+The bookings/payments part of ``/auth/me/dashboard/`` is cached under
+``dashboard:<user_id>:<version>``. Writes bump ``dashboard:version:<user_id>``
+instead of deleting entries, so a stale payload is simply never read again and
+expires on its own after ``DASHBOARD_CACHE_TTL`` seconds. A missing version is
+seeded from the clock, so an evicted counter cannot resurrect an old payload.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from bookings.models import Booking
+
+logger = logging.getLogger(__name__)
+
+VERSION_TTL = 24 * 60 * 60
+
+
+def _version_key(user_id):
+    return f"dashboard:version:{user_id}"
+
+
+def dashboard_cache_key(user_id):
+    """Current cache key for the user's dashboard, creating the version if needed."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), VERSION_TTL)
+        version = cache.get(key)
+    return f"dashboard:{user_id}:{version}"
+
+
+def _bump(user_ids):
+    for user_id in user_ids:
+        key = _version_key(user_id)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), VERSION_TTL)
+        except Exception as exc:
+            logger.warning("Could not invalidate dashboard of user %s: %s", user_id, exc)
+
+
+def invalidate_dashboards(user_ids):
+    # Bumped again after commit so a request racing the transaction cannot cache
+    # the old rows under the new version.
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids or not settings.DASHBOARD_CACHE_TTL:
+        return
+    _bump(user_ids)
+    transaction.on_commit(lambda: _bump(user_ids))
+
+
+def invalidate_booking_dashboards(booking_ids):
+    """Invalidate the dashboards owning ``booking_ids`` (one query)."""
+    booking_ids = set(booking_ids)
+    if not booking_ids or not settings.DASHBOARD_CACHE_TTL:
+        return
+    invalidate_dashboards(Booking.objects.filter(id__in=booking_ids).values_list("user_id", flat=True))
@@ -0,0 +1,364 @@
+"""
+Per-user booking and payment status events for the panel's SSE stream.
+
+Status changes are published after commit: each event is appended to the user's
+Redis stream ``events:user:<id>`` (capped at ``EVENTS_BACKLOG`` entries, the
+stream entry id doubles as the SSE event id) and announced on the
+``events:status`` pub/sub channel.
+
+Each process runs one ``EventHub`` per event loop: a single pub/sub subscription
+that fans events out to the in-memory queues of the open streams, so an idle
+connection costs a queue and a suspended coroutine, not a Redis connection or a
+thread. Clients reconnecting with ``Last-Event-ID`` are replayed the stream
+entries after it; a client too slow to drain its queue is disconnected and
+resumes the same way. With ``EVENTS_USE_REDIS`` false the backlog and fan-out
+stay in the process (development and tests).
+
+EventSource cannot send an ``Authorization`` header, so browsers first exchange
+their access token for a signed ticket (``make_stream_ticket``) valid for
+``EVENTS_TICKET_MAX_AGE`` seconds and open the stream with ``?ticket=``; access
+tokens never appear in URLs.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+
+from core.metrics import inc
+from core.redis import get_redis_client
+
+try:
+    import redis.asyncio as aioredis
+except Exception:  # pragma: no cover - redis import guard
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "events:status"
+STREAM_PREFIX = "events:user:"
+QUEUE_SIZE = 256
+TICKET_SALT = "users.events.stream"
+
+_hubs = weakref.WeakKeyDictionary()
+_hubs_lock = threading.Lock()
+
+
+def _stream_key(user_id):
+    return f"{STREAM_PREFIX}{user_id}"
+
+
+def make_stream_ticket(user):
+    """Short-lived signed value that opens ``user``'s event stream."""
+    return signing.dumps({"user": user.pk}, salt=TICKET_SALT)
+
+
+def read_stream_ticket(ticket):
+    """The user id a valid, unexpired ticket was issued for, else None."""
+    try:
+        return signing.loads(ticket, salt=TICKET_SALT, max_age=settings.EVENTS_TICKET_MAX_AGE)["user"]
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def parse_event_id(event_id):
+    """``"<ms>-<seq>"`` as a comparable tuple, or None when malformed."""
+    if isinstance(event_id, bytes):
+        event_id = event_id.decode()
+    ms, _, seq = (event_id or "").partition("-")
+    try:
+        return int(ms), int(seq or 0)
+    except ValueError:
+        return None
+
+
+class _LocalBacklog:
+    """Process-local stand-in for the Redis streams."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = defaultdict(lambda: deque(maxlen=settings.EVENTS_BACKLOG))
+        self._seq = itertools.count()
+
+    def append(self, user_id, data):
+        with self._lock:
+            event_id = f"{time.time_ns() // 1_000_000}-{next(self._seq)}"
+            self._streams[user_id].append((event_id, data))
+        return event_id
+
+    def after(self, user_id, last_id):
+        with self._lock:
+            entries = list(self._streams.get(user_id, ()))
+        return [entry for entry in entries if last_id is None or parse_event_id(entry[0]) > last_id]
+
+    def clear(self):
+        with self._lock:
+            self._streams.clear()
+
+
+local_backlog = _LocalBacklog()
+
+
+def _client():
+    return get_redis_client() if settings.EVENTS_USE_REDIS else None
+
+
+def _publish(events):
+    client = _client()
+    if client is None:
+        for user_id, data in events:
+            event_id = local_backlog.append(user_id, data)
+            _dispatch_local(user_id, event_id, data)
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for user_id, data in events:
+            key = _stream_key(user_id)
+            pipe.xadd(key, {"data": data}, maxlen=settings.EVENTS_BACKLOG, approximate=True)
+            pipe.expire(key, settings.EVENTS_BACKLOG_TTL)
+        event_ids = pipe.execute()[::2]
+        pipe = client.pipeline(transaction=False)
+        for (user_id, data), event_id in zip(events, event_ids):
+            event_id = event_id.decode() if isinstance(event_id, bytes) else event_id
+            pipe.publish(CHANNEL, json.dumps({"user": user_id, "id": event_id, "data": data}))
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("Could not publish status events: %s", exc)
+
+
+def publish_events(events):
+    """Publish ``[(user_id, payload_dict), ...]`` once the current transaction commits."""
+    events = [(user_id, json.dumps(payload, separators=(",", ":"))) for user_id, payload in events if user_id]
+    if events:
+        transaction.on_commit(lambda: _publish(events))
+
+
+def publish_booking_status(booking):
+    publish_events([(booking.user_id, {"type": "booking", "booking_id": booking.id, "status": booking.status})])
+
+
+def publish_payment_statuses(rows, owners=None):
+    """
+    Publish ``[(payment_id, booking_id, status), ...]``, as returned by
+    ``PaymentQuerySet.transition_many``. ``owners`` maps booking id to user id and
+    is looked up (one query) when not given. A successful payment also reports its
+    booking as paid.
+    """
+    from bookings.models import Booking
+    from payments.models import Payment
+
+    rows = list(rows)
+    if not rows:
+        return
+    if owners is None:
+        owners = dict(Booking.objects.filter(id__in={row[1] for row in rows}).values_list("id", "user_id"))
+    events = []
+    for payment_id, booking_id, status in rows:
+        user_id = owners.get(booking_id)
+        events.append((user_id, {"type": "payment", "payment_id": payment_id, "booking_id": booking_id, "status": status}))
+        if status == Payment.STATUS_SUCCESS:
+            events.append((user_id, {"type": "booking", "booking_id": booking_id, "status": Booking.STATUS_PAID}))
+    publish_events(events)
+
+
+# Consumers ---------------------------------------------------------------------
+
+
+class Subscriber:
+    """
+    One open stream: a bounded queue of ``(event_id, data)`` and the last id queued.
+
+    While a backlog replay is in flight, live events are held back and merged
+    with the replayed entries in id order once it finishes; otherwise a live
+    event would advance ``last_id`` past backlog entries still being read.
+    """
+
+    __slots__ = ("queue", "last_id", "overflowed", "_replays", "_held")
+
+    def __init__(self, last_event_id=None):
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.last_id = parse_event_id(last_event_id) if last_event_id else None
+        self.overflowed = False
+        self._replays = 0
+        self._held = []
+
+    def push(self, event_id, data):
+        if self._replays:
+            if len(self._held) >= QUEUE_SIZE:
+                self.overflowed = True
+            else:
+                self._held.append((event_id, data))
+            return
+        self._enqueue(event_id, data)
+
+    def begin_replay(self):
+        self._replays += 1
+
+    def end_replay(self, entries):
+        """Queue ``entries`` and the live events held back meanwhile, oldest first, once."""
+        self._held.extend(entries)
+        self._replays -= 1
+        if self._replays:
+            return
+        held, self._held = self._held, []
+        for event_id, data in sorted(held, key=lambda entry: parse_event_id(entry[0]) or (-1, -1)):
+            self._enqueue(event_id, data)
+
+    def _enqueue(self, event_id, data):
+        parsed = parse_event_id(event_id)
+        if parsed is None or (self.last_id is not None and parsed <= self.last_id):
+            return
+        try:
+            self.queue.put_nowait((event_id, data))
+        except asyncio.QueueFull:
+            # Stop queueing; the stream closes and the client resumes from the backlog.
+            self.overflowed = True
+            return
+        self.last_id = parsed
+
+
+class EventHub:
+    """Fans status events out to the streams open on one event loop."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._client = None
+        self._task = None
+
+    def subscribe(self, user_id, last_event_id=None):
+        subscriber = Subscriber(last_event_id)
+        self._subscribers[user_id].add(subscriber)
+        if settings.EVENTS_USE_REDIS and aioredis and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        subscribers = self._subscribers.get(user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def dispatch(self, user_id, event_id, data):
+        for subscriber in tuple(self._subscribers.get(user_id, ())):
+            subscriber.push(event_id, data)
+
+    def connections(self):
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _redis(self):
+        if self._client is None:
+            self._client = aioredis.Redis.from_url(
+                settings.REDIS_URL,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_keepalive=True,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            )
+        return self._client
+
+    async def replay(self, user_id, subscriber):
+        """Queue the backlog entries ``subscriber`` has not seen yet."""
+        subscriber.begin_replay()
+        entries = []
+        try:
+            entries = await self._backlog(user_id, subscriber.last_id)
+        finally:
+            subscriber.end_replay(entries)
+
+    async def _backlog(self, user_id, last_id):
+        if not settings.EVENTS_USE_REDIS:
+            return local_backlog.after(user_id, last_id)
+        start = "-" if last_id is None else "({}-{}".format(*last_id)
+        try:
+            raw = await self._redis().xrange(_stream_key(user_id), min=start, max="+", count=settings.EVENTS_BACKLOG)
+        except Exception as exc:
+            logger.warning("Could not read status event backlog: %s", exc)
+            return []
+        return [(event_id.decode(), fields[b"data"].decode()) for event_id, fields in raw]
+
+    async def _listen(self):
+        backoff = 0.5
+        while True:
+            pubsub = self._redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CHANNEL)
+                backoff = 0.5
+                # Anything published while (re)connecting is in the streams.
+                for user_id, subscribers in list(self._subscribers.items()):
+                    for subscriber in tuple(subscribers):
+                        if subscriber.last_id is not None:
+                            await self.replay(user_id, subscriber)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message["type"] == "message":
+                        event = json.loads(message["data"])
+                        self.dispatch(event["user"], event["id"], event["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Status event listener disconnected: %s", exc)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+def get_event_hub():
+    """The ``EventHub`` of the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _hubs_lock:
+        hub = _hubs.get(loop)
+        if hub is None:
+            hub = _hubs[loop] = EventHub()
+    return hub
+
+
+def _dispatch_local(user_id, event_id, data):
+    with _hubs_lock:
+        hubs = list(_hubs.items())
+    for loop, hub in hubs:
+        try:
+            loop.call_soon_threadsafe(hub.dispatch, user_id, event_id, data)
+        except RuntimeError:
+            pass  # loop closed
+
+
+def _format(event_id, data):
+    kind = json.loads(data).get("type", "message")
+    return f"id: {event_id}\nevent: {kind}\ndata: {data}\n\n"
+
+
+async def event_stream(user_id, last_event_id=None):
+    """
+    Async iterator of SSE frames for ``user_id``: the backlog after
+    ``last_event_id``, then live events, with a comment line every
+    ``EVENTS_HEARTBEAT_SECONDS`` so proxies keep the connection open.
+    """
+    hub = get_event_hub()
+    # Subscribe before reading the backlog so nothing falls between the two.
+    subscriber = hub.subscribe(user_id, last_event_id)
+    inc("event_stream_connections_total")
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+        if last_event_id:
+            await hub.replay(user_id, subscriber)
+        while not subscriber.overflowed:
+            try:
+                event_id, data = await asyncio.wait_for(subscriber.queue.get(), settings.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield _format(event_id, data)
+    finally:
+        hub.unsubscribe(user_id, subscriber)
@@ -3,6 +3,7 @@ from django.db import models
 # Create your models here.
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.db.models.functions import Lower
 
 
 class UserManager(BaseUserManager):
@@ -48,5 +49,12 @@ class User(AbstractUser):
 
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        # Case-insensitive login lookups (see core.auth_backends) filter on these expressions.
+        indexes = [
+            models.Index(Lower("email"), name="users_user_email_lower_idx"),
+            models.Index(Lower("admin_username"), name="users_user_admin_lower_idx"),
+        ]
+
     def __str__(self):
         return self.email
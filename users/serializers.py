@@ -1,6 +1,13 @@
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.serializers import TokenVerifySerializer as BaseTokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
+
+from core.revocation import is_token_revoked, revoke_token
 
 from .models import User
 
@@ -51,3 +58,48 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("User account is disabled.")
         attrs["user"] = user
         return attrs
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """Refuses refresh tokens revoked at logout."""
+
+    def validate(self, attrs):
+        try:
+            token = RefreshToken(attrs["refresh"])
+        except TokenError as exc:
+            raise InvalidToken(exc.args[0]) from exc
+        if is_token_revoked(token):
+            raise InvalidToken("Token has been revoked.")
+        return super().validate(attrs)
+
+
+class TokenVerifySerializer(BaseTokenVerifySerializer):
+    """Reports tokens revoked at logout as invalid."""
+
+    def validate(self, attrs):
+        try:
+            token = UntypedToken(attrs["token"])
+        except TokenError as exc:
+            raise InvalidToken(exc.args[0]) from exc
+        if is_token_revoked(token):
+            raise InvalidToken("Token has been revoked.")
+        return super().validate(attrs)
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=False)
+
+    def validate_refresh(self, value):
+        try:
+            token = RefreshToken(value)
+        except TokenError as exc:
+            raise serializers.ValidationError(str(exc)) from exc
+        if str(token.get(jwt_settings.USER_ID_CLAIM)) != str(self.context["request"].user.pk):
+            raise serializers.ValidationError("Refresh token belongs to another user.")
+        return token
+
+    def save(self):
+        request = self.context["request"]
+        revoke_token(request.auth)
+        if self.validated_data.get("refresh"):
+            revoke_token(self.validated_data["refresh"])
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bookings.models import Booking
+from core.authentication import invalidate_cached_user
+from payments.models import Payment
+from .dashboard import invalidate_booking_dashboards, invalidate_dashboards
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    # Covers profile edits, password changes and deactivation. Dropped again after
+    # commit so a request racing the transaction cannot re-cache the old row.
+    user_id = instance.pk
+    invalidate_cached_user(user_id)
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def drop_booking_dashboard(sender, instance, **kwargs):
+    invalidate_dashboards([instance.user_id])
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def drop_payment_dashboard(sender, instance, **kwargs):
+    # Bulk status updates bypass signals; see PaymentQuerySet.transition_many.
+    if Payment.booking.is_cached(instance):
+        invalidate_dashboards([instance.booking.user_id])
+    else:
+        invalidate_booking_dashboards([instance.booking_id])
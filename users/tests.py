@@ -1,8 +1,25 @@
-from django.urls import reverse
+import asyncio
+import json
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.urls import NoReverseMatch, reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from bookings.models import Booking
+from core.revocation import BloomFilter, revocation_list
+from core.throttling import local_window
+from payments.models import Payment
+from properties.models import Category, Property
+from .events import _publish, event_stream, get_event_hub, local_backlog, make_stream_ticket, parse_event_id
 from .models import User
+from .views import EventStreamView
 
 
 class AuthTests(APITestCase):
@@ -28,8 +45,299 @@ class AuthTests(APITestCase):
         self.assertIn("access", resp.data)
         self.assertEqual(resp.data["user"]["email"], user.email)
 
+    def test_login_lookup_is_case_insensitive_single_query(self):
+        user = User.objects.create_user(email="Mixed@Example.com", password="StrongPass123")
+        admin = User.objects.create_user(email="ops@example.com", password="AdminPass123", admin_username="OpsAdmin")
+        with self.assertNumQueries(1):
+            self.assertEqual(authenticate(username="mixed@example.COM", password="StrongPass123"), user)
+        with self.assertNumQueries(1):
+            self.assertEqual(authenticate(username="opsadmin", password="AdminPass123"), admin)
+        self.assertIsNone(authenticate(username="nobody@example.com", password="StrongPass123"))
+
     def test_me_requires_auth(self):
         User.objects.create_user(email="me@example.com", password="StrongPass123")
         url = reverse("auth-me")
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "auth-tests"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CachedAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="cached@example.com", password="StrongPass123")
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_repeat_requests_skip_user_query(self):
+        url = reverse("auth-me")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            resp = self.client.get(url)
+        self.assertEqual(resp.data["email"], self.user.email)
+
+    def test_save_invalidates_cached_user(self):
+        url = reverse("auth-me")
+        self.client.get(url)
+        self.user.first_name = "Renamed"
+        self.user.save()
+        self.assertEqual(self.client.get(url).data["first_name"], "Renamed")
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(
+    THROTTLE_USE_REDIS=False,
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {"login_ip": "5/min", "login_identifier": "2/min", "register_ip": "1/min"},
+    },
+)
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        local_window.clear()
+        self.addCleanup(local_window.clear)
+
+    def test_login_identifier_limit_rejects_before_hashing(self):
+        url = reverse("auth-login")
+        payload = {"identifier": "Victim@example.com", "password": "wrong"}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, payload, format="json").status_code, status.HTTP_400_BAD_REQUEST)
+
+        with mock.patch("users.serializers.authenticate") as auth:
+            resp = self.client.post(url, {**payload, "identifier": "victim@EXAMPLE.com"}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", resp)
+        auth.assert_not_called()
+
+        other = self.client.post(url, {"identifier": "someone@example.com", "password": "x"}, format="json")
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_register_ip_limit(self):
+        url = reverse("auth-register")
+        first = self.client.post(url, {"email": "a@example.com", "password": "StrongPass123"}, format="json")
+        second = self.client.post(url, {"email": "b@example.com", "password": "StrongPass123"}, format="json")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_ip_limit_ignores_spoofed_forwarded_for(self):
+        url = reverse("auth-register")
+        for index, status_code in enumerate((status.HTTP_201_CREATED, status.HTTP_429_TOO_MANY_REQUESTS)):
+            resp = self.client.post(
+                url, {"email": f"spoof{index}@example.com", "password": "StrongPass123"}, format="json",
+                HTTP_X_FORWARDED_FOR=f"203.0.113.{index}",
+            )
+            self.assertEqual(resp.status_code, status_code)
+
+    def test_ip_limit_uses_address_added_by_trusted_proxy(self):
+        url = reverse("auth-register")
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1, "DEFAULT_THROTTLE_RATES": {"register_ip": "1/min"}}):
+            for index in range(2):
+                resp = self.client.post(
+                    url, {"email": f"proxied{index}@example.com", "password": "StrongPass123"}, format="json",
+                    HTTP_X_FORWARDED_FOR=f"198.51.100.7, 203.0.113.{index}",
+                )
+                self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+
+
+@override_settings(REVOCATION_USE_REDIS=False, CACHES=LOCMEM_CACHE)
+class RevocationTests(APITestCase):
+    def setUp(self):
+        revocation_list.clear()
+        self.addCleanup(revocation_list.clear)
+        self.user = User.objects.create_user(email="revoke@example.com", password="StrongPass123")
+        self.refresh = RefreshToken.for_user(self.user)
+        self.access = self.refresh.access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        self.assertEqual(self.client.get(reverse("auth-me")).status_code, status.HTTP_200_OK)
+        resp = self.client.post(reverse("auth-logout"), {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.client.get(reverse("auth-me")).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        resp = self.client.post(reverse("token-refresh"), {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+        for token in (self.refresh, self.access):
+            resp = self.client.post(reverse("token-verify"), {"token": str(token)}, format="json")
+            self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(REVOCATION_USE_REDIS=True)
+    def test_workers_sync_filter_from_redis_log(self):
+        jti = self.refresh.access_token["jti"]
+        exp = int(self.refresh.access_token["exp"])
+        client = mock.Mock()
+        client.zcard.return_value = 1
+        client.zrangebyscore.return_value = [(f"{jti}:{exp}".encode(), 1000.0)]
+        client.exists.return_value = 1
+        with mock.patch("core.revocation.get_redis_client", return_value=client):
+            self.assertTrue(revocation_list.is_revoked(jti))
+            self.assertFalse(revocation_list.is_revoked("not-revoked"))
+        # Only the filter hit needed a confirmation round trip.
+        client.exists.assert_called_once()
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        items = [f"jti-{i}" for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, DASHBOARD_CACHE_TTL=60)
+class DashboardTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="panel@example.com", password="StrongPass123")
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name="Residential", slug="dash-cat")
+        self.property = Property.objects.create(
+            name="Hill House",
+            slug="hill-house",
+            description="Quiet",
+            location="Hills",
+            price=Decimal("1000.00"),
+            status=Property.STATUS_ACTIVE,
+            category=category,
+        )
+        for i in range(3):
+            booking = Booking.objects.create(user=self.user, property=self.property, total_amount=Decimal("1000.00"))
+            Payment.objects.create(booking=booking, provider=Payment.PROVIDER_STRIPE, transaction_id=f"pi_dash_{i}")
+
+    def test_dashboard_uses_fixed_queries_and_caches(self):
+        url = reverse("auth-me-dashboard")
+        with self.assertNumQueries(2):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["user"]["email"], self.user.email)
+        self.assertEqual(len(resp.data["bookings"]), 3)
+        self.assertEqual(resp.data["bookings"][0]["property"]["name"], "Hill House")
+        self.assertEqual(len(resp.data["payments"]), 3)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_payment_transition_invalidates_dashboard(self):
+        url = reverse("auth-me-dashboard")
+        self.client.get(url)
+        Payment.objects.transition(Payment.PROVIDER_STRIPE, "pi_dash_0", Payment.STATUS_SUCCESS)
+        resp = self.client.get(url)
+        statuses = {p["transaction_id"]: p["status"] for p in resp.data["payments"]}
+        self.assertEqual(statuses["pi_dash_0"], Payment.STATUS_SUCCESS)
+        self.assertIn(Booking.STATUS_PAID, [b["status"] for b in resp.data["bookings"]])
+
+
+@override_settings(EVENTS_USE_REDIS=False, EVENTS_HEARTBEAT_SECONDS=0.05)
+class StatusEventTests(APITestCase):
+    def setUp(self):
+        local_backlog.clear()
+        self.addCleanup(local_backlog.clear)
+        self.user = User.objects.create_user(email="events@example.com", password="StrongPass123")
+        category = Category.objects.create(name="Residential", slug="events-cat")
+        self.property = Property.objects.create(
+            name="Lake House",
+            slug="lake-house",
+            description="Calm",
+            location="Lake",
+            price=Decimal("1000.00"),
+            status=Property.STATUS_ACTIVE,
+            category=category,
+        )
+        self.booking = Booking.objects.create(user=self.user, property=self.property, total_amount=Decimal("1000.00"))
+
+    def _events(self):
+        return [json.loads(data) for _, data in local_backlog.after(self.user.id, None)]
+
+    def test_events_publish_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.booking.cancel()
+            self.assertEqual(self._events(), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._events(), [{"type": "booking", "booking_id": self.booking.id, "status": "canceled"}])
+
+    def test_payment_transition_publishes_payment_and_booking(self):
+        Payment.objects.create(booking=self.booking, provider=Payment.PROVIDER_STRIPE, transaction_id="pi_events")
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.transition(Payment.PROVIDER_STRIPE, "pi_events", Payment.STATUS_SUCCESS)
+        self.assertEqual(
+            [(event["type"], event["status"]) for event in self._events()],
+            [("payment", Payment.STATUS_SUCCESS), ("booking", Booking.STATUS_PAID)],
+        )
+
+    async def test_stream_resumes_after_last_event_id_then_goes_live(self):
+        user_id = self.user.id
+        for status_name in ("pending", "paid", "canceled"):
+            _publish([(user_id, json.dumps({"type": "booking", "booking_id": 1, "status": status_name}))])
+        first_id = local_backlog.after(user_id, None)[0][0]
+
+        stream = event_stream(user_id, first_id)
+        self.assertTrue((await anext(stream)).startswith("retry:"))
+        replayed = [await anext(stream), await anext(stream)]
+        self.assertIn('"paid"', replayed[0])
+        self.assertIn("event: booking", replayed[1])
+        self.assertEqual(await anext(stream), ": keepalive\n\n")
+
+        # Published from this thread: delivered through the loop's hub, not the backlog.
+        _publish([(user_id, json.dumps({"type": "payment", "payment_id": 7, "booking_id": 1, "status": "failed"}))])
+        self.assertIn("event: payment", await anext(stream))
+        await stream.aclose()
+
+    async def test_live_event_during_replay_does_not_drop_backlog(self):
+        user_id = self.user.id
+        for status_name in ("pending", "paid", "canceled"):
+            _publish([(user_id, json.dumps({"type": "booking", "booking_id": 1, "status": status_name}))])
+        backlog = local_backlog.after(user_id, None)
+        hub = get_event_hub()
+        read_backlog = hub._backlog
+
+        async def slow_backlog(user, last_id):
+            # A live event arrives while the backlog is still being read.
+            _publish([(user_id, json.dumps({"type": "payment", "payment_id": 7, "booking_id": 1, "status": "failed"}))])
+            await asyncio.sleep(0)
+            return await read_backlog(user, last_id)
+
+        with mock.patch.object(hub, "_backlog", slow_backlog):
+            stream = event_stream(user_id, backlog[0][0])
+            await anext(stream)
+            frames = [await anext(stream) for _ in range(3)]
+        await stream.aclose()
+        self.assertEqual(
+            [frame.split("\n")[0] for frame in frames],
+            [f"id: {event_id}" for event_id, _ in local_backlog.after(user_id, parse_event_id(backlog[0][0]))],
+        )
+        self.assertIn('"paid"', frames[0])
+        self.assertIn("event: payment", frames[2])
+
+    async def test_stream_view_authenticates_ticket_not_query_token(self):
+        view = EventStreamView.as_view()
+        factory = AsyncRequestFactory()
+        resp = await view(factory.get("/auth/me/events/"))
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+        token = RefreshToken.for_user(self.user).access_token
+        resp = await view(factory.get("/auth/me/events/", {"token": str(token)}))
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+        ticket = make_stream_ticket(self.user)
+        with override_settings(EVENTS_TICKET_MAX_AGE=-1):
+            resp = await view(factory.get("/auth/me/events/", {"ticket": ticket}))
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        resp = await view(factory.get("/auth/me/events/", {"ticket": ticket}))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        stream = aiter(resp.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+        await stream.aclose()
+
+    def test_stream_is_asgi_only_and_off_by_default(self):
+        request = RequestFactory().get("/auth/me/events/", {"ticket": make_stream_ticket(self.user)})
+        # The WSGI handler runs async views through async_to_sync.
+        self.assertEqual(async_to_sync(EventStreamView.as_view())(request).status_code, 501)
+        with self.assertRaises(NoReverseMatch):
+            reverse("auth-me-events")
+        self.assertNotContains(self.client.get(reverse("user-panel")), "EventSource")
@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 
 from .views import (
+    DashboardView,
+    EventStreamTicketView,
+    EventStreamView,
     LoginPageView,
     LoginView,
+    LogoutView,
     MeView,
     MyBookingsView,
     MyPaymentsView,
@@ -15,12 +20,21 @@ from .views import (
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="auth-register"),
     path("login/", LoginView.as_view(), name="auth-login"),
+    path("logout/", LogoutView.as_view(), name="auth-logout"),
     path("me/", MeView.as_view(), name="auth-me"),
     path("me/bookings/", MyBookingsView.as_view(), name="auth-me-bookings"),
     path("me/payments/", MyPaymentsView.as_view(), name="auth-me-payments"),
+    path("me/dashboard/", DashboardView.as_view(), name="auth-me-dashboard"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token-refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token-verify"),
     path("login-page/", LoginPageView.as_view(), name="login-page"),
     path("register-page/", RegisterPageView.as_view(), name="register-page"),
     path("panel/", UserPanelView.as_view(), name="user-panel"),
 ]
+
+# The SSE stream needs an ASGI server (see EVENTS_STREAM_ENABLED).
+if settings.EVENTS_STREAM_ENABLED:
+    urlpatterns += [
+        path("me/events/", EventStreamView.as_view(), name="auth-me-events"),
+        path("me/events/ticket/", EventStreamTicketView.as_view(), name="auth-me-events-ticket"),
+    ]
@@ -1,22 +1,40 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
 from django.views.generic import TemplateView
-from django.contrib.auth import login as auth_login
+from django.contrib.auth import login as auth_login, logout as auth_logout
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import InvalidToken
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from bookings.models import Booking
+from core.authentication import CachedJWTAuthentication
+from core.caching import get_or_compute
+from core.throttling import LoginIdentifierThrottle, LoginIPThrottle, RegisterEmailThrottle, RegisterIPThrottle
 from bookings.serializers import BookingSerializer
 from payments.models import Payment
 from payments.serializers import PaymentSerializer
-from .serializers import LoginSerializer, RegisterSerializer, UserSerializer
+from .dashboard import dashboard_cache_key
+from .events import event_stream, make_stream_ticket, read_stream_ticket
+from .serializers import LoginSerializer, LogoutSerializer, RegisterSerializer, UserSerializer
+
+logger = logging.getLogger(__name__)
 
 # API endpoints
 
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [RegisterIPThrottle, RegisterEmailThrottle]
 
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
@@ -33,6 +51,7 @@ class RegisterView(APIView):
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [LoginIPThrottle, LoginIdentifierThrottle]
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data, context={"request": request})
@@ -54,6 +73,19 @@ class LoginView(APIView):
         return Response(data, status=status.HTTP_200_OK)
 
 
+class LogoutView(APIView):
+    """Revoke the presented access token (and the refresh token, if sent) until they expire."""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = LogoutSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        auth_logout(request._request)
+        return Response({"detail": "Logged out."}, status=status.HTTP_200_OK)
+
+
 class MeView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -62,6 +94,7 @@ class MeView(APIView):
 
 
 class MyBookingsView(APIView):
+    read_replica = True
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -71,6 +104,7 @@ class MyBookingsView(APIView):
 
 
 class MyPaymentsView(APIView):
+    read_replica = True
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -79,6 +113,94 @@ class MyPaymentsView(APIView):
         return Response(serializer.data)
 
 
+class DashboardView(APIView):
+    """
+    Profile, recent bookings (with property summaries) and their payments in one
+    response, for the user panel. Two queries on a miss; the bookings/payments
+    part is cached per user and invalidated by version (see users.dashboard).
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        key = None
+        if settings.DASHBOARD_CACHE_TTL:
+            try:
+                key = dashboard_cache_key(user.pk)
+            except Exception as exc:
+                logger.warning("Dashboard cache unavailable: %s", exc)
+        if key is None:
+            data = self._build(user)
+        else:
+            data = get_or_compute(key, lambda: self._build(user), settings.DASHBOARD_CACHE_TTL, name="dashboard")
+        return Response({"user": UserSerializer(user).data, **data})
+
+    @staticmethod
+    def _build(user):
+        bookings = list(
+            Booking.objects.filter(user=user)
+            .select_related("property", "property__category")
+            .prefetch_related("payments")[: settings.DASHBOARD_BOOKING_LIMIT]
+        )
+        payments = sorted(
+            (payment for booking in bookings for payment in booking.payments.all()),
+            key=lambda payment: payment.created_at,
+            reverse=True,
+        )
+        return {
+            "bookings": BookingSerializer(bookings, many=True).data,
+            "payments": PaymentSerializer(payments, many=True).data,
+        }
+
+
+class EventStreamTicketView(APIView):
+    """Exchanges the caller's access token for a short-lived event stream ticket."""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({"ticket": make_stream_ticket(request.user), "expires_in": settings.EVENTS_TICKET_MAX_AGE})
+
+
+def _stream_user(request):
+    # EventSource cannot send headers: browsers pass a ticket, other clients the JWT header.
+    ticket = request.GET.get("ticket")
+    if ticket:
+        user_id = read_stream_ticket(ticket)
+        return get_user_model().objects.filter(pk=user_id, is_active=True).first() if user_id else None
+    auth = CachedJWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+class EventStreamView(View):
+    """
+    Server-Sent Events stream of the user's booking and payment status changes
+    (see users.events). ASGI only: under WSGI the endless stream would pin a
+    worker thread without ever flushing, so it answers 501 there. Honours
+    ``Last-Event-ID`` (or ``?last_event_id=``) to resume.
+    """
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"detail": "The event stream requires an ASGI server."}, status=501)
+        user = await sync_to_async(_stream_user)(request)
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+        last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+        response = StreamingHttpResponse(event_stream(user.pk, last_event_id), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 class LoginPageView(TemplateView):
     template_name = "login.html"
     permission_classes = []  # TemplateView; DRF permissions not applied
@@ -92,3 +214,6 @@ class RegisterPageView(TemplateView):
 class UserPanelView(TemplateView):
     template_name = "panel.html"
     permission_classes = []
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(events_stream=settings.EVENTS_STREAM_ENABLED, **kwargs)